@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+End-to-End Benchmark: Translation Orchestration, Metric Scoring, Aggregation
+
+Runs the three stages against the 22-document corpus in data/extracted_text,
+offline:
+1. Translation: run_full_pipeline with a stubbed, deterministic translator
+   (fake_llm_server.pseudo_translate) and no rate-limit pauses -> jobs/sec
+2. Scoring: each metric function timed over the stage-1 pairs -> ms/pair,
+   plus evaluate_single end to end -> rows/sec
+3. Aggregation: aggregate_results over the stage-2 metrics -> seconds
+
+Also reports peak RSS after each stage and the import (startup) time of each
+CLI, and stores everything as JSON for run-over-run comparison.
+
+Millisecond timings are noisy, so each scoring call and the aggregation are
+repeated (--repeats, median kept), and the baseline check only flags a
+change that is over --threshold AND over an absolute floor (REGRESSION_FLOORS).
+
+By default the neural scorers use SMALL local models (MiniLM for all
+embedding metrics, multilingual DistilBERT for BERTScore, COMET disabled) so
+the benchmark runs on a laptop; --full-models uses the production models.
+
+Usage:
+  python benchmark.py                                  # Run, save output/benchmarks/bench_<ts>.json
+  python benchmark.py --metrics bleu chrf              # Lexical metrics only
+  python benchmark.py --baseline output/benchmarks/baseline.json --threshold 0.10
+  python benchmark.py --baseline output/benchmarks/baseline.json --repeats 5
+"""
+
+import contextlib
+import io
+import json
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+SCRIPTS_DIR = Path(__file__).parent
+REPO_DIR = SCRIPTS_DIR.parent
+CORPUS_DIR = REPO_DIR / "data" / "extracted_text"
+BENCH_DIR = REPO_DIR / "output" / "benchmarks"
+
+SMALL_EMBEDDING_MODEL = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+SMALL_BERTSCORE_MODEL = 'distilbert-base-multilingual-cased'
+
+ALL_METRICS = ["bleu", "chrf", "bertscore", "comet", "comet_qe", "labse", "xlm_roberta", "mbert"]
+
+# CLI modules whose import time is measured
+STARTUP_MODULES = ["run_medlineplus_pipeline", "calculate_medlineplus_metrics",
+                   "generate_github_outputs", "generate_human_review"]
+
+# Higher is better for these keys; everything else in the flat report is lower-is-better
+HIGHER_IS_BETTER = ("jobs_per_sec", "rows_per_sec")
+
+# Smallest absolute change that counts as a regression, by key suffix: a
+# 0.3 ms metric call going to 0.4 ms is +33% but within timer noise
+REGRESSION_FLOORS = (
+    ("ms_per_pair", 2.0),
+    ("_ms", 2.0),
+    ("seconds", 0.05),
+    ("_mb", 32.0),
+)
+DEFAULT_REPEATS = 3
+
+
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (MB)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+def stub_translate(text, target_language, model_name, is_back_translation=False, source_language=None):
+    """Deterministic offline stand-in for translate_with_retry."""
+    from fake_llm_server import pseudo_translate
+    return pseudo_translate(text, target_language)
+
+
+def use_small_models(metrics_module):
+    """Swap the production scorers for small local models."""
+    from sentence_transformers import SentenceTransformer
+    small = SentenceTransformer(SMALL_EMBEDDING_MODEL)
+    metrics_module._labse_model = small
+    metrics_module._xlm_roberta_model = small
+    metrics_module._mbert_model = small
+    metrics_module._comet_model = "unavailable"
+    metrics_module._comet_qe_model = "unavailable"
+
+    # BERTScore goes through the cached scorers in token_batching
+    import token_batching
+    from bert_score import BERTScorer
+    small_bertscore = BERTScorer(model_type=SMALL_BERTSCORE_MODEL)
+    for lang in ("en", "multilingual"):
+        token_batching._bertscore_scorers[lang] = small_bertscore
+
+
+# =============================================================================
+# STAGES
+# =============================================================================
+
+def bench_translation(work_dir: Path, models=None, languages=None) -> tuple[dict, list[dict]]:
+    """Stage 1: orchestration throughput with a stubbed translator."""
+    import run_medlineplus_pipeline as pipeline
+
+    pipeline.EXTRACTED_DIR = CORPUS_DIR
+    pipeline.OUTPUT_DIR = work_dir
+    pipeline.RATE_LIMIT_SECONDS = 0.0
+    pipeline.translate_with_retry = stub_translate
+    pipeline.warm_up = lambda providers: {}
+
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = pipeline.run_full_pipeline(models=models, languages=languages, resume=False)
+    elapsed = time.perf_counter() - start_time
+
+    stats = {
+        'jobs': len(results),
+        'seconds': elapsed,
+        'jobs_per_sec': len(results) / elapsed if elapsed else None,
+        'failed': sum(1 for r in results if not r.success),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    return stats, [r.to_dict() for r in results]
+
+
+def metric_calls(metrics_module, result: dict) -> dict:
+    """One representative call per metric for a result row."""
+    m = metrics_module
+    english = result['english_original']
+    back = result['llm_back_translation']
+    return {
+        "bleu": lambda: m.calculate_bleu(back, english),
+        "chrf": lambda: m.calculate_chrf(back, english),
+        "bertscore": lambda: m.calculate_bertscore(back, english),
+        "comet": lambda: m.calculate_comet(english, result['llm_translation'], result['professional_translation']),
+        "comet_qe": lambda: m.calculate_comet_qe(english, back),
+        "labse": lambda: m.calculate_labse_similarity(back, english),
+        "xlm_roberta": lambda: m.calculate_xlm_roberta_similarity(back, english),
+        "mbert": lambda: m.calculate_mbert_similarity(back, english),
+    }
+
+
+def bench_scoring(results: list[dict], metric_names: list[str], n_pairs: int, full_models: bool,
+                  repeats: int = DEFAULT_REPEATS) -> tuple[dict, list[dict]]:
+    """Stage 2: per-metric ms/pair (median of `repeats` calls per pair) and evaluate_single rows/sec."""
+    import calculate_medlineplus_metrics as metrics_module
+
+    if not full_models:
+        use_small_models(metrics_module)
+
+    rows = [r for r in results if r['llm_translation'] and r['professional_translation']][:n_pairs]
+    if not rows:
+        sys.exit("No stage-1 row has both an LLM and a professional translation to score")
+    per_metric = {}
+
+    for name in metric_names:
+        # First call loads the model; time it separately from the steady state
+        load_start = time.perf_counter()
+        metric_calls(metrics_module, rows[0])[name]()
+        load_seconds = time.perf_counter() - load_start
+
+        timings = []
+        for row in rows:
+            call = metric_calls(metrics_module, row)[name]
+            runs = []
+            for _ in range(repeats):
+                start_time = time.perf_counter()
+                call()
+                runs.append((time.perf_counter() - start_time) * 1000)
+            timings.append(statistics.median(runs))
+        per_metric[name] = {
+            'load_seconds': load_seconds,
+            'ms_per_pair': statistics.mean(timings),
+            'p95_ms': sorted(timings)[int(0.95 * (len(timings) - 1))],
+        }
+
+    start_time = time.perf_counter()
+    all_metrics = [metrics_module.evaluate_single(row).to_dict() for row in rows]
+    elapsed = time.perf_counter() - start_time
+
+    stats = {
+        'pairs': len(rows),
+        'metrics': per_metric,
+        'evaluate_single_seconds': elapsed,
+        'rows_per_sec': len(rows) / elapsed if elapsed else None,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    return stats, all_metrics
+
+
+def bench_aggregation(all_metrics: list[dict], work_dir: Path, repeats: int = DEFAULT_REPEATS) -> dict:
+    """Stage 3: aggregate_results over the stage-2 metrics (median of `repeats` runs)."""
+    import calculate_medlineplus_metrics as metrics_module
+
+    metrics_module.OUTPUT_DIR = work_dir
+    with open(work_dir / "all_metrics.json", 'w') as f:
+        json.dump(all_metrics, f)
+
+    runs = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            metrics_module.aggregate_results()
+        runs.append(time.perf_counter() - start_time)
+
+    return {'rows': len(all_metrics), 'seconds': statistics.median(runs), 'peak_rss_mb': peak_rss_mb()}
+
+
+def bench_startup(repeats: int = 3) -> dict:
+    """Import time of each CLI module in a fresh interpreter (best of N)."""
+    startup = {}
+    for module in STARTUP_MODULES:
+        times = []
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            proc = subprocess.run([sys.executable, "-c", f"import {module}"], cwd=SCRIPTS_DIR,
+                                  capture_output=True)
+            times.append(time.perf_counter() - start_time)
+        startup[module] = {'seconds': min(times), 'ok': proc.returncode == 0}
+    return startup
+
+
+# =============================================================================
+# REPORTING / REGRESSION CHECK
+# =============================================================================
+
+def flatten(report: dict, prefix: str = "") -> dict:
+    """Flatten nested numeric results to {"a.b.c": value} for comparison."""
+    flat = {}
+    for key, value in report.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def regression_floor(key: str) -> float:
+    """Smallest absolute change of `key` that counts (0 for rates)."""
+    for suffix, floor in REGRESSION_FLOORS:
+        if key.endswith(suffix):
+            return floor
+    return 0.0
+
+
+def compare_to_baseline(report: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    List of regressions versus baseline: worse by more than `threshold`
+    (fraction) and by more than the key's absolute floor.
+    """
+    current = flatten(report['stages'])
+    previous = flatten(baseline['stages'])
+    regressions = []
+
+    for key, old in previous.items():
+        new = current.get(key)
+        if new is None or not old:
+            continue
+        if not (key.endswith(HIGHER_IS_BETTER) or "seconds" in key or key.endswith(("_ms", "ms_per_pair", "_mb"))):
+            continue  # counts, not performance
+        if key.endswith(HIGHER_IS_BETTER):
+            change = (old - new) / old
+        else:
+            change = (new - old) / old
+            if new - old <= regression_floor(key):
+                continue
+        if change > threshold:
+            regressions.append(f"{key}: {old:.4g} -> {new:.4g} ({change:+.0%})")
+    return regressions
+
+
+def print_report(report: dict):
+    stages = report['stages']
+    print("\n" + "="*70)
+    print("BENCHMARK RESULTS")
+    print("="*70)
+
+    t = stages['translation']
+    print(f"Translation:  {t['jobs']} jobs in {t['seconds']:.2f}s "
+          f"({t['jobs_per_sec']:.1f} jobs/s), peak RSS {t['peak_rss_mb']:.0f} MB")
+
+    s = stages['scoring']
+    print(f"Scoring:      {s['pairs']} rows, evaluate_single {s['rows_per_sec']:.2f} rows/s, "
+          f"peak RSS {s['peak_rss_mb']:.0f} MB")
+    print(f"  {'Metric':<14} {'ms/pair':>10} {'p95 ms':>10} {'load s':>8}")
+    for name, m in s['metrics'].items():
+        print(f"  {name:<14} {m['ms_per_pair']:>10.1f} {m['p95_ms']:>10.1f} {m['load_seconds']:>8.1f}")
+
+    a = stages['aggregation']
+    print(f"Aggregation:  {a['rows']} rows in {a['seconds']*1000:.1f} ms")
+
+    print("Startup (import time):")
+    for module, st in stages['startup'].items():
+        flag = "" if st['ok'] else "  (import failed)"
+        print(f"  {module:<32} {st['seconds']:.2f}s{flag}")
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def run_benchmark(metric_names=None, n_pairs: int = 50, full_models: bool = False,
+                  models=None, languages=None, repeats: int = DEFAULT_REPEATS) -> dict:
+    metric_names = metric_names or ALL_METRICS
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        translation_stats, results = bench_translation(work_dir, models, languages)
+        scoring_stats, all_metrics = bench_scoring(results, metric_names, n_pairs, full_models, repeats)
+        aggregation_stats = bench_aggregation(all_metrics, work_dir, repeats)
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'full_models': full_models,
+        'repeats': repeats,
+        'stages': {
+            'translation': translation_stats,
+            'scoring': scoring_stats,
+            'aggregation': aggregation_stats,
+            'startup': bench_startup(),
+        },
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark pipeline, scoring and aggregation")
+    parser.add_argument("--metrics", nargs="+", choices=ALL_METRICS, help="Metrics to time (default: all)")
+    parser.add_argument("--pairs", type=int, default=50, help="Rows to score in stage 2")
+    parser.add_argument("--full-models", action="store_true", help="Use production scoring models")
+    parser.add_argument("--models", nargs="+", help="Models for stage 1 (default: ACTIVE_MODELS)")
+    parser.add_argument("--languages", nargs="+", help="Languages for stage 1 (default: ACTIVE_LANGUAGES)")
+    parser.add_argument("--output", type=str, help="Write results here (default: output/benchmarks/bench_<ts>.json)")
+    parser.add_argument("--baseline", type=str, help="Compare against a previous results JSON")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed regression fraction (default 0.10)")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS,
+                        help="Timed runs per scoring call and aggregation; the median is kept")
+
+    args = parser.parse_args()
+
+    report = run_benchmark(args.metrics, args.pairs, args.full_models, args.models, args.languages, args.repeats)
+    print_report(report)
+
+    BENCH_DIR.mkdir(parents=True, exist_ok=True)
+    output = Path(args.output) if args.output else BENCH_DIR / f"bench_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.threshold)
+        if regressions:
+            print(f"\nREGRESSIONS (> {args.threshold:.0%} and over the absolute floor, worse than {args.baseline}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions > {args.threshold:.0%} versus {args.baseline}")
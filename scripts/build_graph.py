@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Incremental Artifact Build Graph for the Report and Review Outputs
+
+Each output (Excel workbook, chart set, README, review packet) is an
+artifact that declares what it is built from:
+- inputs: named data slices (summary.json sections, metric rows, result rows)
+  or files, each fingerprinted separately
+- code:   the functions, classes and templates that render it. Their
+  closure is fingerprinted: every function, class and constant they reach
+  through module-level names in the scripts directory, so editing a helper
+  or a template rebuilds what uses it without listing it by hand
+
+Fingerprints of the last successful build are kept in a state file next to
+the outputs. An artifact is rebuilt only when it was never built, one of its
+outputs is missing, or an input or its code changed; the run reports which
+artifacts were rebuilt and why.
+
+Artifacts are independent of each other (each reads only source data), so
+stale ones may be built in a process pool.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from tracing import span, record_span  # Enabled with MEDLINEPLUS_TRACE_FILE
+
+STATE_FILE = ".build_state.json"
+SCRIPTS_DIR = Path(__file__).parent.resolve()
+
+# Module-level values followed as data when code reads them
+CONTAINER_TYPES = (dict, list, tuple, set, frozenset)
+CONSTANT_TYPES = CONTAINER_TYPES + (str, bytes, int, float, bool)
+
+
+def _json_default(value):
+    """Stable JSON for values json cannot encode (no memory addresses, no set order)."""
+    if inspect.isfunction(value) or inspect.isclass(value):
+        return f"{value.__module__}.{value.__qualname__}"
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    return str(value)
+
+
+def fingerprint(value) -> str:
+    """SHA-256 of a file's contents (Path), a function's or class's source, or a JSON-able value."""
+    digest = hashlib.sha256()
+    if isinstance(value, Path):
+        if not value.exists():
+            return "missing"
+        with open(value, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    elif inspect.isfunction(value) or inspect.isclass(value):
+        digest.update(inspect.getsource(value).encode('utf-8'))
+    else:
+        digest.update(json.dumps(value, sort_keys=True, default=_json_default).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _is_repo_code(value) -> bool:
+    """A function or class defined in a module of the scripts directory."""
+    if not (inspect.isfunction(value) or inspect.isclass(value)):
+        return False
+    source_file = getattr(inspect.getmodule(value), '__file__', None)
+    return source_file is not None and Path(source_file).resolve().parent == SCRIPTS_DIR
+
+
+def _global_names(code) -> set:
+    """Names a code object (and the functions, lambdas and comprehensions inside it) looks up."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _global_names(const)
+    return names
+
+
+def code_closure(values, exclude=()) -> list:
+    """
+    values plus everything they reach through module-level names: repo
+    functions and classes (followed recursively) and the constants they read.
+    Functions and classes inside those constants (dispatch tables) are
+    followed too. exclude lists values (by identity) not to follow.
+    """
+    excluded = {id(value) for value in exclude}
+    seen, closure, stack = set(), [], list(values)
+    while stack:
+        value = stack.pop()
+        if id(value) in seen or id(value) in excluded:
+            continue
+        seen.add(id(value))
+        closure.append(value)
+        if inspect.isfunction(value):
+            functions = [value]
+        elif inspect.isclass(value):
+            functions = [getattr(member, '__func__', member) for member in vars(value).values()]
+            functions = [f for f in functions if inspect.isfunction(f)]
+        elif isinstance(value, CONTAINER_TYPES):
+            parts = [*value.keys(), *value.values()] if isinstance(value, dict) else list(value)
+            stack.extend(part for part in parts if _is_repo_code(part) or isinstance(part, CONTAINER_TYPES))
+            continue
+        else:
+            continue
+        for function in functions:
+            for name in _global_names(function.__code__):
+                target = function.__globals__.get(name)
+                if _is_repo_code(target) or (isinstance(target, CONSTANT_TYPES) and not name.startswith('__')):
+                    stack.append(target)
+    return closure
+
+
+def code_fingerprint(values, exclude=()) -> str:
+    """Order-independent fingerprint of the code closure of values."""
+    digests = sorted(fingerprint(value) for value in code_closure(values, exclude))
+    return hashlib.sha256("".join(digests).encode('utf-8')).hexdigest()
+
+
+@dataclass
+class Artifact:
+    name: str
+    outputs: list               # Paths written by the build
+    inputs: dict                # {input name: JSON-able value or Path}
+    build: Callable             # Called as build(*args)
+    args: tuple = ()
+    code: tuple = ()            # Functions, classes or template values the output depends on (closure followed)
+    fingerprints: dict = field(default_factory=dict)
+
+    def fingerprint(self) -> dict:
+        self.fingerprints = {
+            'inputs': {name: fingerprint(value) for name, value in self.inputs.items()},
+            'code': code_fingerprint(self.code),
+        }
+        return self.fingerprints
+
+
+class BuildGraph:
+    """Artifacts plus the fingerprints of their last successful build."""
+
+    def __init__(self, state_file):
+        self.state_file = Path(state_file)
+        self.state = json.loads(self.state_file.read_text()) if self.state_file.exists() else {}
+        self.artifacts = {}
+
+    def add(self, name: str, outputs: list, inputs: dict, build: Callable, args: tuple = (), code: tuple = ()):
+        self.artifacts[name] = Artifact(name, [Path(p) for p in outputs], inputs, build, args, code)
+
+    def reasons(self, artifact: Artifact, force: bool = False) -> list[str]:
+        """Why the artifact must be rebuilt (empty if it is up to date)."""
+        current = artifact.fingerprint()
+        previous = self.state.get(artifact.name)
+        if force:
+            return ["forced"]
+        if previous is None:
+            return ["never built"]
+        reasons = [f"output missing: {p.name}" for p in artifact.outputs if not p.exists()]
+        changed = [name for name, digest in current['inputs'].items() if previous['inputs'].get(name) != digest]
+        if changed:
+            reasons.append(f"inputs changed: {', '.join(changed)}")
+        if current['code'] != previous['code']:
+            reasons.append("code changed")
+        return reasons
+
+    def _save(self):
+        tmp = self.state_file.with_name(self.state_file.name + ".tmp")
+        tmp.write_text(json.dumps(self.state, indent=2))
+        tmp.replace(self.state_file)
+
+    @staticmethod
+    def _timed_build(build: Callable, args: tuple) -> tuple:
+        """Run one build in a pool worker: (result, start_ns, end_ns, pid)."""
+        start_ns = time.time_ns()
+        result = build(*args)
+        return result, start_ns, time.time_ns(), os.getpid()
+
+    def run(self, force: bool = False, workers: int = None) -> list[dict]:
+        """
+        Build every stale artifact. With workers, stale artifacts are built in
+        a process pool (build functions and args must be picklable).
+
+        Returns one record per artifact: name, rebuilt, reasons, seconds, result.
+        """
+        records = {}
+        stale = []
+        for artifact in self.artifacts.values():
+            reasons = self.reasons(artifact, force)
+            records[artifact.name] = {'name': artifact.name, 'rebuilt': False, 'reasons': reasons,
+                                      'seconds': 0.0, 'result': None}
+            if reasons:
+                stale.append(artifact)
+
+        def done(artifact, result, seconds):
+            records[artifact.name].update(rebuilt=True, result=result, seconds=seconds)
+            self.state[artifact.name] = artifact.fingerprints
+
+        try:
+            if workers and len(stale) > 1:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    submitted_ns = time.time_ns()
+                    futures = {pool.submit(self._timed_build, a.build, a.args): a for a in stale}
+                    for future in as_completed(futures):
+                        artifact = futures[future]
+                        reasons = "; ".join(records[artifact.name]['reasons'])
+                        try:
+                            result, start_ns, end_ns, pid = future.result()
+                        except Exception as e:
+                            record_span(f"build.{artifact.name}", submitted_ns, time.time_ns(),
+                                        error=f"{type(e).__name__}: {e}", reasons=reasons)
+                            raise
+                        # Timed in the worker, recorded here (one lane per worker process)
+                        record_span(f"build.{artifact.name}", start_ns, end_ns, thread_id=pid, reasons=reasons)
+                        done(artifact, result, (end_ns - start_ns) / 1e9)
+            else:
+                for artifact in stale:
+                    start_time = time.perf_counter()
+                    with span(f"build.{artifact.name}", reasons="; ".join(records[artifact.name]['reasons'])):
+                        result = artifact.build(*artifact.args)
+                    done(artifact, result, time.perf_counter() - start_time)
+        finally:
+            self._save()
+
+        return list(records.values())
+
+
+def print_build_report(records: list):
+    rebuilt = [r for r in records if r['rebuilt']]
+    for r in rebuilt:
+        print(f"  rebuilt    {r['name']:<36} {r['seconds']:>6.1f}s  ({'; '.join(r['reasons'])})")
+    print(f"  up to date {len(records) - len(rebuilt)} of {len(records)} artifacts")
@@ -21,15 +21,25 @@ Output: Results table matching poster format
 
 import json
 import sys
+import time
+from collections import defaultdict
 from pathlib import Path
 from dataclasses import dataclass, asdict, field
 from typing import Optional, Dict, List
-import numpy as np
 
 # Add scripts directory to path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from config import logger, METRICS_DIR
+from tracing import span, configure_tracing
+from terminology import check_terms
+from text_store import load_results_file
+from lexical_scoring import make_scorer, corpus_scores, CORPUS_GROUPS, LEXICAL_STATS_FIELD
+from results_db import ResultsDB
+from token_batching import (
+    encode_texts, bertscore_f1, get_bertscore_scorer, set_long_text_policy, get_long_text_policy,
+    log_long_text_stats
+)
 
 # =============================================================================
 # PATHS
@@ -39,6 +49,7 @@ BASE_DIR = Path("/Users/chukanya/Documents/Coding/Back translation project")
 RESULTS_FILE = BASE_DIR / "output" / "medlineplus_results" / "all_results.json"
 OUTPUT_DIR = BASE_DIR / "output" / "medlineplus_metrics"
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+PROFILE_FILE = "metrics_profile.json"
 
 # =============================================================================
 # LAZY-LOADED MODELS
@@ -46,19 +57,39 @@ OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 _bleu_scorer = None
 _chrf_scorer = None
-_bert_scorer = None
 _comet_model = None
 _comet_qe_model = None
 _labse_model = None
 _xlm_roberta_model = None
 _mbert_model = None
 
+# Embedding encoders: "torch" (fp32 SentenceTransformer) or "onnx" (int8, see onnx_encoders.py)
+ENCODER_BACKEND = "torch"
+ENCODER_THREADS = None
+
+
+def set_encoder_backend(backend: str, threads: int = None):
+    """Choose the embedding backend; call before the first embedding metric."""
+    global ENCODER_BACKEND, ENCODER_THREADS
+    ENCODER_BACKEND = backend
+    ENCODER_THREADS = threads
+    if threads and backend == "torch":
+        import torch
+        torch.set_num_threads(threads)
+
+
+def load_encoder(metric: str, model_id: str):
+    if ENCODER_BACKEND == "onnx":
+        from onnx_encoders import OnnxEncoder
+        return OnnxEncoder(metric, threads=ENCODER_THREADS)
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_id)
+
 
 def get_bleu_scorer():
     global _bleu_scorer
     if _bleu_scorer is None:
-        from sacrebleu.metrics import BLEU
-        _bleu_scorer = BLEU(effective_order=True)
+        _bleu_scorer = make_scorer("bleu")  # Reference n-grams cached per reference text
         logger.info("BLEU scorer initialized")
     return _bleu_scorer
 
@@ -66,21 +97,11 @@ def get_bleu_scorer():
 def get_chrf_scorer():
     global _chrf_scorer
     if _chrf_scorer is None:
-        from sacrebleu.metrics import CHRF
-        _chrf_scorer = CHRF()
+        _chrf_scorer = make_scorer("chrf")
         logger.info("chrF scorer initialized")
     return _chrf_scorer
 
 
-def get_bert_scorer():
-    global _bert_scorer
-    if _bert_scorer is None:
-        import bert_score
-        _bert_scorer = bert_score
-        logger.info("BERTScore initialized")
-    return _bert_scorer
-
-
 def get_comet_model():
     global _comet_model
     if _comet_model is None:
@@ -113,8 +134,7 @@ def get_comet_qe_model():
 def get_labse_model():
     global _labse_model
     if _labse_model is None:
-        from sentence_transformers import SentenceTransformer
-        _labse_model = SentenceTransformer('sentence-transformers/LaBSE')
+        _labse_model = load_encoder("labse", 'sentence-transformers/LaBSE')
         logger.info("LaBSE model initialized")
     return _labse_model
 
@@ -122,8 +142,7 @@ def get_labse_model():
 def get_xlm_roberta_model():
     global _xlm_roberta_model
     if _xlm_roberta_model is None:
-        from sentence_transformers import SentenceTransformer
-        _xlm_roberta_model = SentenceTransformer('sentence-transformers/xlm-r-100langs-bert-base-nli-stsb-mean-tokens')
+        _xlm_roberta_model = load_encoder("xlm_roberta", 'sentence-transformers/xlm-r-100langs-bert-base-nli-stsb-mean-tokens')
         logger.info("XLM-RoBERTa model initialized")
     return _xlm_roberta_model
 
@@ -131,9 +150,8 @@ def get_xlm_roberta_model():
 def get_mbert_model():
     global _mbert_model
     if _mbert_model is None:
-        from sentence_transformers import SentenceTransformer
         # Use a working multilingual BERT model
-        _mbert_model = SentenceTransformer('sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
+        _mbert_model = load_encoder("mbert", 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
         logger.info("mBERT model initialized")
     return _mbert_model
 
@@ -143,21 +161,24 @@ def get_mbert_model():
 # =============================================================================
 
 def calculate_bleu(hypothesis: str, reference: str) -> float:
-    scorer = get_bleu_scorer()
-    score = scorer.corpus_score([hypothesis], [[reference]])
-    return score.score
+    return get_bleu_scorer().score(hypothesis, reference)
 
 
 def calculate_chrf(hypothesis: str, reference: str) -> float:
-    scorer = get_chrf_scorer()
-    score = scorer.corpus_score([hypothesis], [[reference]])
-    return score.score
+    return get_chrf_scorer().score(hypothesis, reference)
+
+
+def score_lexical(metrics, field_name: str, metric: str, hypothesis: str, reference: str) -> float:
+    """BLEU/chrF of one pair; its sufficient statistics are kept on metrics.lexical_stats."""
+    scorer = LEXICAL_SCORERS[metric]()
+    stats = scorer.segment_stats(hypothesis, reference)
+    metrics.lexical_stats[field_name] = [int(s) for s in stats]
+    return scorer.score_stats(stats)
 
 
 def calculate_bertscore(hypothesis: str, reference: str, lang: str = "en") -> float:
-    bert_score = get_bert_scorer()
-    P, R, F1 = bert_score.score([hypothesis], [reference], lang=lang, verbose=False)
-    return F1.item()
+    # Over-length documents are chunked (or counted as truncated), see token_batching
+    return bertscore_f1([hypothesis], [reference], lang)[0]
 
 
 def calculate_comet(source: str, translation: str, reference: str) -> Optional[float]:
@@ -187,7 +208,8 @@ def calculate_comet_qe(source: str, translation: str) -> Optional[float]:
 
 
 def calculate_embedding_similarity(model, text1: str, text2: str) -> float:
-    embeddings = model.encode([text1, text2])
+    import numpy as np  # Only needed once an encoder has been loaded
+    embeddings = encode_texts(model, [text1, text2])
     similarity = np.dot(embeddings[0], embeddings[1]) / (
         np.linalg.norm(embeddings[0]) * np.linalg.norm(embeddings[1])
     )
@@ -206,6 +228,259 @@ def calculate_mbert_similarity(text1: str, text2: str) -> float:
     return calculate_embedding_similarity(get_mbert_model(), text1, text2)
 
 
+# Metric key -> single-call scorer (argument order as in metric_plan)
+METRIC_FUNCTIONS = {
+    "bleu": calculate_bleu,
+    "chrf": calculate_chrf,
+    "bertscore": calculate_bertscore,
+    "comet": calculate_comet,
+    "comet_qe": calculate_comet_qe,
+    "labse": calculate_labse_similarity,
+    "xlm_roberta": calculate_xlm_roberta_similarity,
+    "mbert": calculate_mbert_similarity,
+}
+
+
+# Scored through score_lexical, so their statistics are recorded
+LEXICAL_SCORERS = {
+    "bleu": get_bleu_scorer,
+    "chrf": get_chrf_scorer,
+}
+
+# =============================================================================
+# BATCH METRIC CALCULATIONS
+# =============================================================================
+# Each takes a list of argument tuples (same order as the single-call scorer)
+# and returns one score per tuple. Neural scorers run the whole list through
+# the model in batches of BATCH_SIZE instead of one forward pass per pair.
+
+BATCH_SIZE = 32
+
+
+def batch_bleu(items: list) -> list:
+    return get_bleu_scorer().score_many(items)
+
+
+def batch_chrf(items: list) -> list:
+    return get_chrf_scorer().score_many(items)
+
+
+def batch_bertscore(items: list) -> list:
+    """items: (hypothesis, reference, lang); one bertscore_f1 call per lang."""
+    scores = [None] * len(items)
+    by_lang = defaultdict(list)
+    for i, (_, _, lang) in enumerate(items):
+        by_lang[lang].append(i)
+    for lang, indices in by_lang.items():
+        f1_scores = bertscore_f1([items[i][0] for i in indices], [items[i][1] for i in indices], lang)
+        for i, f1 in zip(indices, f1_scores):
+            scores[i] = f1
+    return scores
+
+
+def batch_comet(items: list) -> list:
+    """items: (source, translation, reference)"""
+    model = get_comet_model()
+    if model == "unavailable":
+        return [None] * len(items)
+    data = [{"src": src, "mt": mt, "ref": ref} for src, mt, ref in items]
+    output = model.predict(data, batch_size=BATCH_SIZE, accelerator='cpu', progress_bar=False)
+    return [float(score) for score in output.scores]
+
+
+def batch_comet_qe(items: list) -> list:
+    """items: (source, translation)"""
+    model = get_comet_qe_model()
+    if model == "unavailable":
+        return [None] * len(items)
+    data = [{"src": src, "mt": mt} for src, mt in items]
+    output = model.predict(data, batch_size=BATCH_SIZE, accelerator='cpu', progress_bar=False)
+    return [float(score) for score in output.scores]
+
+
+def batch_embedding_similarity(model, items: list) -> list:
+    """Cosine similarity of each (text1, text2) pair, encoding all texts together."""
+    import numpy as np
+    texts = [text for pair in items for text in pair]
+    embeddings = encode_texts(model, texts)
+    first, second = embeddings[0::2], embeddings[1::2]
+    similarity = (first * second).sum(axis=1) / (
+        np.linalg.norm(first, axis=1) * np.linalg.norm(second, axis=1)
+    )
+    return [float(s) for s in similarity]
+
+
+BATCH_METRIC_FUNCTIONS = {
+    "bleu": batch_bleu,
+    "chrf": batch_chrf,
+    "bertscore": batch_bertscore,
+    "comet": batch_comet,
+    "comet_qe": batch_comet_qe,
+    "labse": lambda items: batch_embedding_similarity(get_labse_model(), items),
+    "xlm_roberta": lambda items: batch_embedding_similarity(get_xlm_roberta_model(), items),
+    "mbert": lambda items: batch_embedding_similarity(get_mbert_model(), items),
+}
+
+# Loaders to call before serving, so the first request does not pay for them
+MODEL_LOADERS = {
+    "bleu": get_bleu_scorer,
+    "chrf": get_chrf_scorer,
+    "bertscore": lambda: [get_bertscore_scorer(lang) for lang in ("en", "multilingual")],
+    "comet": get_comet_model,
+    "comet_qe": get_comet_qe_model,
+    "labse": get_labse_model,
+    "xlm_roberta": get_xlm_roberta_model,
+    "mbert": get_mbert_model,
+}
+
+
+# =============================================================================
+# PROFILING
+# =============================================================================
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def profile_name(metric: str, args: tuple) -> str:
+    """
+    Profiler bucket of a metric call. BERTScore loads a different model per
+    lang (roberta-large for "en", multilingual BERT otherwise), so each gets
+    its own bucket and its own load time.
+    """
+    if metric == "bertscore":
+        return f"bertscore[{args[2]}]"
+    return metric
+
+
+class MetricProfiler:
+    """
+    Timers and counters for every metric call made by evaluate_single.
+
+    The first call of each scorer includes loading its model, so it is kept
+    separately (load_ms) and does not distort p50/p95. The raw timings are
+    saved with the summary so that a resumed run can load() and extend them.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.timings = defaultdict(list)         # (metric, language) -> [ms]
+        self.errors = defaultdict(int)           # (metric, language) -> count
+        self.load_ms = {}                        # metric -> first-call ms
+        self.loaded = set()                      # Metrics first called in this process
+
+    def record(self, metric: str, language: str, seconds: float, ok: bool = True):
+        ms = seconds * 1000
+        if metric not in self.loaded:
+            # Every process loads the model again, resumed ones included
+            self.loaded.add(metric)
+            self.load_ms.setdefault(metric, ms)
+        else:
+            self.timings[(metric, language)].append(ms)
+        if not ok:
+            self.errors[(metric, language)] += 1
+
+    @staticmethod
+    def _stats(values: list, errors: int) -> dict:
+        values = sorted(values)
+        return {
+            'calls': len(values),
+            'errors': errors,
+            'total_s': sum(values) / 1000,
+            'mean_ms': sum(values) / len(values) if values else None,
+            'p50_ms': percentile(values, 50),
+            'p95_ms': percentile(values, 95),
+        }
+
+    def summary(self) -> dict:
+        by_metric = defaultdict(list)
+        metric_errors = defaultdict(int)
+        by_metric_language = {}
+
+        for metric in self.load_ms:
+            by_metric[metric]  # Scorers called only once still get a row
+        for (metric, language), values in self.timings.items():
+            by_metric[metric].extend(values)
+            by_metric_language[f"{metric}|{language}"] = self._stats(values, self.errors[(metric, language)])
+        for (metric, _), count in self.errors.items():
+            metric_errors[metric] += count
+
+        return {
+            'by_metric': {
+                metric: {**self._stats(values, metric_errors[metric]), 'load_ms': self.load_ms.get(metric)}
+                for metric, values in by_metric.items()
+            },
+            'by_metric_language': by_metric_language,
+        }
+
+    def load(self, filepath: Path):
+        """Add the timings saved by an earlier (interrupted) run."""
+        with open(filepath, 'r') as f:
+            samples = json.load(f).get('samples')
+        if samples is None:
+            logger.warning(f"{filepath} has no raw timings; the profile will only cover this run")
+            return
+        for key, values in samples['timings'].items():
+            self.timings[tuple(key.split('|', 1))][:0] = values
+        for key, count in samples['errors'].items():
+            self.errors[tuple(key.split('|', 1))] += count
+        for metric, ms in samples['load_ms'].items():
+            self.load_ms.setdefault(metric, ms)
+
+    def save(self, filepath: Path) -> dict:
+        summary = self.summary()
+        samples = {
+            'timings': {f"{metric}|{language}": values for (metric, language), values in self.timings.items()},
+            'errors': {f"{metric}|{language}": count for (metric, language), count in self.errors.items()},
+            'load_ms': self.load_ms,
+        }
+        with open(filepath, 'w') as f:
+            json.dump({**summary, 'samples': samples}, f, indent=2)
+        return summary
+
+    def print_summary(self):
+        def fmt_ms(v):
+            return f"{v:.1f}" if v is not None else "N/A"
+
+        summary = self.summary()['by_metric']
+        print("\n" + "="*80)
+        print("METRIC TIMING (sorted by total time)")
+        print("="*80)
+        print(f"{'Metric':<24} {'Calls':>7} {'Errors':>7} {'Total s':>9} {'p50 ms':>9} {'p95 ms':>9} {'Load ms':>9}")
+        print("-"*82)
+        for metric, st in sorted(summary.items(), key=lambda kv: kv[1]['total_s'], reverse=True):
+            print(f"{metric:<24} {st['calls']:>7} {st['errors']:>7} {st['total_s']:>9.1f} "
+                  f"{fmt_ms(st['p50_ms']):>9} {fmt_ms(st['p95_ms']):>9} {fmt_ms(st['load_ms']):>9}")
+
+
+PROFILER = MetricProfiler()
+
+
+def score_metric(metrics, field_name: str, metric: str, fn, *args, **kwargs):
+    """
+    Run one metric call, store the value on `metrics.<field_name>` and time it
+    (in the profiler bucket of `metric`). Failures are logged and leave the
+    field as None.
+    """
+    start_time = time.perf_counter()
+    ok = True
+    with span(f"metric.{metric}", field=field_name, doc_id=metrics.doc_id,
+              model=metrics.model, language=metrics.language) as metric_span:
+        try:
+            setattr(metrics, field_name, fn(*args, **kwargs))
+        except Exception as e:
+            ok = False
+            metric_span.set_error(str(e))
+            logger.warning(f"{field_name} failed: {e}")
+    PROFILER.record(metric, metrics.language, time.perf_counter() - start_time, ok)
+
+
 # =============================================================================
 # DATA STRUCTURES
 # =============================================================================
@@ -255,6 +530,29 @@ class TranslationMetrics:
     llm_vs_prof_backtrans_bertscore: Optional[float] = None
     llm_vs_prof_backtrans_labse: Optional[float] = None
 
+    # ==========================================================================
+    # TERMINOLOGY: Key terms / numbers of the English original kept in the
+    # back-translation (distinct terms, see terminology.py) [NEW]
+    # ==========================================================================
+    backtrans_terms_preserved: Optional[int] = None
+    backtrans_terms_missing: Optional[int] = None
+    backtrans_numbers_preserved: Optional[int] = None
+    backtrans_numbers_missing: Optional[int] = None
+    prof_backtrans_terms_preserved: Optional[int] = None
+    prof_backtrans_terms_missing: Optional[int] = None
+    prof_backtrans_numbers_preserved: Optional[int] = None
+    prof_backtrans_numbers_missing: Optional[int] = None
+
+    # ==========================================================================
+    # LEXICAL STATISTICS: sacrebleu sufficient statistics of every BLEU/chrF
+    # field above, summed per group for corpus-level scores (lexical_scoring.py)
+    # ==========================================================================
+    lexical_stats: Dict[str, List[int]] = field(default_factory=dict)
+
+    # Over-length texts for the embedding/BERTScore fields: "truncate" or "chunk"
+    # (token_batching.py); rows scored before this was recorded were truncated
+    long_text_policy: str = field(default_factory=get_long_text_policy)
+
     def to_dict(self):
         return asdict(self)
 
@@ -263,152 +561,117 @@ class TranslationMetrics:
 # MAIN EVALUATION
 # =============================================================================
 
-def evaluate_single(result: dict) -> TranslationMetrics:
-    """Evaluate a single translation result."""
-    metrics = TranslationMetrics(
-        doc_id=result['doc_id'],
-        model=result['model'],
-        language=result['language']
-    )
+def has_translations(result: dict) -> bool:
+    """Whether a row can be scored at all (both LLM steps produced text)."""
+    return bool(result['llm_translation'] and result['llm_back_translation'])
 
+
+def metric_plan(result: dict) -> list[tuple]:
+    """
+    Every metric call for one result row as (field, metric, args), in the
+    order evaluate_single makes them. Empty if the translations are missing.
+    """
     english_original = result['english_original']
     llm_translation = result['llm_translation']
     professional_translation = result['professional_translation']
     back_translation = result['llm_back_translation']
     professional_back_translation = result.get('professional_back_translation', '')  # NEW
 
-    # Skip if missing data
-    if not llm_translation or not back_translation:
-        logger.warning(f"Missing data for {result['doc_id']}/{result['model']}/{result['language']}")
-        return metrics
+    if not has_translations(result):
+        return []
+
+    plan = []
 
     # ===========================================
     # GOAL 2: SAME-LANGUAGE METRICS (LLM vs Professional)
     # ===========================================
     if professional_translation:
-        try:
-            metrics.same_lang_bleu = calculate_bleu(llm_translation, professional_translation)
-        except Exception as e:
-            logger.warning(f"same_lang_bleu failed: {e}")
-
-        try:
-            metrics.same_lang_chrf = calculate_chrf(llm_translation, professional_translation)
-        except Exception as e:
-            logger.warning(f"same_lang_chrf failed: {e}")
-
-        try:
+        plan += [
+            ('same_lang_bleu', 'bleu', (llm_translation, professional_translation)),
+            ('same_lang_chrf', 'chrf', (llm_translation, professional_translation)),
             # Use multilingual BERTScore for non-English
-            metrics.same_lang_bertscore = calculate_bertscore(
-                llm_translation, professional_translation, lang="multilingual"
-            )
-        except Exception as e:
-            logger.warning(f"same_lang_bertscore failed: {e}")
-
-        try:
-            metrics.same_lang_comet = calculate_comet(
-                english_original, llm_translation, professional_translation
-            )
-        except Exception as e:
-            logger.warning(f"same_lang_comet failed: {e}")
+            ('same_lang_bertscore', 'bertscore', (llm_translation, professional_translation, "multilingual")),
+            ('same_lang_comet', 'comet', (english_original, llm_translation, professional_translation)),
+        ]
 
     # ===========================================
     # GOAL 1: CROSS-LANGUAGE METRICS (LLM Back-trans vs Original)
     # ===========================================
-    try:
-        metrics.cross_lang_xlm_roberta = calculate_xlm_roberta_similarity(
-            back_translation, english_original
-        )
-    except Exception as e:
-        logger.warning(f"xlm_roberta failed: {e}")
-
-    try:
-        metrics.cross_lang_labse = calculate_labse_similarity(
-            back_translation, english_original
-        )
-    except Exception as e:
-        logger.warning(f"labse failed: {e}")
-
-    try:
-        metrics.cross_lang_mbert = calculate_mbert_similarity(
-            back_translation, english_original
-        )
-    except Exception as e:
-        logger.warning(f"mbert failed: {e}")
-
-    try:
-        metrics.cross_lang_comet_qe = calculate_comet_qe(
-            english_original, back_translation
-        )
-    except Exception as e:
-        logger.warning(f"comet_qe failed: {e}")
-
-    # GOAL 1: String-based metrics (LLM back-trans vs Original English)
-    try:
-        metrics.backtrans_bleu = calculate_bleu(back_translation, english_original)
-    except Exception as e:
-        logger.warning(f"backtrans_bleu failed: {e}")
-
-    try:
-        metrics.backtrans_chrf = calculate_chrf(back_translation, english_original)
-    except Exception as e:
-        logger.warning(f"backtrans_chrf failed: {e}")
-
-    try:
-        metrics.backtrans_bertscore = calculate_bertscore(back_translation, english_original)
-    except Exception as e:
-        logger.warning(f"backtrans_bertscore failed: {e}")
+    plan += [
+        ('cross_lang_xlm_roberta', 'xlm_roberta', (back_translation, english_original)),
+        ('cross_lang_labse', 'labse', (back_translation, english_original)),
+        ('cross_lang_mbert', 'mbert', (back_translation, english_original)),
+        ('cross_lang_comet_qe', 'comet_qe', (english_original, back_translation)),
+
+        # GOAL 1: String-based metrics (LLM back-trans vs Original English)
+        ('backtrans_bleu', 'bleu', (back_translation, english_original)),
+        ('backtrans_chrf', 'chrf', (back_translation, english_original)),
+        ('backtrans_bertscore', 'bertscore', (back_translation, english_original, "en")),
+    ]
 
     # ===========================================
     # GOAL 3: PROFESSIONAL BACK-TRANSLATION vs Original English [NEW]
     # ===========================================
     if professional_back_translation:
-        try:
-            metrics.prof_backtrans_bleu = calculate_bleu(professional_back_translation, english_original)
-        except Exception as e:
-            logger.warning(f"prof_backtrans_bleu failed: {e}")
-
-        try:
-            metrics.prof_backtrans_chrf = calculate_chrf(professional_back_translation, english_original)
-        except Exception as e:
-            logger.warning(f"prof_backtrans_chrf failed: {e}")
-
-        try:
-            metrics.prof_backtrans_bertscore = calculate_bertscore(professional_back_translation, english_original)
-        except Exception as e:
-            logger.warning(f"prof_backtrans_bertscore failed: {e}")
-
-        try:
-            metrics.prof_backtrans_labse = calculate_labse_similarity(professional_back_translation, english_original)
-        except Exception as e:
-            logger.warning(f"prof_backtrans_labse failed: {e}")
-
-        try:
-            metrics.prof_backtrans_xlm_roberta = calculate_xlm_roberta_similarity(professional_back_translation, english_original)
-        except Exception as e:
-            logger.warning(f"prof_backtrans_xlm_roberta failed: {e}")
+        plan += [
+            ('prof_backtrans_bleu', 'bleu', (professional_back_translation, english_original)),
+            ('prof_backtrans_chrf', 'chrf', (professional_back_translation, english_original)),
+            ('prof_backtrans_bertscore', 'bertscore', (professional_back_translation, english_original, "en")),
+            ('prof_backtrans_labse', 'labse', (professional_back_translation, english_original)),
+            ('prof_backtrans_xlm_roberta', 'xlm_roberta', (professional_back_translation, english_original)),
+
+            # ===========================================
+            # GOAL 3b: LLM Back-trans vs Professional Back-trans [NEW]
+            # ===========================================
+            ('llm_vs_prof_backtrans_bleu', 'bleu', (back_translation, professional_back_translation)),
+            ('llm_vs_prof_backtrans_chrf', 'chrf', (back_translation, professional_back_translation)),
+            ('llm_vs_prof_backtrans_bertscore', 'bertscore', (back_translation, professional_back_translation, "en")),
+            ('llm_vs_prof_backtrans_labse', 'labse', (back_translation, professional_back_translation)),
+        ]
+
+    return plan
+
+
+TERMINOLOGY_TEXTS = {
+    "backtrans": "llm_back_translation",
+    "prof_backtrans": "professional_back_translation",
+}
+
+
+def score_terminology(metrics: TranslationMetrics, result: dict):
+    """Preserved/missing key-term counts for both back-translations (pure Python, ~1 ms)."""
+    for prefix, text_field in TERMINOLOGY_TEXTS.items():
+        text = result.get(text_field)
+        if not text:
+            continue
+        start_time = time.perf_counter()
+        with span("metric.terminology", field=prefix, doc_id=metrics.doc_id,
+                  model=metrics.model, language=metrics.language):
+            counts = check_terms(result['english_original'], text)
+        for key in ("terms_preserved", "terms_missing", "numbers_preserved", "numbers_missing"):
+            setattr(metrics, f"{prefix}_{key}", counts[key])
+        PROFILER.record("terminology", metrics.language, time.perf_counter() - start_time, True)
 
-        # ===========================================
-        # GOAL 3b: LLM Back-trans vs Professional Back-trans [NEW]
-        # ===========================================
-        try:
-            metrics.llm_vs_prof_backtrans_bleu = calculate_bleu(back_translation, professional_back_translation)
-        except Exception as e:
-            logger.warning(f"llm_vs_prof_backtrans_bleu failed: {e}")
 
-        try:
-            metrics.llm_vs_prof_backtrans_chrf = calculate_chrf(back_translation, professional_back_translation)
-        except Exception as e:
-            logger.warning(f"llm_vs_prof_backtrans_chrf failed: {e}")
+def evaluate_single(result: dict) -> TranslationMetrics:
+    """Evaluate a single translation result."""
+    metrics = TranslationMetrics(
+        doc_id=result['doc_id'],
+        model=result['model'],
+        language=result['language']
+    )
 
-        try:
-            metrics.llm_vs_prof_backtrans_bertscore = calculate_bertscore(back_translation, professional_back_translation)
-        except Exception as e:
-            logger.warning(f"llm_vs_prof_backtrans_bertscore failed: {e}")
+    # Skip if missing data (the scoring server applies the same check)
+    if not has_translations(result):
+        logger.warning(f"Missing data for {result['doc_id']}/{result['model']}/{result['language']}")
+        return metrics
 
-        try:
-            metrics.llm_vs_prof_backtrans_labse = calculate_labse_similarity(back_translation, professional_back_translation)
-        except Exception as e:
-            logger.warning(f"llm_vs_prof_backtrans_labse failed: {e}")
+    for field_name, metric, args in metric_plan(result):
+        if metric in LEXICAL_SCORERS:
+            score_metric(metrics, field_name, metric, score_lexical, metrics, field_name, metric, *args)
+        else:
+            score_metric(metrics, field_name, profile_name(metric, args), METRIC_FUNCTIONS[metric], *args)
+    score_terminology(metrics, result)
 
     return metrics
 
@@ -416,15 +679,27 @@ def evaluate_single(result: dict) -> TranslationMetrics:
 def run_evaluation(
     input_file: str = None,
     output_file: str = "all_metrics.json",
-    checkpoint_interval: int = 50
+    checkpoint_interval: int = 50,
+    server: str = None,
+    db_path: str = None
 ):
-    """Run evaluation on all results."""
+    """
+    Run evaluation on all results.
+
+    With server (a scoring_server.py socket path), rows are scored by the
+    running daemon instead of loading the models in this process. Each row is
+    also inserted into the results database (results_db.py).
+    """
     input_file = input_file or str(RESULTS_FILE)
+    results_db = ResultsDB(db_path)
+    client = None
+    if server:
+        from scoring_server import ScoringClient
+        client = ScoringClient(server)
 
     # Load results
     logger.info(f"Loading results from {input_file}")
-    with open(input_file, 'r', encoding='utf-8') as f:
-        results = json.load(f)
+    results = load_results_file(input_file)
 
     logger.info(f"Evaluating {len(results)} translations")
 
@@ -442,6 +717,8 @@ def run_evaluation(
         if metrics_file.exists():
             with open(metrics_file, 'r') as f:
                 all_metrics = json.load(f)
+        if not client and (OUTPUT_DIR / PROFILE_FILE).exists():
+            PROFILER.load(OUTPUT_DIR / PROFILE_FILE)
         logger.info(f"Resuming from checkpoint: {len(completed)} completed")
 
     # Process each result
@@ -453,8 +730,13 @@ def run_evaluation(
 
         logger.info(f"[{i+1}/{len(results)}] {result['doc_id']} | {result['model']} | {result['language']}")
 
-        metrics = evaluate_single(result)
-        all_metrics.append(metrics.to_dict())
+        with span("metrics.row", doc_id=result['doc_id'], model=result['model'],
+                  language=result['language']):
+            if client:
+                all_metrics.append(client.evaluate([dict(result)])[0])
+            else:
+                all_metrics.append(evaluate_single(result).to_dict())
+        results_db.insert_metrics(all_metrics[-1:])
         completed.add(key)
 
         # Save checkpoint
@@ -463,13 +745,23 @@ def run_evaluation(
                 json.dump(all_metrics, f, indent=2)
             with open(checkpoint_file, 'w') as f:
                 json.dump({'completed': list(completed)}, f)
+            if not client:
+                PROFILER.save(OUTPUT_DIR / PROFILE_FILE)
             logger.info(f"Checkpoint saved: {len(completed)}/{len(results)}")
 
     # Final save
     with open(OUTPUT_DIR / output_file, 'w') as f:
         json.dump(all_metrics, f, indent=2)
+    log_long_text_stats()
 
     logger.info(f"Evaluation complete! Saved to {OUTPUT_DIR / output_file}")
+    if client:
+        # Scored in the daemon: nothing was timed here, so the previous profile is kept
+        logger.info("Metric timings are kept by the scoring server (scoring_server.py --stats)")
+    else:
+        PROFILER.save(OUTPUT_DIR / PROFILE_FILE)
+        PROFILER.print_summary()
+        logger.info(f"Metric timing profile saved to {OUTPUT_DIR / PROFILE_FILE}")
     return all_metrics
 
 
@@ -552,6 +844,11 @@ def aggregate_results(metrics_file: str = "all_metrics.json"):
             'prof_backtrans_labse': avg([m.get('prof_backtrans_labse') for m in model_metrics]),
             'llm_vs_prof_backtrans_bleu': avg([m.get('llm_vs_prof_backtrans_bleu') for m in model_metrics]),
             'llm_vs_prof_backtrans_labse': avg([m.get('llm_vs_prof_backtrans_labse') for m in model_metrics]),
+            # Terminology preservation
+            'backtrans_terms_missing': avg([m.get('backtrans_terms_missing') for m in model_metrics]),
+            'backtrans_numbers_missing': avg([m.get('backtrans_numbers_missing') for m in model_metrics]),
+            'prof_backtrans_terms_missing': avg([m.get('prof_backtrans_terms_missing') for m in model_metrics]),
+            'prof_backtrans_numbers_missing': avg([m.get('prof_backtrans_numbers_missing') for m in model_metrics]),
         }
         model_summaries[model] = summary
 
@@ -597,6 +894,19 @@ def aggregate_results(metrics_file: str = "all_metrics.json"):
     for model, summary in model_summaries.items():
         print(f"{model:<20} {fmt(summary['llm_vs_prof_backtrans_bleu']):>8} {fmt(summary['llm_vs_prof_backtrans_labse']):>8}")
 
+    # =========================================================================
+    # TERMINOLOGY: Key terms / numbers lost in the round trip
+    # =========================================================================
+    print("\n" + "="*100)
+    print("TERMINOLOGY: MEAN MISSING KEY TERMS PER DOCUMENT (by Model)")
+    print("="*100)
+    print(f"{'Model':<20} {'LLM terms':>10} {'LLM nums':>10} {'Prof terms':>11} {'Prof nums':>10}")
+    print("-"*65)
+
+    for model, summary in model_summaries.items():
+        print(f"{model:<20} {fmt(summary['backtrans_terms_missing']):>10} {fmt(summary['backtrans_numbers_missing']):>10} "
+              f"{fmt(summary['prof_backtrans_terms_missing']):>11} {fmt(summary['prof_backtrans_numbers_missing']):>10}")
+
     # =========================================================================
     # BY LANGUAGE
     # =========================================================================
@@ -669,12 +979,41 @@ def aggregate_results(metrics_file: str = "all_metrics.json"):
         print(f"{model:<20} {category:<10} {fmt(summary['same_lang_bleu']):>8} {fmt(summary['backtrans_bleu']):>8} "
               f"{fmt(summary['cross_lang_labse']):>8} {fmt(summary['prof_backtrans_bleu']):>8}")
 
+    # =========================================================================
+    # CORPUS-LEVEL BLEU / chrF (sufficient statistics summed per group, rather
+    # than the per-document means above)
+    # =========================================================================
+    corpus_summaries = {}
+    if any(m.get(LEXICAL_STATS_FIELD) for m in metrics):
+        corpus_summaries = {f"by_{group}": corpus_scores(metrics, key) for group, key in CORPUS_GROUPS.items()}
+
+        print("\n" + "="*100)
+        print("CORPUS-LEVEL BLEU / chrF (by Model)")
+        print("="*100)
+        print(f"{'Model':<20} {'G2:BLEU':>8} {'G2:chrF':>8} {'G1:BLEU':>8} {'G1:chrF':>8} {'G3:BLEU':>8} {'G3:chrF':>8}")
+        print("-"*80)
+
+        for model, scores in sorted(corpus_summaries['by_model'].items()):
+            print(f"{model:<20} " + " ".join(f"{fmt(scores.get(f)):>8}" for f in (
+                'same_lang_bleu', 'same_lang_chrf', 'backtrans_bleu', 'backtrans_chrf',
+                'prof_backtrans_bleu', 'prof_backtrans_chrf')))
+    else:
+        print(f"\nNo {LEXICAL_STATS_FIELD} in {metrics_file}; re-run --evaluate for corpus-level BLEU/chrF")
+
+    # Rows without a policy predate chunking, so were truncated
+    policies = sorted({m.get('long_text_policy', 'truncate') for m in metrics})
+    if len(policies) > 1:
+        logger.warning(f"{metrics_file} mixes long-text policies {policies}; "
+                       f"embedding/BERTScore means are not comparable across them")
+
     # Save summaries
     summary_data = {
+        'long_text_policy': policies[0] if len(policies) == 1 else policies,
         'by_model': model_summaries,
         'by_language': lang_summaries,
         'by_category': category_summaries,
-        'by_model_category': model_category_summaries
+        'by_model_category': model_category_summaries,
+        'corpus': corpus_summaries,
     }
     with open(OUTPUT_DIR / "summary.json", 'w') as f:
         json.dump(summary_data, f, indent=2)
@@ -696,25 +1035,46 @@ if __name__ == "__main__":
     parser.add_argument("--aggregate", action="store_true", help="Aggregate results into summary table")
     parser.add_argument("--input", type=str, help="Input results file")
     parser.add_argument("--test", action="store_true", help="Test with single result")
+    parser.add_argument("--server", metavar="SOCKET",
+                        help="Score through a running scoring_server.py instead of loading models here")
+    parser.add_argument("--backend", choices=["torch", "onnx"], default="torch",
+                        help="Embedding encoder backend (onnx = int8 ONNX Runtime, see onnx_encoders.py)")
+    parser.add_argument("--threads", type=int, help="CPU threads for the embedding encoders")
+    parser.add_argument("--long-docs", choices=["truncate", "chunk"], default="truncate",
+                        help="Texts over the model window: truncate (as stored scores) or chunk and pool "
+                             "(changes embedding/BERTScore values; recorded per row)")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="Write tracing spans (.json = Chrome/Perfetto, .jsonl = OTLP/JSON)")
 
     args = parser.parse_args()
 
+    if args.trace:
+        configure_tracing(args.trace)
+    set_encoder_backend(args.backend, args.threads)
+    set_long_text_policy(args.long_docs)
+
     if args.test:
         # Test with first result
-        with open(RESULTS_FILE, 'r') as f:
-            results = json.load(f)
+        results = load_results_file(RESULTS_FILE)
 
         print("Testing with first result...")
-        metrics = evaluate_single(results[0])
+        if args.server:
+            from scoring_server import ScoringClient
+            metrics = TranslationMetrics(**ScoringClient(args.server).evaluate([dict(results[0])])[0])
+        else:
+            metrics = evaluate_single(results[0])
         print(f"\nResult: {metrics.doc_id} | {metrics.model} | {metrics.language}")
         print(f"  Same-lang BLEU: {metrics.same_lang_bleu}")
         print(f"  Same-lang chrF: {metrics.same_lang_chrf}")
         print(f"  Same-lang BERTScore: {metrics.same_lang_bertscore}")
         print(f"  Cross-lang LaBSE: {metrics.cross_lang_labse}")
         print(f"  Cross-lang XLM-R: {metrics.cross_lang_xlm_roberta}")
+        print(f"  Terms preserved/missing: {metrics.backtrans_terms_preserved}/{metrics.backtrans_terms_missing} "
+              f"(numbers {metrics.backtrans_numbers_preserved}/{metrics.backtrans_numbers_missing})")
+        PROFILER.print_summary()
 
     elif args.evaluate:
-        run_evaluation(input_file=args.input)
+        run_evaluation(input_file=args.input, server=args.server)
 
     elif args.aggregate:
         aggregate_results()
@@ -727,6 +1087,10 @@ Usage:
   python calculate_medlineplus_metrics.py --test       # Test with single result
   python calculate_medlineplus_metrics.py --evaluate   # Run full evaluation (704 results)
   python calculate_medlineplus_metrics.py --aggregate  # Generate summary tables
+  python calculate_medlineplus_metrics.py --evaluate --server /tmp/medlineplus_scoring.sock
+                                                       # Use warm models from scoring_server.py
+  python calculate_medlineplus_metrics.py --evaluate --backend onnx --threads 8
+                                                       # int8 ONNX encoders (CPU)
 
 Metrics calculated:
   SAME-LANGUAGE (LLM vs Professional):
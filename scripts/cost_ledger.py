@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Token and Cost Ledger
+
+Records every translation API call with its token counts and computed cost,
+tagged by doc_id, model, language and step:
+- forward:   English -> Target
+- llm_back:  LLM translation -> English
+- prof_back: Professional translation -> English
+
+The pipeline records each call where it is made (translate_step), so a job
+that fails at step 2 is charged for step 1, and calls that fail are recorded
+with `failed` set: the prompt was sent, and a streamed attempt is charged for
+the output received before it broke.
+
+Token counts come from the provider usage report when the call was streamed;
+otherwise they are estimated from the text and flagged `estimated` so totals
+can be read with the right confidence. Streamed calls are recorded per attempt.
+translate_with_retry retries inside translation_pipeline, so a non-streamed
+call is one row however many attempts it made: the ledger undercounts
+non-streamed retries.
+
+Usage:
+  python cost_ledger.py --totals                  # Totals by model
+  python cost_ledger.py --totals --by language
+  python cost_ledger.py --totals --by model step
+  python cost_ledger.py --project                 # Projected cost of the full 704-job run
+"""
+
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from job_scheduler import MODEL_PRICING, estimate_cost
+
+BASE_DIR = Path("/Users/chukanya/Documents/Coding/Back translation project")
+LEDGER_FILE = BASE_DIR / "output" / "medlineplus_results" / "cost_ledger.db"
+
+GROUP_COLUMNS = ("doc_id", "model", "language", "step", "category")
+
+
+class CostLedger:
+    """Append-only SQLite ledger of API calls."""
+
+    def __init__(self, db_path=None):
+        self.db_path = Path(db_path or LEDGER_FILE)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS calls (
+                id INTEGER PRIMARY KEY,
+                ts REAL NOT NULL,
+                doc_id TEXT NOT NULL,
+                category TEXT NOT NULL,
+                model TEXT NOT NULL,
+                language TEXT NOT NULL,
+                step TEXT NOT NULL,
+                input_tokens INTEGER NOT NULL,
+                output_tokens INTEGER NOT NULL,
+                cost REAL NOT NULL,
+                estimated INTEGER NOT NULL,
+                failed INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_calls_model ON calls (model, language);
+            CREATE INDEX IF NOT EXISTS idx_calls_ts ON calls (ts);
+        """)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(calls)")}
+        if "failed" not in columns:  # Ledgers written before failed calls were recorded
+            with self.conn:
+                self.conn.execute("ALTER TABLE calls ADD COLUMN failed INTEGER NOT NULL DEFAULT 0")
+
+    def record_call(
+        self,
+        doc_id: str,
+        model: str,
+        language: str,
+        step: str,
+        input_tokens: int,
+        output_tokens: int,
+        estimated: bool = False,
+        failed: bool = False
+    ) -> float:
+        """Record one API call (or streamed attempt); returns its cost in USD."""
+        cost = estimate_cost(model, input_tokens, output_tokens)
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO calls (ts, doc_id, category, model, language, step, "
+                "input_tokens, output_tokens, cost, estimated, failed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), doc_id, doc_id.split('/')[0], model, language, step,
+                 input_tokens, output_tokens, cost, int(estimated), int(failed))
+            )
+        return cost
+
+    def total_cost(self, since: Optional[float] = None) -> float:
+        row = self.conn.execute(
+            "SELECT COALESCE(SUM(cost), 0) FROM calls WHERE ts >= ?", (since or 0,)
+        ).fetchone()
+        return row[0]
+
+    def totals(self, group_by: tuple = ("model",)) -> list[dict]:
+        """Calls, tokens and cost grouped by any of doc_id/model/language/step/category."""
+        for col in group_by:
+            if col not in GROUP_COLUMNS:
+                raise ValueError(f"Cannot group by {col}. Choose from {GROUP_COLUMNS}")
+        cols = ", ".join(group_by)
+        rows = self.conn.execute(f"""
+            SELECT {cols}, COUNT(*), COUNT(DISTINCT doc_id || '|' || model || '|' || language),
+                   SUM(input_tokens), SUM(output_tokens), SUM(cost), SUM(estimated), SUM(failed)
+            FROM calls GROUP BY {cols} ORDER BY {cols}
+        """).fetchall()
+        n = len(group_by)
+        return [
+            {
+                **dict(zip(group_by, row[:n])),
+                'calls': row[n],
+                'jobs': row[n + 1],
+                'input_tokens': row[n + 2],
+                'output_tokens': row[n + 3],
+                'cost': row[n + 4],
+                'estimated_calls': row[n + 5],
+                'failed_calls': row[n + 6],
+            }
+            for row in rows
+        ]
+
+    def project(self, total_jobs: dict) -> list[dict]:
+        """
+        Project full-run cost per model from the average cost per job so far.
+
+        Args:
+            total_jobs: {model: number of jobs in the full run}
+        """
+        projections = []
+        for row in self.totals(("model",)):
+            model = row['model']
+            if model not in total_jobs or not row['jobs']:
+                continue
+            per_job = row['cost'] / row['jobs']
+            projections.append({
+                'model': model,
+                'jobs_done': row['jobs'],
+                'jobs_total': total_jobs[model],
+                'spent': row['cost'],
+                'cost_per_job': per_job,
+                'projected_total': per_job * total_jobs[model],
+            })
+        return projections
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Query the token/cost ledger")
+    parser.add_argument("--ledger", help="Ledger database (default: output/medlineplus_results/cost_ledger.db)")
+    parser.add_argument("--totals", action="store_true", help="Show totals")
+    parser.add_argument("--by", nargs="+", default=["model"], choices=GROUP_COLUMNS, help="Group totals by")
+    parser.add_argument("--project", action="store_true", help="Project full-run cost per model")
+    parser.add_argument("--jobs-per-model", type=int, default=176, help="Jobs per model in a full run (22 docs x 8 languages)")
+
+    args = parser.parse_args()
+    ledger = CostLedger(args.ledger)
+
+    if args.totals:
+        header = " ".join(f"{c:<24}" for c in args.by)
+        print(f"\n{header} {'Calls':>7} {'Failed':>7} {'In tok':>11} {'Out tok':>11} {'Cost ($)':>10}")
+        print("-" * (25 * len(args.by) + 50))
+        for row in ledger.totals(tuple(args.by)):
+            keys = " ".join(f"{str(row[c]):<24}" for c in args.by)
+            flag = " *" if row['estimated_calls'] else ""
+            print(f"{keys} {row['calls']:>7} {row['failed_calls']:>7} {row['input_tokens']:>11,} "
+                  f"{row['output_tokens']:>11,} {row['cost']:>10.2f}{flag}")
+        print(f"\nTotal spend: ${ledger.total_cost():.2f}  (* includes estimated token counts)")
+
+    elif args.project:
+        print(f"\n{'Model':<20} {'Done':>6} {'Total':>6} {'Spent':>9} {'$/job':>8} {'Projected':>10}")
+        print("-" * 65)
+        projections = ledger.project({m: args.jobs_per_model for m in MODEL_PRICING})
+        for p in projections:
+            print(f"{p['model']:<20} {p['jobs_done']:>6} {p['jobs_total']:>6} {p['spent']:>9.2f} "
+                  f"{p['cost_per_job']:>8.3f} {p['projected_total']:>10.2f}")
+        print(f"\nProjected full run: ${sum(p['projected_total'] for p in projections):.2f}")
+
+    else:
+        parser.print_help()
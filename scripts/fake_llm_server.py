@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Local Fake-LLM Translation Server
+
+A stand-in for the four provider APIs so the orchestration layer
+(run_full_pipeline, queue workers, retries, streaming, cost ledger) can be
+load-tested offline without API keys or spend.
+
+Endpoints (streaming and non-streaming):
+- OpenAI / Moonshot:  POST /v1/chat/completions
+- Anthropic:          POST /v1/messages
+- Gemini:             POST /v1beta/models/{model}:generateContent
+                      POST /v1beta/models/{model}:streamGenerateContent?alt=sse
+
+Behaviour:
+- Deterministic pseudo-translations: the same input text and target language
+  always produce the same output (a language tag plus a seeded ~2% word drop),
+  so back-translations score high but not perfect
+- Time-to-first-token drawn from a lognormal distribution (--ttft-median, --ttft-sigma)
+- Output streamed at --tps words per second
+- Error injection: --rate-limit-rate (429 with Retry-After) and --error-rate (500)
+- Optional HTTPS (--certfile/--keyfile), also usable as the local HTTPS
+  stand-in for provider_transport.py --check
+
+Usage:
+  python fake_llm_server.py --port 8765
+  python fake_llm_server.py --port 8765 --ttft-median 0.5 --tps 200 --rate-limit-rate 0.05
+  python run_medlineplus_pipeline.py --run --fake-llm http://127.0.0.1:8765 --scale 10
+"""
+
+import hashlib
+import json
+import math
+import random
+import re
+import ssl
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+@dataclass
+class FakeLLMConfig:
+    ttft_median: float = 0.8        # seconds
+    ttft_sigma: float = 0.5         # lognormal shape
+    tps: float = 60.0               # output words per second
+    rate_limit_rate: float = 0.0    # fraction of requests answered with 429
+    error_rate: float = 0.0         # fraction of requests answered with 500
+    drop_rate: float = 0.02         # fraction of words dropped by the pseudo-translation
+    chunk_words: int = 5            # words per streamed chunk
+    seed: int = 0
+
+
+# =============================================================================
+# DETERMINISTIC PSEUDO-TRANSLATION
+# =============================================================================
+
+TRANSLATE_PATTERN = re.compile(
+    r"Translate the following (?P<source>.+?) medical document into (?P<target>.+?)\.\s*\n\n(?P<text>.*)",
+    re.DOTALL
+)
+LANGUAGE_TAG = re.compile(r"^\[[^\]\n]+\] ", re.MULTILINE)
+
+
+def parse_prompt(prompt: str) -> tuple[str, str]:
+    """Return (target_language, text) from a translation prompt."""
+    match = TRANSLATE_PATTERN.search(prompt)
+    if match:
+        return match.group('target').strip(), match.group('text')
+    return "English", prompt
+
+
+def pseudo_translate(text: str, target_language: str, drop_rate: float = 0.02) -> str:
+    """
+    Deterministic stand-in translation.
+
+    Into a foreign language: every line gets a "[Language] " tag.
+    Into English: tags are stripped. Either way ~drop_rate of words are
+    dropped, seeded by the content, so the round trip is lossy but repeatable.
+    """
+    seed = hashlib.sha256(f"{target_language}\x00{text}".encode('utf-8')).digest()
+    rng = random.Random(seed)
+
+    if target_language.lower() == "english":
+        text = LANGUAGE_TAG.sub("", text)
+        tag = ""
+    else:
+        tag = f"[{target_language}] "
+
+    lines = []
+    for line in text.split("\n"):
+        words = [w for w in line.split(" ") if not w or rng.random() >= drop_rate]
+        line = " ".join(words)
+        lines.append(f"{tag}{line}" if line.strip() and tag else line)
+    return "\n".join(lines)
+
+
+def count_tokens(text: str) -> int:
+    return len(text.split())
+
+
+# =============================================================================
+# REQUEST HANDLER
+# =============================================================================
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, chunked streaming
+    config = FakeLLMConfig()
+    _rng = random.Random(0)
+    _rng_lock = threading.Lock()
+    request_count = 0
+
+    def log_message(self, format, *args):
+        pass  # Thousands of requests per load test; keep the console quiet
+
+    # --- helpers -----------------------------------------------------------
+
+    def _draw(self) -> tuple[float, float]:
+        with self._rng_lock:
+            FakeLLMHandler.request_count += 1
+            ttft = self.config.ttft_median * math.exp(self._rng.gauss(0, self.config.ttft_sigma))
+            return ttft, self._rng.random()
+
+    def _send_json(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _sse(self, payload: dict, event: str = None):
+        prefix = f"event: {event}\n" if event else ""
+        self._write_chunk(f"{prefix}data: {json.dumps(payload)}\n\n".encode('utf-8'))
+
+    def _word_chunks(self, text: str):
+        """Yield the output in chunks, paced at config.tps words per second."""
+        pieces = re.findall(r"\S+\s*|\s+", text)
+        step = max(1, self.config.chunk_words)
+        for i in range(0, len(pieces), step):
+            chunk = "".join(pieces[i:i + step])
+            time.sleep(len(chunk.split()) / self.config.tps if self.config.tps > 0 else 0)
+            yield chunk
+
+    def _inject_failure(self, roll: float) -> bool:
+        if roll < self.config.rate_limit_rate:
+            self._send_json(429, {"error": {"type": "rate_limit_error", "code": 429,
+                                            "message": "Rate limit exceeded (fake server)"}},
+                            headers={"Retry-After": "1"})
+            return True
+        if roll < self.config.rate_limit_rate + self.config.error_rate:
+            self._send_json(500, {"error": {"type": "api_error", "code": 500,
+                                            "message": "Internal error (fake server)"}})
+            return True
+        return False
+
+    # --- routing -----------------------------------------------------------
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        self._send_json(200, {"status": "ok", "requests": self.request_count})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        path = urlparse(self.path).path
+
+        ttft, roll = self._draw()
+        if self._inject_failure(roll):
+            return
+
+        if path.endswith("/chat/completions"):
+            prompt = body["messages"][-1]["content"]
+            handler = self._openai
+        elif path.endswith("/messages"):
+            content = body["messages"][-1]["content"]
+            prompt = content if isinstance(content, str) else "".join(b.get("text", "") for b in content)
+            handler = self._anthropic
+        elif ":generateContent" in path or ":streamGenerateContent" in path:
+            contents = body.get("contents", [])
+            prompt = "".join(p.get("text", "") for c in contents[-1:] for p in c.get("parts", []))
+            handler = self._gemini
+            body["stream"] = ":streamGenerateContent" in path
+            body["model"] = path.split("/models/")[-1].split(":")[0]
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown endpoint: {path}"}})
+            return
+
+        target, text = parse_prompt(prompt)
+        output = pseudo_translate(text, target, self.config.drop_rate)
+        time.sleep(ttft)
+        handler(body, output, count_tokens(prompt), count_tokens(output))
+
+    # --- provider formats --------------------------------------------------
+
+    def _openai(self, body: dict, output: str, input_tokens: int, output_tokens: int):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        model = body.get("model", "fake")
+        usage = {"prompt_tokens": input_tokens, "completion_tokens": output_tokens,
+                 "total_tokens": input_tokens + output_tokens}
+
+        if not body.get("stream"):
+            time.sleep(output_tokens / self.config.tps if self.config.tps > 0 else 0)
+            self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": output}}],
+                "usage": usage,
+            })
+            return
+
+        def chunk(delta, finish_reason=None):
+            return {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                    "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+        self._start_stream()
+        self._sse(chunk({"role": "assistant", "content": ""}))
+        for piece in self._word_chunks(output):
+            self._sse(chunk({"content": piece}))
+        self._sse(chunk({}, "stop"))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self._sse({"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                       "model": model, "choices": [], "usage": usage})
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._end_stream()
+
+    def _anthropic(self, body: dict, output: str, input_tokens: int, output_tokens: int):
+        message_id = f"msg_{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "fake")
+
+        if not body.get("stream"):
+            time.sleep(output_tokens / self.config.tps if self.config.tps > 0 else 0)
+            self._send_json(200, {
+                "id": message_id, "type": "message", "role": "assistant", "model": model,
+                "content": [{"type": "text", "text": output}],
+                "stop_reason": "end_turn", "stop_sequence": None,
+                "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+            })
+            return
+
+        self._start_stream()
+        self._sse({"type": "message_start", "message": {
+            "id": message_id, "type": "message", "role": "assistant", "model": model,
+            "content": [], "stop_reason": None, "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": 1}}}, "message_start")
+        self._sse({"type": "content_block_start", "index": 0,
+                   "content_block": {"type": "text", "text": ""}}, "content_block_start")
+        for piece in self._word_chunks(output):
+            self._sse({"type": "content_block_delta", "index": 0,
+                       "delta": {"type": "text_delta", "text": piece}}, "content_block_delta")
+        self._sse({"type": "content_block_stop", "index": 0}, "content_block_stop")
+        self._sse({"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                   "usage": {"output_tokens": output_tokens}}, "message_delta")
+        self._sse({"type": "message_stop"}, "message_stop")
+        self._end_stream()
+
+    def _gemini(self, body: dict, output: str, input_tokens: int, output_tokens: int):
+        def response(text, final):
+            candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+            if final:
+                candidate["finishReason"] = "STOP"
+            return {"candidates": [candidate], "modelVersion": body["model"],
+                    "usageMetadata": {"promptTokenCount": input_tokens,
+                                      "candidatesTokenCount": output_tokens,
+                                      "totalTokenCount": input_tokens + output_tokens}}
+
+        if not body.get("stream"):
+            time.sleep(output_tokens / self.config.tps if self.config.tps > 0 else 0)
+            self._send_json(200, response(output, True))
+            return
+
+        self._start_stream()
+        pieces = list(self._word_chunks(output)) or [""]
+        for i, piece in enumerate(pieces):
+            self._sse(response(piece, i == len(pieces) - 1))
+        self._end_stream()
+
+
+# =============================================================================
+# SERVER
+# =============================================================================
+
+def make_server(host: str = "127.0.0.1", port: int = 8765, config: FakeLLMConfig = None,
+                certfile: str = None, keyfile: str = None) -> ThreadingHTTPServer:
+    """Build (but do not start) a fake server; port=0 picks a free port."""
+    handler = type("ConfiguredFakeLLMHandler", (FakeLLMHandler,), {
+        "config": config or FakeLLMConfig(),
+        "_rng": random.Random((config or FakeLLMConfig()).seed),
+        "_rng_lock": threading.Lock(),
+        "request_count": 0,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    if certfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    return server
+
+
+def start_in_background(**kwargs) -> tuple[ThreadingHTTPServer, str]:
+    """Start a fake server on a daemon thread; returns (server, base_url)."""
+    server = make_server(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    scheme = "https" if kwargs.get("certfile") else "http"
+    host, port = server.server_address[:2]
+    return server, f"{scheme}://{host}:{port}"
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local fake LLM provider server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ttft-median", type=float, default=0.8, help="Median time to first token (s)")
+    parser.add_argument("--ttft-sigma", type=float, default=0.5, help="Lognormal sigma of TTFT")
+    parser.add_argument("--tps", type=float, default=60.0, help="Output words per second")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of 429 responses")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 500 responses")
+    parser.add_argument("--drop-rate", type=float, default=0.02, help="Fraction of words dropped")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency/error draws")
+    parser.add_argument("--certfile", help="Serve HTTPS with this certificate")
+    parser.add_argument("--keyfile", help="Private key for --certfile")
+
+    args = parser.parse_args()
+
+    config = FakeLLMConfig(
+        ttft_median=args.ttft_median,
+        ttft_sigma=args.ttft_sigma,
+        tps=args.tps,
+        rate_limit_rate=args.rate_limit_rate,
+        error_rate=args.error_rate,
+        drop_rate=args.drop_rate,
+        seed=args.seed,
+    )
+    server = make_server(args.host, args.port, config, args.certfile, args.keyfile)
+    scheme = "https" if args.certfile else "http"
+    print(f"Fake LLM server listening on {scheme}://{args.host}:{args.port}")
+    print(f"  TTFT median {config.ttft_median}s (sigma {config.ttft_sigma}), {config.tps} words/s, "
+          f"429 rate {config.rate_limit_rate}, 500 rate {config.error_rate}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down")
+        server.shutdown()
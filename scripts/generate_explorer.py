@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Generate the static results explorer for the GitHub Page.
+
+The explorer page loads a small gzip-compressed summary index first and
+fetches JSON shards only when the reader drills in:
+
+  explorer/index.html                            page (no data inlined)
+  explorer/data/index.json.gz                    models, languages, documents,
+                                                 model x language means
+  explorer/data/lang/{language}.json.gz          metric rows for one language
+  explorer/data/doc/{language}/{doc}.json.gz     texts and metrics for one
+                                                 document in one language
+
+so the first load stays the same size however many models, languages and
+documents are added. Every shard is an artifact in a build graph
+(build_graph.py), so only the shards whose rows changed are rewritten.
+"""
+
+import gzip
+import json
+import sys
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from tracing import span  # Enabled with MEDLINEPLUS_TRACE_FILE
+from text_store import load_results_file, reference_row
+from build_graph import BuildGraph, STATE_FILE, print_build_report
+from lexical_scoring import LEXICAL_STATS_FIELD
+from generate_github_outputs import MODEL_NAMES, LANGUAGE_NAMES, METRIC_NAMES
+
+BASE_DIR = Path("/Users/chukanya/Documents/Coding/Back translation project")
+RESULTS_FILE = BASE_DIR / "output" / "medlineplus_results" / "all_results.json"
+METRICS_FILE = BASE_DIR / "output" / "medlineplus_metrics" / "all_metrics.json"
+OUTPUT_DIR = BASE_DIR / "output" / "github_pages" / "explorer"
+
+# Metrics shown in the summary index (the shards carry every metric)
+INDEX_METRICS = [
+    "same_lang_comet", "same_lang_bleu", "same_lang_chrf", "cross_lang_labse",
+    "backtrans_bleu", "backtrans_chrf", "prof_backtrans_bleu", "prof_backtrans_labse",
+]
+
+DOC_TEXT_FIELDS = ("english_original", "professional_translation", "professional_back_translation")
+MODEL_TEXT_FIELDS = ("llm_translation", "llm_back_translation")
+
+
+def doc_slug(doc_id: str) -> str:
+    return doc_id.replace('/', '__')
+
+
+def write_shard(path: Path, data) -> Path:
+    """Compact JSON, gzipped with a fixed timestamp so unchanged data gives identical files."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    with open(path, 'wb') as f:
+        with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=9, mtime=0) as gz:
+            gz.write(payload)
+    return path
+
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return round(sum(values) / len(values), 4) if values else None
+
+
+# =============================================================================
+# SHARDS
+# =============================================================================
+
+def build_index(metrics: list, path: Path):
+    """Summary index: labels, document list and model x language means of INDEX_METRICS."""
+    models = [m for m in MODEL_NAMES if any(r['model'] == m for r in metrics)]
+    languages = [l for l in LANGUAGE_NAMES if any(r['language'] == l for r in metrics)]
+    cells = {}
+    for row in metrics:
+        cells.setdefault((row['model'], row['language']), []).append(row)
+
+    documents = []
+    for doc_id in sorted({row['doc_id'] for row in metrics}):
+        category, topic = doc_id.split('/')[:2]
+        documents.append({'id': doc_id, 'slug': doc_slug(doc_id), 'category': category,
+                          'topic': topic.replace('-', ' ').replace('_', ' ').title()})
+
+    return write_shard(path, {
+        'models': {m: MODEL_NAMES[m] for m in models},
+        'languages': {l: LANGUAGE_NAMES[l] for l in languages},
+        'metrics': {m: METRIC_NAMES.get(m, m) for m in INDEX_METRICS},
+        'documents': documents,
+        # means[metric][language index][model index]
+        'means': {metric: [[_mean(r.get(metric) for r in cells.get((m, l), [])) for m in models]
+                           for l in languages]
+                  for metric in INDEX_METRICS},
+    })
+
+
+def build_language_shard(language: str, metrics: list, path: Path):
+    """Every metric row for one language, as columns + rows."""
+    columns = list(dict.fromkeys(k for row in metrics for k in row if k not in ('language', LEXICAL_STATS_FIELD)))
+    rows = [[row.get(c) for c in columns] for row in sorted(metrics, key=lambda r: (r['doc_id'], r['model']))]
+    return write_shard(path, {'language': language, 'columns': columns, 'rows': rows})
+
+
+def build_document_shard(doc_id: str, language: str, results: list, metrics: list, path: Path):
+    """Source, professional and per-model texts plus metrics for one document in one language."""
+    metrics_by_model = {row['model']: row for row in metrics}
+    first = results[0]
+    return write_shard(path, {
+        'doc_id': doc_id,
+        'language': language,
+        **{field: first.get(field) or "" for field in DOC_TEXT_FIELDS},
+        'models': {
+            result['model']: {
+                **{field: result.get(field) or "" for field in MODEL_TEXT_FIELDS},
+                'success': result.get('success', True),
+                'metrics': {k: v for k, v in metrics_by_model.get(result['model'], {}).items()
+                            if k not in ('doc_id', 'model', 'language', LEXICAL_STATS_FIELD)},
+            }
+            for result in sorted(results, key=lambda r: list(MODEL_NAMES).index(r['model'])
+                                 if r['model'] in MODEL_NAMES else len(MODEL_NAMES))
+        },
+    })
+
+
+def write_page(path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(EXPLORER_HTML, encoding='utf-8')
+    return path
+
+
+# =============================================================================
+# PAGE
+# =============================================================================
+
+EXPLORER_HTML = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Results Explorer: LLM Back-Translation Study</title>
+    <style>
+        body {
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+            max-width: 1400px;
+            margin: 0 auto;
+            padding: 20px;
+            background: #f9fafb;
+            color: #1f2937;
+        }
+        h1 { border-bottom: 2px solid #2563eb; padding-bottom: 10px; }
+        nav { margin: 10px 0 20px; }
+        nav a { color: #2563eb; cursor: pointer; }
+        table { border-collapse: collapse; background: white; width: 100%; }
+        th, td { padding: 6px 10px; border-bottom: 1px solid #e5e7eb; text-align: right; }
+        th:first-child, td:first-child { text-align: left; }
+        th { background: #f3f4f6; }
+        tr.link { cursor: pointer; }
+        tr.link:hover { background: #eff6ff; }
+        .grid { display: grid; grid-template-columns: 1fr 1fr; gap: 16px; }
+        .text-box {
+            background: white;
+            border: 1px solid #e5e7eb;
+            border-radius: 4px;
+            padding: 12px;
+            white-space: pre-wrap;
+            font-size: 14px;
+            line-height: 1.6;
+            max-height: 480px;
+            overflow-y: auto;
+        }
+        .label { font-weight: bold; margin: 12px 0 6px; }
+        details { background: white; border-radius: 8px; padding: 12px; margin: 12px 0; }
+        summary { cursor: pointer; font-weight: bold; }
+        .badge {
+            display: inline-block;
+            background: #4b5563;
+            color: white;
+            padding: 2px 8px;
+            border-radius: 4px;
+            font-size: 12px;
+            margin: 2px;
+        }
+        #status { color: #6b7280; }
+    </style>
+</head>
+<body>
+    <h1>Results Explorer</h1>
+    <nav id="nav"></nav>
+    <p>
+        Metric: <select id="metric"></select>
+        <span id="status"></span>
+    </p>
+    <div id="view"></div>
+
+<script>
+const cache = {};
+let index = null;
+
+// Shards are gzipped JSON; decompress in the browser unless the server already did
+async function load(path) {
+    if (!(path in cache)) {
+        cache[path] = (async () => {
+            const response = await fetch('data/' + path);
+            if (!response.ok) throw new Error(path + ': HTTP ' + response.status);
+            let bytes = new Uint8Array(await response.arrayBuffer());
+            if (bytes[0] === 0x1f && bytes[1] === 0x8b) {
+                const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+                bytes = new Uint8Array(await new Response(stream).arrayBuffer());
+            }
+            return JSON.parse(new TextDecoder().decode(bytes));
+        })();
+    }
+    return cache[path];
+}
+
+function el(tag, attrs = {}, ...children) {
+    const node = document.createElement(tag);
+    for (const [key, value] of Object.entries(attrs)) {
+        if (key === 'onclick') node.onclick = value; else node.setAttribute(key, value);
+    }
+    for (const child of children) node.append(child instanceof Node ? child : String(child ?? ''));
+    return node;
+}
+
+function fmt(value, metric) {
+    if (value === null || value === undefined) return '–';
+    return /bleu|chrf/.test(metric) ? value.toFixed(1) : Number.isInteger(value) ? value : value.toFixed(3);
+}
+
+function metric() { return document.getElementById('metric').value; }
+
+function setNav(...links) {
+    const nav = document.getElementById('nav');
+    nav.replaceChildren(el('a', {onclick: () => go('')}, 'All languages'));
+    for (const [label, hash] of links) {
+        nav.append(' › ', hash === null ? label : el('a', {onclick: () => go(hash)}, label));
+    }
+}
+
+function go(hash) { location.hash = hash; }
+
+function renderSummary() {
+    setNav();
+    const models = Object.keys(index.models), languages = Object.keys(index.languages);
+    const means = index.means[metric()];
+    const table = el('table', {}, el('tr', {}, el('th', {}, 'Language'),
+        ...models.map(m => el('th', {}, index.models[m]))));
+    languages.forEach((language, i) => {
+        table.append(el('tr', {class: 'link', onclick: () => go('lang=' + language)},
+            el('td', {}, index.languages[language]),
+            ...models.map((m, j) => el('td', {}, fmt(means[i][j], metric())))));
+    });
+    document.getElementById('view').replaceChildren(table);
+}
+
+async function renderLanguage(language) {
+    setNav([index.languages[language], null]);
+    const shard = await load('lang/' + language + '.json.gz');
+    const col = Object.fromEntries(shard.columns.map((c, i) => [c, i]));
+    const models = Object.keys(index.models);
+    const byDoc = {};
+    for (const row of shard.rows) {
+        (byDoc[row[col.doc_id]] ??= {})[row[col.model]] = row[col[metric()]];
+    }
+    const table = el('table', {}, el('tr', {}, el('th', {}, 'Document'), el('th', {}, 'Category'),
+        ...models.map(m => el('th', {}, index.models[m]))));
+    for (const doc of index.documents) {
+        if (!byDoc[doc.id]) continue;
+        table.append(el('tr', {class: 'link', onclick: () => go('lang=' + language + '&doc=' + doc.slug)},
+            el('td', {}, doc.topic), el('td', {}, doc.category),
+            ...models.map(m => el('td', {}, fmt(byDoc[doc.id][m], metric())))));
+    }
+    document.getElementById('view').replaceChildren(table);
+}
+
+function textBox(label, text) {
+    return el('div', {}, el('div', {class: 'label'}, label), el('div', {class: 'text-box'}, text));
+}
+
+async function renderDocument(language, slug) {
+    const doc = index.documents.find(d => d.slug === slug);
+    setNav([index.languages[language], 'lang=' + language], [doc ? doc.topic : slug, null]);
+    const shard = await load('doc/' + language + '/' + slug + '.json.gz');
+    const view = [
+        el('div', {class: 'grid'},
+            textBox('Original English', shard.english_original),
+            textBox('Professional Translation', shard.professional_translation)),
+        textBox('Professional Back-Translation', shard.professional_back_translation),
+    ];
+    for (const [model, entry] of Object.entries(shard.models)) {
+        const badges = Object.keys(index.metrics).filter(m => m in entry.metrics)
+            .map(m => el('span', {class: 'badge'}, index.metrics[m] + ': ' + fmt(entry.metrics[m], m)));
+        view.push(el('details', {},
+            el('summary', {}, (index.models[model] || model) + (entry.success ? '' : ' (failed)')),
+            el('p', {}, ...badges),
+            el('div', {class: 'grid'},
+                textBox('LLM Translation', entry.llm_translation),
+                textBox('LLM Back-Translation', entry.llm_back_translation))));
+    }
+    document.getElementById('view').replaceChildren(...view);
+}
+
+async function route() {
+    const params = new URLSearchParams(location.hash.slice(1));
+    const status = document.getElementById('status');
+    status.textContent = 'Loading…';
+    try {
+        if (params.get('doc')) await renderDocument(params.get('lang'), params.get('doc'));
+        else if (params.get('lang')) await renderLanguage(params.get('lang'));
+        else renderSummary();
+        status.textContent = '';
+    } catch (error) {
+        status.textContent = 'Could not load data: ' + error.message;
+    }
+}
+
+(async () => {
+    index = await load('index.json.gz');
+    const select = document.getElementById('metric');
+    for (const [key, label] of Object.entries(index.metrics)) select.append(el('option', {value: key}, label));
+    select.onchange = route;
+    window.onhashchange = route;
+    route();
+})();
+</script>
+</body>
+</html>
+"""
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def main(force=False):
+    print("Loading data...")
+    with span("report.load"):
+        results = load_results_file(RESULTS_FILE)  # Texts are read only for shards being rebuilt
+        with open(METRICS_FILE, 'r', encoding='utf-8') as f:
+            metrics = json.load(f)
+
+    # Split rows per language and per (document, language) in one pass
+    lang_metrics, doc_results, doc_metrics = {}, {}, {}
+    for row in metrics:
+        lang_metrics.setdefault(row['language'], []).append(row)
+        doc_metrics.setdefault((row['doc_id'], row['language']), []).append(row)
+    for row in results:
+        doc_results.setdefault((row['doc_id'], row['language']), []).append(row)
+
+    data_dir = OUTPUT_DIR / "data"
+    graph = BuildGraph(OUTPUT_DIR / STATE_FILE)
+    graph.add("page", [OUTPUT_DIR / "index.html"], inputs={},
+              build=write_page, args=(OUTPUT_DIR / "index.html",), code=(write_page, EXPLORER_HTML))
+    graph.add("index", [data_dir / "index.json.gz"], inputs={'metric_rows': metrics},
+              build=build_index, args=(metrics, data_dir / "index.json.gz"),
+              code=(build_index, write_shard, INDEX_METRICS, MODEL_NAMES, LANGUAGE_NAMES, METRIC_NAMES))
+    for language, rows in lang_metrics.items():
+        path = data_dir / "lang" / f"{language}.json.gz"
+        graph.add(f"lang/{language}", [path], inputs={'metric_rows': rows},
+                  build=build_language_shard, args=(language, rows, path),
+                  code=(build_language_shard, write_shard))
+    for (doc_id, language), rows in doc_results.items():
+        path = data_dir / "doc" / language / f"{doc_slug(doc_id)}.json.gz"
+        row_metrics = doc_metrics.get((doc_id, language), [])
+        graph.add(f"doc/{language}/{doc_slug(doc_id)}", [path],
+                  inputs={'result_rows': [reference_row(r) for r in rows], 'metric_rows': row_metrics},
+                  build=build_document_shard, args=(doc_id, language, rows, row_metrics, path),
+                  code=(build_document_shard, write_shard, DOC_TEXT_FIELDS, MODEL_TEXT_FIELDS))
+
+    with span("report.explorer", artifacts=len(graph.artifacts)):
+        records = graph.run(force=force)
+
+    rebuilt = [r for r in records if r['rebuilt']]
+    if len(rebuilt) > 20:
+        print(f"  rebuilt    {len(rebuilt)} artifacts")
+        print(f"  up to date {len(records) - len(rebuilt)} of {len(records)} artifacts")
+    else:
+        print_build_report(records)
+
+    shard_bytes = sum(p.stat().st_size for p in data_dir.rglob("*.json.gz"))
+    index_bytes = (data_dir / "index.json.gz").stat().st_size
+    print(f"\nExplorer saved to: {OUTPUT_DIR} (index {index_bytes / 1024:.1f} KB, "
+          f"all shards {shard_bytes / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate the static results explorer")
+    parser.add_argument("--force", action="store_true", help="Rewrite every shard, even if up to date")
+    args = parser.parse_args()
+
+    main(args.force)
@@ -3,21 +3,30 @@
 Generate GitHub Page outputs for MedlinePlus Back-Translation Study.
 
 Outputs:
-1. Excel report with multiple tabs (summary, by model, by language, detailed)
+1. Excel report with multiple tabs (summary, by model, by language, detailed,
+   sentence-level alignment), streamed in openpyxl write-only mode
 2. Visualization charts (PNG files)
 3. README.md with executive summary
 4. Kevin scorecard
+
+Outputs are artifacts in a build graph (build_graph.py): each is rebuilt only
+when its inputs or rendering code changed since its last build.
 """
 
+import hashlib
 import json
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')  # Non-interactive backend
-import numpy as np
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
 
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from tracing import span  # Enabled with MEDLINEPLUS_TRACE_FILE
+from build_graph import BuildGraph, STATE_FILE, code_fingerprint, print_build_report
+from lexical_scoring import LEXICAL_STATS_FIELD
+
 # =============================================================================
 # PATHS
 # =============================================================================
@@ -87,7 +96,10 @@ def load_data():
 
 def create_dataframe(all_metrics):
     """Convert metrics to pandas DataFrame."""
-    df = pd.DataFrame(all_metrics)
+    import pandas as pd
+
+    # Per-row BLEU/chrF statistics are for corpus scores (summary.json), not for the report
+    df = pd.DataFrame(all_metrics).drop(columns=[LEXICAL_STATS_FIELD], errors='ignore')
 
     # Add display names
     df['Model'] = df['model'].map(MODEL_NAMES)
@@ -103,94 +115,171 @@ def create_dataframe(all_metrics):
 # =============================================================================
 # EXCEL REPORT
 # =============================================================================
+#
+# The workbook is written with openpyxl in write-only mode: rows are appended
+# to each sheet's temporary file as they are produced, so memory does not
+# grow with the number of rows. Detail tabs read their columns from the base
+# DataFrame by position, row by row, instead of copying it per tab.
+
+EXCEL_FILE = "medlineplus_backtranslation_report.xlsx"
+EXCEL_MAX_ROWS = 1_048_576  # Per sheet, header included; longer tabs continue on "Name (2)", ...
+ALIGNMENT_FILE = METRICS_DIR / "sentence_alignment.jsonl"
+
+LABEL_COLUMNS = [('Model', 'Model'), ('Language', 'Language'), ('Category', 'Category'), ('Topic', 'Topic')]
+
+# Sheet name -> [(DataFrame column, header)]; metric columns missing from the data are left out
+DETAIL_TABS = {
+    'Goal 1 - Meaning': LABEL_COLUMNS + [
+        ('backtrans_bleu', 'BLEU'), ('cross_lang_labse', 'LaBSE'),
+        ('backtrans_bertscore', 'BERTScore'), ('cross_lang_comet_qe', 'COMET-QE'),
+    ],
+    'Goal 2 - Professional': LABEL_COLUMNS + [
+        ('same_lang_bleu', 'BLEU'), ('same_lang_chrf', 'chrF'),
+        ('same_lang_bertscore', 'BERTScore'), ('same_lang_comet', 'COMET'),
+    ],
+    'Goal 3 - Baseline': LABEL_COLUMNS + [
+        ('prof_backtrans_bleu', 'BLEU'), ('prof_backtrans_labse', 'LaBSE'),
+        ('prof_backtrans_bertscore', 'BERTScore'),
+    ],
+}
+
+SENTENCE_HEADER = ['Model', 'Language', 'Category', 'Topic', 'Back-Translation', 'Sentence',
+                   'Aligned To', 'Similarity', 'Flag', 'English Sentence (flagged)']
+
+
+def _cell(value):
+    """Floats rounded to 3 places; NaN becomes an empty cell; numpy scalars become Python values."""
+    if isinstance(value, float):
+        return None if value != value else round(value, 3)
+    if hasattr(value, 'item'):
+        return _cell(value.item())
+    return value
+
+
+class StreamingWorkbook:
+    """openpyxl write-only workbook."""
+
+    def __init__(self):
+        from openpyxl import Workbook
+        self.workbook = Workbook(write_only=True)
+
+    def write_rows(self, name: str, header: list, rows) -> int:
+        """Stream rows into sheet `name`, continuing on further sheets past Excel's row limit."""
+        sheet, part, filled, total = None, 0, EXCEL_MAX_ROWS, 0
+        for row in rows:
+            if filled >= EXCEL_MAX_ROWS:
+                part += 1
+                sheet = self.workbook.create_sheet(name if part == 1 else f"{name[:26]} ({part})")
+                sheet.append(header)
+                filled = 1
+            sheet.append([_cell(value) for value in row])
+            filled += 1
+            total += 1
+        if sheet is None:
+            self.workbook.create_sheet(name).append(header)
+        return total
+
+    def write_frame(self, name: str, frame, index: bool = False) -> int:
+        """Write a small DataFrame (summary tabs)."""
+        header = ([''] if index else []) + [str(c) for c in frame.columns]
+        rows = frame.itertuples(index=index, name=None)
+        return self.write_rows(name, header, rows)
+
+    def save(self, path):
+        self.workbook.save(path)
+
+
+def frame_rows(df, columns: list):
+    """Rows of the selected columns, read by position from the base frame (no copy)."""
+    positions = [df.columns.get_loc(c) for c in columns]
+    for row in df.itertuples(index=False, name=None):
+        yield [row[p] for p in positions]
+
+
+def doc_labels(doc_id: str) -> tuple[str, str]:
+    """(Category, Topic) display labels, as in create_dataframe."""
+    category, topic = doc_id.split('/')[:2]
+    return category.title(), topic.replace('-', ' ').replace('_', ' ').title()
+
+
+def sentence_rows(alignment_file=None):
+    """
+    One row per English sentence of every aligned back-translation.
+
+    sentence_alignment.py writes one JSON line per entry, read here a line at
+    a time, so only the entry being expanded is held in memory.
+    """
+    with open(alignment_file or ALIGNMENT_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            category, topic = doc_labels(entry['doc_id'])
+            labels = [MODEL_NAMES.get(entry['model'], entry['model']),
+                      LANGUAGE_NAMES.get(entry['language'], entry['language']), category, topic, entry['text']]
+            flags = dict((i, flag) for i, flag in entry['flags'])
+            flagged = dict((i, text) for i, text in entry.get('flagged_sentences') or [])
+            for i, (target, similarity) in enumerate(entry['alignment']):
+                yield labels + [i + 1, target + 1 if target >= 0 else None, similarity,
+                                flags.get(i), flagged.get(i)]
+
 
 def generate_excel_report(df, summary):
     """Generate comprehensive Excel report with all three goals."""
-    excel_path = OUTPUT_DIR / "medlineplus_backtranslation_report.xlsx"
-
-    with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-        # Tab 1: Executive Summary
-        exec_summary = pd.DataFrame({
-            'Metric': ['Total Documents', 'Languages', 'Models', 'Total Translation Pairs',
-                      'Total API Calls', 'Goal 1 Winner (Meaning)', 'Goal 2 Winner (Professional)',
-                      'Best Language', 'Hardest Language'],
-            'Value': ['22 (11 vaccine VIS + 11 cancer)', '8', '4', '704',
-                     '2,112 (704 × 3 steps)', 'Claude Opus 4.5', 'Gemini 3 Pro',
-                     'Spanish', 'Arabic']
-        })
-        exec_summary.to_excel(writer, sheet_name='Executive Summary', index=False)
-
-        # Tab 2: By Model Summary
-        model_summary = pd.DataFrame(summary['by_model']).T
-        model_summary.index = model_summary.index.map(MODEL_NAMES)
-        model_summary.columns = [METRIC_NAMES.get(c, c) for c in model_summary.columns]
-        model_summary = model_summary.round(3)
-        model_summary.to_excel(writer, sheet_name='By Model')
-
-        # Tab 3: By Language Summary
-        lang_summary = pd.DataFrame(summary['by_language']).T
-        lang_summary.index = lang_summary.index.map(LANGUAGE_NAMES)
-        lang_summary.columns = [METRIC_NAMES.get(c, c) for c in lang_summary.columns]
-        lang_summary = lang_summary.round(3)
-        lang_summary.to_excel(writer, sheet_name='By Language')
-
-        # Tab 4: By Category Summary
-        if 'by_category' in summary:
-            cat_summary = pd.DataFrame(summary['by_category']).T
-            cat_summary.columns = [METRIC_NAMES.get(c, c) for c in cat_summary.columns]
-            cat_summary = cat_summary.round(3)
-            cat_summary.to_excel(writer, sheet_name='By Category')
-
-        # Tab 5: Goal 1 - LLM Meaning Preservation (Back-trans vs Original)
-        goal1_cols = ['Model', 'Language', 'Category', 'Topic',
-                      'backtrans_bleu', 'cross_lang_labse', 'backtrans_bertscore', 'cross_lang_comet_qe']
-        goal1_df = df[[c for c in goal1_cols if c in df.columns]].copy()
-        goal1_df.columns = ['Model', 'Language', 'Category', 'Topic', 'BLEU', 'LaBSE', 'BERTScore', 'COMET-QE']
-        goal1_df = goal1_df.round(3)
-        goal1_df.to_excel(writer, sheet_name='Goal 1 - Meaning', index=False)
-
-        # Tab 6: Goal 2 - Professional Alignment (LLM vs Professional)
-        goal2_cols = ['Model', 'Language', 'Category', 'Topic',
-                     'same_lang_bleu', 'same_lang_chrf', 'same_lang_bertscore', 'same_lang_comet']
-        goal2_df = df[goal2_cols].copy()
-        goal2_df.columns = ['Model', 'Language', 'Category', 'Topic', 'BLEU', 'chrF', 'BERTScore', 'COMET']
-        goal2_df = goal2_df.round(3)
-        goal2_df.to_excel(writer, sheet_name='Goal 2 - Professional', index=False)
-
-        # Tab 7: Goal 3 - Professional Baseline (Prof back-trans vs Original)
-        goal3_cols = ['Model', 'Language', 'Category', 'Topic']
-        optional_g3_cols = ['prof_backtrans_bleu', 'prof_backtrans_labse', 'prof_backtrans_bertscore']
-        for col in optional_g3_cols:
-            if col in df.columns:
-                goal3_cols.append(col)
-        if len(goal3_cols) > 4:  # Has Goal 3 data
-            goal3_df = df[goal3_cols].copy()
-            new_cols = ['Model', 'Language', 'Category', 'Topic']
-            if 'prof_backtrans_bleu' in goal3_cols:
-                new_cols.append('BLEU')
-            if 'prof_backtrans_labse' in goal3_cols:
-                new_cols.append('LaBSE')
-            if 'prof_backtrans_bertscore' in goal3_cols:
-                new_cols.append('BERTScore')
-            goal3_df.columns = new_cols
-            goal3_df = goal3_df.round(3)
-            goal3_df.to_excel(writer, sheet_name='Goal 3 - Baseline', index=False)
-
-        # Tab 8: Full Detailed Data
-        full_df = df.copy()
-        full_df = full_df.round(3)
-        full_df.to_excel(writer, sheet_name='All Data', index=False)
-
-        # Tab 9: Kevin Scorecard
-        scorecard = create_kevin_scorecard(df, summary)
-        scorecard.to_excel(writer, sheet_name='Kevin Scorecard', index=False)
-
+    import pandas as pd
+
+    excel_path = OUTPUT_DIR / EXCEL_FILE
+    workbook = StreamingWorkbook()
+
+    # Tab 1: Executive Summary
+    exec_summary = pd.DataFrame({
+        'Metric': ['Total Documents', 'Languages', 'Models', 'Total Translation Pairs',
+                  'Total API Calls', 'Goal 1 Winner (Meaning)', 'Goal 2 Winner (Professional)',
+                  'Best Language', 'Hardest Language'],
+        'Value': ['22 (11 vaccine VIS + 11 cancer)', '8', '4', '704',
+                 '2,112 (704 × 3 steps)', 'Claude Opus 4.5', 'Gemini 3 Pro',
+                 'Spanish', 'Arabic']
+    })
+    workbook.write_frame('Executive Summary', exec_summary)
+
+    # Tabs 2-4: By Model / By Language / By Category summaries
+    for sheet_name, key, names in (('By Model', 'by_model', MODEL_NAMES),
+                                   ('By Language', 'by_language', LANGUAGE_NAMES),
+                                   ('By Category', 'by_category', None)):
+        if key not in summary:
+            continue
+        group_summary = pd.DataFrame(summary[key]).T
+        if names:
+            group_summary.index = group_summary.index.map(names)
+        group_summary.columns = [METRIC_NAMES.get(c, c) for c in group_summary.columns]
+        workbook.write_frame(sheet_name, group_summary, index=True)
+
+    # Tabs 5-7: Goal detail tabs
+    for sheet_name, columns in DETAIL_TABS.items():
+        columns = [(c, h) for c, h in columns if c in df.columns]
+        if len(columns) > len(LABEL_COLUMNS):  # Has data for this goal
+            workbook.write_rows(sheet_name, [h for _, h in columns], frame_rows(df, [c for c, _ in columns]))
+
+    # Tab 8: Full Detailed Data
+    workbook.write_rows('All Data', list(df.columns), frame_rows(df, list(df.columns)))
+
+    # Tab 9: Kevin Scorecard
+    workbook.write_frame('Kevin Scorecard', create_kevin_scorecard(df, summary))
+
+    # Tab 10: Sentence-level alignment detail (when sentence_alignment.py has been run)
+    if ALIGNMENT_FILE.exists():
+        n = workbook.write_rows('Sentences', SENTENCE_HEADER, sentence_rows())
+        print(f"   {n:,} sentence rows")
+
+    workbook.save(excel_path)
     print(f"Excel report saved to: {excel_path}")
     return excel_path
 
 
 def create_kevin_scorecard(df, summary):
     """Create Kevin-style scorecard comparing models."""
+    import pandas as pd
+
     models = list(MODEL_NAMES.values())
 
     # Calculate rankings for each metric
@@ -240,32 +329,45 @@ def create_kevin_scorecard(df, summary):
 # =============================================================================
 # VISUALIZATIONS
 # =============================================================================
+#
+# Each chart is an independent task: a slice function picks out the values it
+# draws (plain JSON data, so it can be hashed and sent to a worker process)
+# and a draw function renders them. Charts are rendered in a process pool and
+# skipped when the hash of their data slice and drawing code matches the one
+# recorded at their last render (charts/.chart_cache.json).
 
-def generate_charts(df, summary):
-    """Generate visualization charts."""
-    charts_dir = OUTPUT_DIR / "charts"
-    charts_dir.mkdir(parents=True, exist_ok=True)
+CHART_CACHE_FILE = ".chart_cache.json"
+CHART_DPI = 150
+MODEL_COLORS = ['#2ecc71', '#3498db', '#e74c3c', '#9b59b6']
+SAME_LANG_METRICS = ['same_lang_bleu', 'same_lang_chrf', 'same_lang_bertscore', 'same_lang_comet']
+SAME_LANG_TITLES = ['BLEU Score', 'chrF Score', 'BERTScore', 'COMET Score']
+BACKTRANS_METRICS = ['cross_lang_xlm_roberta', 'cross_lang_labse', 'cross_lang_mbert']
+BACKTRANS_LABELS = ['XLM-RoBERTa', 'LaBSE', 'mBERT']
+
+
+def _mean(series) -> float:
+    return float(series.mean())
+
+
+# Chart 1: Model Comparison - Same Language Metrics
+
+def slice_model_comparison(df, summary):
+    return {
+        'models': list(MODEL_NAMES.values()),
+        'scores': {metric: [summary['by_model'][m][metric] for m in MODEL_NAMES] for metric in SAME_LANG_METRICS},
+    }
 
-    # Set style
-    plt.style.use('seaborn-v0_8-whitegrid')
 
-    # Chart 1: Model Comparison - Same Language Metrics
+def draw_model_comparison(data):
+    import matplotlib.pyplot as plt
+
     fig, axes = plt.subplots(2, 2, figsize=(14, 10))
     fig.suptitle('Model Comparison: Same-Language Metrics\n(LLM Translation vs Professional Translation)',
                  fontsize=14, fontweight='bold')
 
-    metrics = ['same_lang_bleu', 'same_lang_chrf', 'same_lang_bertscore', 'same_lang_comet']
-    titles = ['BLEU Score', 'chrF Score', 'BERTScore', 'COMET Score']
-
-    for ax, metric, title in zip(axes.flat, metrics, titles):
-        model_scores = []
-        model_names = []
-        for model_key, model_name in MODEL_NAMES.items():
-            model_scores.append(summary['by_model'][model_key][metric])
-            model_names.append(model_name)
-
-        colors = ['#2ecc71', '#3498db', '#e74c3c', '#9b59b6']
-        bars = ax.bar(model_names, model_scores, color=colors, edgecolor='black', linewidth=1.2)
+    for ax, metric, title in zip(axes.flat, SAME_LANG_METRICS, SAME_LANG_TITLES):
+        model_names, model_scores = data['models'], data['scores'][metric]
+        bars = ax.bar(model_names, model_scores, color=MODEL_COLORS, edgecolor='black', linewidth=1.2)
         ax.set_title(title, fontsize=12, fontweight='bold')
         ax.set_ylabel('Score')
         ax.tick_params(axis='x', rotation=15)
@@ -276,25 +378,29 @@ def generate_charts(df, summary):
                    f'{score:.1f}' if metric == 'same_lang_bleu' or metric == 'same_lang_chrf' else f'{score:.3f}',
                    ha='center', va='bottom', fontsize=10)
 
-    plt.tight_layout()
-    plt.savefig(charts_dir / 'model_comparison_same_lang.png', dpi=150, bbox_inches='tight')
-    plt.close()
 
-    # Chart 2: Language Comparison - Same Language Metrics
+# Chart 2: Language Comparison - Same Language Metrics
+
+def slice_language_comparison(df, summary):
+    # Use .get() with default since by_language may have fewer metrics
+    return {
+        'languages': list(LANGUAGE_NAMES.values()),
+        'scores': {metric: [summary['by_language'][l].get(metric, 0) for l in LANGUAGE_NAMES]
+                   for metric in SAME_LANG_METRICS},
+    }
+
+
+def draw_language_comparison(data):
+    import matplotlib.pyplot as plt
+    import numpy as np
+
     fig, axes = plt.subplots(2, 2, figsize=(16, 10))
     fig.suptitle('Language Comparison: Same-Language Metrics\n(Higher = Better Match with Professional Translation)',
                  fontsize=14, fontweight='bold')
 
-    for ax, metric, title in zip(axes.flat, metrics, titles):
-        lang_scores = []
-        lang_names = []
-        for lang_key, lang_name in LANGUAGE_NAMES.items():
-            # Use .get() with default since by_language may have fewer metrics
-            lang_scores.append(summary['by_language'][lang_key].get(metric, 0))
-            lang_names.append(lang_name)
-
+    for ax, metric, title in zip(axes.flat, SAME_LANG_METRICS, SAME_LANG_TITLES):
         # Sort by score
-        sorted_pairs = sorted(zip(lang_names, lang_scores), key=lambda x: x[1], reverse=True)
+        sorted_pairs = sorted(zip(data['languages'], data['scores'][metric]), key=lambda x: x[1], reverse=True)
         lang_names, lang_scores = zip(*sorted_pairs)
 
         colors = plt.cm.RdYlGn(np.linspace(0.2, 0.8, len(lang_names)))
@@ -309,63 +415,69 @@ def generate_charts(df, summary):
                    f'{score:.1f}' if 'bleu' in metric or 'chrf' in metric else f'{score:.3f}',
                    ha='left', va='center', fontsize=9)
 
-    plt.tight_layout()
-    plt.savefig(charts_dir / 'language_comparison_same_lang.png', dpi=150, bbox_inches='tight')
-    plt.close()
 
-    # Chart 3: Back-Translation Semantic Preservation
-    fig, ax = plt.subplots(figsize=(12, 6))
+# Chart 3: Back-Translation Semantic Preservation
+
+def slice_back_translation_similarity(df, summary):
+    return {
+        'models': list(MODEL_NAMES.values()),
+        'scores': {metric: [summary['by_model'][m][metric] for m in MODEL_NAMES] for metric in BACKTRANS_METRICS},
+    }
+
 
-    backtrans_metrics = ['cross_lang_xlm_roberta', 'cross_lang_labse', 'cross_lang_mbert']
-    backtrans_labels = ['XLM-RoBERTa', 'LaBSE', 'mBERT']
+def draw_back_translation_similarity(data):
+    import matplotlib.pyplot as plt
+    import numpy as np
 
-    x = np.arange(len(MODEL_NAMES))
+    fig, ax = plt.subplots(figsize=(12, 6))
+
+    x = np.arange(len(data['models']))
     width = 0.25
 
-    for i, (metric, label) in enumerate(zip(backtrans_metrics, backtrans_labels)):
-        scores = [summary['by_model'][m][metric] for m in MODEL_NAMES.keys()]
-        bars = ax.bar(x + i*width, scores, width, label=label, edgecolor='black', linewidth=0.8)
+    for i, (metric, label) in enumerate(zip(BACKTRANS_METRICS, BACKTRANS_LABELS)):
+        ax.bar(x + i*width, data['scores'][metric], width, label=label, edgecolor='black', linewidth=0.8)
 
     ax.set_xlabel('Model')
     ax.set_ylabel('Semantic Similarity Score')
     ax.set_title('Back-Translation Semantic Preservation\n(English Back-Translation vs Original English)',
                 fontsize=12, fontweight='bold')
     ax.set_xticks(x + width)
-    ax.set_xticklabels(MODEL_NAMES.values())
+    ax.set_xticklabels(data['models'])
     ax.legend()
     ax.set_ylim(0.85, 1.0)
 
-    plt.tight_layout()
-    plt.savefig(charts_dir / 'back_translation_similarity.png', dpi=150, bbox_inches='tight')
-    plt.close()
 
-    # Chart 4: Heatmap - Model x Language COMET scores
-    fig, ax = plt.subplots(figsize=(12, 8))
+# Chart 4: Heatmap - Model x Language COMET scores
+
+def slice_comet_heatmap(df, summary):
+    means = df.groupby(['Language', 'Model'])['same_lang_comet'].mean()
+    languages = list(LANGUAGE_NAMES.values())
+    models = list(MODEL_NAMES.values())
+    return {
+        'languages': languages,
+        'models': models,
+        'values': [[float(means.get((l, m), float('nan'))) for m in models] for l in languages],
+    }
 
-    # Create pivot table
-    pivot_df = df.pivot_table(
-        values='same_lang_comet',
-        index='Language',
-        columns='Model',
-        aggfunc='mean'
-    )
 
-    # Reorder
-    pivot_df = pivot_df[[MODEL_NAMES[k] for k in MODEL_NAMES.keys()]]
-    pivot_df = pivot_df.reindex([LANGUAGE_NAMES[k] for k in LANGUAGE_NAMES.keys()])
+def draw_comet_heatmap(data):
+    import matplotlib.pyplot as plt
+    import numpy as np
+
+    fig, ax = plt.subplots(figsize=(12, 8))
+    values = np.array(data['values'])
 
-    im = ax.imshow(pivot_df.values, cmap='RdYlGn', aspect='auto', vmin=0.65, vmax=0.9)
+    im = ax.imshow(values, cmap='RdYlGn', aspect='auto', vmin=0.65, vmax=0.9)
 
-    ax.set_xticks(np.arange(len(pivot_df.columns)))
-    ax.set_yticks(np.arange(len(pivot_df.index)))
-    ax.set_xticklabels(pivot_df.columns, rotation=15)
-    ax.set_yticklabels(pivot_df.index)
+    ax.set_xticks(np.arange(len(data['models'])))
+    ax.set_yticks(np.arange(len(data['languages'])))
+    ax.set_xticklabels(data['models'], rotation=15)
+    ax.set_yticklabels(data['languages'])
 
     # Add text annotations
-    for i in range(len(pivot_df.index)):
-        for j in range(len(pivot_df.columns)):
-            text = ax.text(j, i, f'{pivot_df.values[i, j]:.3f}',
-                          ha='center', va='center', color='black', fontsize=10)
+    for i in range(len(data['languages'])):
+        for j in range(len(data['models'])):
+            ax.text(j, i, f'{values[i, j]:.3f}', ha='center', va='center', color='black', fontsize=10)
 
     ax.set_title('COMET Score Heatmap: Model × Language\n(Translation Quality)',
                 fontsize=12, fontweight='bold')
@@ -373,105 +485,109 @@ def generate_charts(df, summary):
     cbar = plt.colorbar(im, ax=ax)
     cbar.set_label('COMET Score')
 
-    plt.tight_layout()
-    plt.savefig(charts_dir / 'comet_heatmap.png', dpi=150, bbox_inches='tight')
-    plt.close()
 
-    # Chart 5: Category Comparison (Vaccine vs Cancer)
-    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+# Chart 5: Category Comparison (Vaccine vs Cancer)
 
-    for ax, category in zip(axes, ['Immunize', 'Cancer']):
+def slice_category_comparison(df, summary):
+    data = {'models': list(MODEL_NAMES.values()), 'categories': {}}
+    for category in ['Immunize', 'Cancer']:
         cat_df = df[df['Category'] == category]
+        data['categories'][category] = {
+            'BLEU': [_mean(cat_df.loc[cat_df['Model'] == m, 'same_lang_bleu']) for m in data['models']],
+            'COMET': [_mean(cat_df.loc[cat_df['Model'] == m, 'same_lang_comet']) * 100  # Scale for visibility
+                      for m in data['models']],
+        }
+    return data
 
-        metric_means = []
-        for model_name in MODEL_NAMES.values():
-            model_df = cat_df[cat_df['Model'] == model_name]
-            metric_means.append({
-                'Model': model_name,
-                'BLEU': model_df['same_lang_bleu'].mean(),
-                'COMET': model_df['same_lang_comet'].mean() * 100  # Scale for visibility
-            })
 
-        metric_df = pd.DataFrame(metric_means)
+def draw_category_comparison(data):
+    import matplotlib.pyplot as plt
+    import numpy as np
 
-        x = np.arange(len(metric_df))
+    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+
+    for ax, (category, scores) in zip(axes, data['categories'].items()):
+        x = np.arange(len(data['models']))
         width = 0.35
 
-        ax.bar(x - width/2, metric_df['BLEU'], width, label='BLEU', color='#3498db')
-        ax.bar(x + width/2, metric_df['COMET'], width, label='COMET ×100', color='#e74c3c')
+        ax.bar(x - width/2, scores['BLEU'], width, label='BLEU', color='#3498db')
+        ax.bar(x + width/2, scores['COMET'], width, label='COMET ×100', color='#e74c3c')
 
         ax.set_xlabel('Model')
         ax.set_ylabel('Score')
         ax.set_title(f'{category} Documents', fontsize=12, fontweight='bold')
         ax.set_xticks(x)
-        ax.set_xticklabels(metric_df['Model'], rotation=15)
+        ax.set_xticklabels(data['models'], rotation=15)
         ax.legend()
 
     fig.suptitle('Performance by Document Category', fontsize=14, fontweight='bold')
-    plt.tight_layout()
-    plt.savefig(charts_dir / 'category_comparison.png', dpi=150, bbox_inches='tight')
-    plt.close()
 
-    # Chart 6: Three Goals Comparison
+
+# Chart 6: Three Goals Comparison
+
+def slice_three_goals(df, summary):
+    return {
+        'models': list(MODEL_NAMES.values()),
+        'scores': {metric: [summary['by_model'][m].get(metric, 0) for m in MODEL_NAMES]
+                   for metric in ('backtrans_bleu', 'same_lang_comet', 'prof_backtrans_bleu')},
+    }
+
+
+def draw_three_goals(data):
+    import matplotlib.pyplot as plt
+
     fig, axes = plt.subplots(1, 3, figsize=(18, 6))
+    goals = [
+        ('backtrans_bleu', 'Goal 1: LLM Meaning Preservation\n(Back-translation BLEU)', 'BLEU Score'),
+        ('same_lang_comet', 'Goal 2: Professional Alignment\n(COMET Score)', 'COMET Score'),
+        ('prof_backtrans_bleu', 'Goal 3: Professional Baseline\n(Prof Back-trans BLEU)', 'BLEU Score'),
+    ]
 
-    # Goal 1: LLM Meaning Preservation
-    ax = axes[0]
-    g1_scores = [summary['by_model'][m].get('backtrans_bleu', 0) for m in MODEL_NAMES.keys()]
-    colors = ['#2ecc71', '#3498db', '#e74c3c', '#9b59b6']
-    bars = ax.bar(MODEL_NAMES.values(), g1_scores, color=colors, edgecolor='black')
-    ax.set_title('Goal 1: LLM Meaning Preservation\n(Back-translation BLEU)', fontsize=11, fontweight='bold')
-    ax.set_ylabel('BLEU Score')
-    ax.tick_params(axis='x', rotation=15)
-    for bar, score in zip(bars, g1_scores):
-        ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.5, f'{score:.1f}',
-               ha='center', va='bottom', fontsize=10)
-
-    # Goal 2: Professional Alignment
-    ax = axes[1]
-    g2_scores = [summary['by_model'][m].get('same_lang_comet', 0) for m in MODEL_NAMES.keys()]
-    bars = ax.bar(MODEL_NAMES.values(), g2_scores, color=colors, edgecolor='black')
-    ax.set_title('Goal 2: Professional Alignment\n(COMET Score)', fontsize=11, fontweight='bold')
-    ax.set_ylabel('COMET Score')
-    ax.tick_params(axis='x', rotation=15)
-    ax.set_ylim(0.8, 0.9)
-    for bar, score in zip(bars, g2_scores):
-        ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.002, f'{score:.3f}',
-               ha='center', va='bottom', fontsize=10)
-
-    # Goal 3: Professional Baseline
-    ax = axes[2]
-    g3_scores = [summary['by_model'][m].get('prof_backtrans_bleu', 0) for m in MODEL_NAMES.keys()]
-    bars = ax.bar(MODEL_NAMES.values(), g3_scores, color=colors, edgecolor='black')
-    ax.set_title('Goal 3: Professional Baseline\n(Prof Back-trans BLEU)', fontsize=11, fontweight='bold')
-    ax.set_ylabel('BLEU Score')
-    ax.tick_params(axis='x', rotation=15)
-    for bar, score in zip(bars, g3_scores):
-        ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.5, f'{score:.1f}',
-               ha='center', va='bottom', fontsize=10)
+    for ax, (metric, title, ylabel) in zip(axes, goals):
+        scores = data['scores'][metric]
+        bars = ax.bar(data['models'], scores, color=MODEL_COLORS, edgecolor='black')
+        ax.set_title(title, fontsize=11, fontweight='bold')
+        ax.set_ylabel(ylabel)
+        ax.tick_params(axis='x', rotation=15)
+        if metric == 'same_lang_comet':
+            ax.set_ylim(0.8, 0.9)
+        for bar, score in zip(bars, scores):
+            if metric == 'same_lang_comet':
+                ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.002, f'{score:.3f}',
+                       ha='center', va='bottom', fontsize=10)
+            else:
+                ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.5, f'{score:.1f}',
+                       ha='center', va='bottom', fontsize=10)
+
+
+# Chart 7: Goal 1 vs Goal 3 (LLM vs Professional stability)
+
+def slice_llm_vs_professional(df, summary):
+    return {
+        'models': list(MODEL_NAMES.values()),
+        'g1_bleu': [summary['by_model'][m].get('backtrans_bleu', 0) for m in MODEL_NAMES],
+        'g3_bleu': [summary['by_model'][m].get('prof_backtrans_bleu', 0) for m in MODEL_NAMES],
+    }
 
-    plt.tight_layout()
-    plt.savefig(charts_dir / 'three_goals_comparison.png', dpi=150, bbox_inches='tight')
-    plt.close()
 
-    # Chart 7: Goal 1 vs Goal 3 (LLM vs Professional stability)
+def draw_llm_vs_professional(data):
+    import matplotlib.pyplot as plt
+    import numpy as np
+
     fig, ax = plt.subplots(figsize=(12, 6))
 
-    x = np.arange(len(MODEL_NAMES))
+    x = np.arange(len(data['models']))
     width = 0.35
 
-    g1_bleu = [summary['by_model'][m].get('backtrans_bleu', 0) for m in MODEL_NAMES.keys()]
-    g3_bleu = [summary['by_model'][m].get('prof_backtrans_bleu', 0) for m in MODEL_NAMES.keys()]
-
-    bars1 = ax.bar(x - width/2, g1_bleu, width, label='Goal 1: LLM Back-trans', color='#3498db', edgecolor='black')
-    bars2 = ax.bar(x + width/2, g3_bleu, width, label='Goal 3: Prof Back-trans', color='#9b59b6', edgecolor='black')
+    bars1 = ax.bar(x - width/2, data['g1_bleu'], width, label='Goal 1: LLM Back-trans', color='#3498db', edgecolor='black')
+    bars2 = ax.bar(x + width/2, data['g3_bleu'], width, label='Goal 3: Prof Back-trans', color='#9b59b6', edgecolor='black')
 
     ax.set_xlabel('Model')
     ax.set_ylabel('BLEU Score')
     ax.set_title('LLM vs Professional Translation Stability\n(Higher = better round-trip preservation)',
                 fontsize=12, fontweight='bold')
     ax.set_xticks(x)
-    ax.set_xticklabels(MODEL_NAMES.values())
+    ax.set_xticklabels(data['models'])
     ax.legend()
 
     # Add value labels
@@ -480,11 +596,86 @@ def generate_charts(df, summary):
             ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.5, f'{bar.get_height():.1f}',
                    ha='center', va='bottom', fontsize=9)
 
+
+# Output file stem -> (data slice, draw function)
+CHARTS = {
+    'model_comparison_same_lang': (slice_model_comparison, draw_model_comparison),
+    'language_comparison_same_lang': (slice_language_comparison, draw_language_comparison),
+    'back_translation_similarity': (slice_back_translation_similarity, draw_back_translation_similarity),
+    'comet_heatmap': (slice_comet_heatmap, draw_comet_heatmap),
+    'category_comparison': (slice_category_comparison, draw_category_comparison),
+    'three_goals_comparison': (slice_three_goals, draw_three_goals),
+    'llm_vs_professional_stability': (slice_llm_vs_professional, draw_llm_vs_professional),
+}
+
+
+def render_chart(name: str, data: dict, path: str) -> str:
+    """Draw one chart and save it (runs in a worker process)."""
+    import matplotlib
+    matplotlib.use('Agg')  # Non-interactive backend
+    import matplotlib.pyplot as plt
+
+    plt.style.use('seaborn-v0_8-whitegrid')
+    CHARTS[name][1](data)
     plt.tight_layout()
-    plt.savefig(charts_dir / 'llm_vs_professional_stability.png', dpi=150, bbox_inches='tight')
+    plt.savefig(path, dpi=CHART_DPI, bbox_inches='tight')
     plt.close()
+    return name
+
+
+def matplotlib_version() -> str:
+    """Installed matplotlib version, without importing it (rendering changes between releases)."""
+    from importlib.metadata import version, PackageNotFoundError
+    try:
+        return version("matplotlib")
+    except PackageNotFoundError:
+        return "missing"
+
 
-    print(f"Charts saved to: {charts_dir}")
+def chart_hash(name: str, data: dict) -> str:
+    """
+    Hash of a chart's data slice, the code that draws it and the matplotlib
+    version. The code is the closure of its draw function and render_chart
+    (colours, titles, labels, DPI...), leaving out the other charts in CHARTS.
+    """
+    digest = hashlib.sha256(json.dumps(data, sort_keys=True).encode('utf-8'))
+    digest.update(code_fingerprint((CHARTS[name][1], render_chart), exclude=(CHARTS,)).encode('utf-8'))
+    digest.update(matplotlib_version().encode('utf-8'))
+    return digest.hexdigest()
+
+
+def generate_charts(df, summary, force=False, workers=None):
+    """Render the charts whose data or code changed since their last render."""
+    charts_dir = OUTPUT_DIR / "charts"
+    charts_dir.mkdir(parents=True, exist_ok=True)
+    cache_file = charts_dir / CHART_CACHE_FILE
+    cache = json.loads(cache_file.read_text()) if cache_file.exists() else {}
+
+    stale = {}
+    for name, (slice_fn, _) in CHARTS.items():
+        data = slice_fn(df, summary)
+        digest = chart_hash(name, data)
+        path = charts_dir / f"{name}.png"
+        if force or cache.get(name) != digest or not path.exists():
+            stale[name] = (data, digest, str(path))
+
+    try:
+        if len(stale) == 1:
+            # Not worth starting a pool (and re-importing matplotlib) for one chart
+            [(name, (data, digest, path))] = stale.items()
+            render_chart(name, data, path)
+            cache[name] = digest
+        elif stale:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(render_chart, name, data, path): name
+                           for name, (data, _, path) in stale.items()}
+                for future in as_completed(futures):
+                    name = future.result()
+                    cache[name] = stale[name][1]
+    finally:
+        cache_file.write_text(json.dumps(cache, indent=2))
+
+    print(f"Charts saved to: {charts_dir} ({len(stale)} rendered, {len(CHARTS) - len(stale)} unchanged)")
     return charts_dir
 
 
@@ -692,28 +883,44 @@ For questions about this study, please contact the research team.
 # MAIN
 # =============================================================================
 
-def main():
+def main(force=False, workers=None):
     print("=" * 60)
     print("MedlinePlus Back-Translation Study - GitHub Output Generator")
     print("=" * 60)
 
     # Load data
     print("\n1. Loading data...")
-    all_metrics, summary = load_data()
-    df = create_dataframe(all_metrics)
+    with span("report.load"):
+        all_metrics, summary = load_data()
+        df = create_dataframe(all_metrics)
     print(f"   Loaded {len(df)} metric records")
 
-    # Generate Excel report
-    print("\n2. Generating Excel report...")
-    generate_excel_report(df, summary)
-
-    # Generate charts
-    print("\n3. Generating visualization charts...")
-    generate_charts(df, summary)
+    # Declare each output with what it is built from; only stale ones are rebuilt
+    graph = BuildGraph(OUTPUT_DIR / STATE_FILE)
+    graph.add(
+        "excel", [OUTPUT_DIR / EXCEL_FILE],
+        inputs={'metric_rows': all_metrics, 'sentence_alignment': ALIGNMENT_FILE,
+                **{f"summary.{key}": summary.get(key) for key in ('by_model', 'by_language', 'by_category')}},
+        build=generate_excel_report, args=(df, summary),
+        # Closure followed by build_graph; create_dataframe builds the df argument
+        code=(generate_excel_report, create_dataframe),
+    )
+    graph.add(
+        "charts", [OUTPUT_DIR / "charts" / f"{name}.png" for name in CHARTS],
+        # Each chart's hash already covers its data slice and drawing code
+        inputs={name: chart_hash(name, slice_fn(df, summary)) for name, (slice_fn, _) in CHARTS.items()},
+        build=generate_charts, args=(df, summary, force, workers),
+        code=(generate_charts, create_dataframe),
+    )
+    graph.add(
+        "readme", [OUTPUT_DIR / "README.md"],
+        inputs={'metric_rows': all_metrics, 'summary': summary},
+        build=generate_readme, args=(df, summary),
+        code=(generate_readme, create_dataframe),
+    )
 
-    # Generate README
-    print("\n4. Generating README.md...")
-    generate_readme(df, summary)
+    print("\n2. Building outputs...")
+    print_build_report(graph.run(force=force))
 
     print("\n" + "=" * 60)
     print("All outputs generated successfully!")
@@ -722,4 +929,11 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate GitHub Page outputs")
+    parser.add_argument("--force", action="store_true", help="Rebuild every output, even if up to date")
+    parser.add_argument("--workers", type=int, help="Chart rendering processes (default: CPU count)")
+    args = parser.parse_args()
+
+    main(args.force, args.workers)
@@ -9,12 +9,26 @@ Creates side-by-side comparisons of:
 Selects documents strategically:
 - One high-scoring and one low-scoring document per language
 - Focuses on documents with most variance between models
+
+One packet per language and category (review_{language}_{category}.html),
+generated in parallel worker processes; packets whose rows and page code
+are unchanged since the last run are skipped (build_graph.py). Rows are looked up through
+(doc_id, model, language) dicts and each page is written to disk section by
+section rather than built up as one string.
 """
 
 import json
-import pandas as pd
+import os
+import sys
 from pathlib import Path
 
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from tracing import span  # Enabled with MEDLINEPLUS_TRACE_FILE
+from text_store import load_results_file, reference_row
+from build_graph import BuildGraph, STATE_FILE, print_build_report
+
 BASE_DIR = Path("/Users/chukanya/Documents/Coding/Back translation project")
 RESULTS_FILE = BASE_DIR / "output" / "medlineplus_results" / "all_results.json"
 METRICS_FILE = BASE_DIR / "output" / "medlineplus_metrics" / "all_metrics.json"
@@ -32,8 +46,7 @@ MODEL_NAMES = {
 
 def load_data():
     """Load results and metrics."""
-    with open(RESULTS_FILE, 'r', encoding='utf-8') as f:
-        results = json.load(f)
+    results = load_results_file(RESULTS_FILE)  # Texts are read from the store when a page uses them
 
     with open(METRICS_FILE, 'r', encoding='utf-8') as f:
         metrics = json.load(f)
@@ -82,19 +95,13 @@ def select_documents_for_review(metrics, language, n_docs=2, category='cancer'):
     return doc_stats[:n_docs]
 
 
-def generate_review_html(results, metrics, language, selected_docs, output_file):
-    """Generate an HTML file for human review."""
-
-    # Filter results for this language and selected docs
-    doc_ids = [d['doc_id'] for d in selected_docs]
-    lang_results = [r for r in results if r['language'] == language and r['doc_id'] in doc_ids]
-
-    html_content = f"""<!DOCTYPE html>
+# Page head; {title} and {category_note} are filled per packet
+PAGE_HEAD = """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Human Review: {language.replace('_', ' ').title()} Translations</title>
+    <title>Human Review: {title} Translations</title>
     <style>
         body {{
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
@@ -169,7 +176,7 @@ def generate_review_html(results, metrics, language, selected_docs, output_file)
     </style>
 </head>
 <body>
-    <h1>Human Review: {language.replace('_', ' ').title()} Translations</h1>
+    <h1>Human Review: {title} Translations</h1>
 
     <div class="instructions">
         <h3>Review Instructions</h3>
@@ -181,23 +188,30 @@ def generate_review_html(results, metrics, language, selected_docs, output_file)
             <li><strong>Goal 3 - Professional round-trip:</strong> Compare Original English to Professional Back-Translation (baseline)</li>
             <li><strong>Note any issues:</strong> Missing information, mistranslations, awkward phrasing, errors</li>
         </ol>
-        <p>These documents were selected from <strong>cancer education materials</strong> (clean single-column format) because they showed the <strong>highest variance</strong> in scores across different AI models.</p>
+        <p>These documents were selected from {category_note} because they showed the <strong>highest variance</strong> in scores across different AI models.</p>
     </div>
 """
 
-    # Group results by doc_id
-    results_by_doc = {}
-    for r in lang_results:
-        doc_id = r['doc_id']
-        if doc_id not in results_by_doc:
-            results_by_doc[doc_id] = []
-        results_by_doc[doc_id].append(r)
+PAGE_FOOT = """
+</body>
+</html>
+"""
+
+CATEGORY_NOTES = {
+    "cancer": "<strong>cancer education materials</strong> (clean single-column format)",
+    "immunize": "<strong>vaccine information statements</strong> (two-column layout; some extraction artifacts)",
+}
 
-    for doc_id, doc_results in results_by_doc.items():
-        # Get doc stats
-        doc_stat = next((d for d in selected_docs if d['doc_id'] == doc_id), None)
 
-        html_content += f"""
+def index_by_key(rows):
+    """{(doc_id, model, language): row} for constant-time lookups."""
+    return {(r['doc_id'], r['model'], r['language']): r for r in rows}
+
+
+def write_document_section(f, doc_stat, doc_results, metrics_index, language):
+    """Write one document's section (all models) straight to the open file."""
+    doc_id = doc_stat['doc_id']
+    f.write(f"""
     <div class="document-section">
         <h2>Document: {doc_id.replace('/', ' - ').replace('_', ' ').replace('-', ' ').title()}</h2>
         <p>
@@ -206,24 +220,20 @@ def generate_review_html(results, metrics, language, selected_docs, output_file)
         </p>
 
         <h3>Original English Text</h3>
-        <div class="text-box original">{doc_results[0]['english_original']}</div>
-"""
-
-        # Add each model's translations
-        for result in doc_results:
-            model_name = MODEL_NAMES.get(result['model'], result['model'])
-
-            # Find metrics for this result
-            result_metrics = next((m for m in metrics
-                                   if m['doc_id'] == doc_id
-                                   and m['model'] == result['model']
-                                   and m['language'] == language), None)
-
-            metrics_html = ""
-            if result_metrics:
-                g3_bleu = result_metrics.get('prof_backtrans_bleu', 0)
-                g3_bleu_str = f"{g3_bleu:.1f}" if g3_bleu else "N/A"
-                metrics_html = f"""
+        <div class="text-box original">""")
+    f.write(doc_results[0]['english_original'])
+    f.write("</div>\n")
+
+    # Add each model's translations
+    for result in doc_results:
+        model_name = MODEL_NAMES.get(result['model'], result['model'])
+        result_metrics = metrics_index.get((doc_id, result['model'], language))
+
+        metrics_html = ""
+        if result_metrics:
+            g3_bleu = result_metrics.get('prof_backtrans_bleu', 0)
+            g3_bleu_str = f"{g3_bleu:.1f}" if g3_bleu else "N/A"
+            metrics_html = f"""
             <p>
                 <span class="metrics-badge">G2 BLEU: {result_metrics.get('same_lang_bleu', 0):.1f}</span>
                 <span class="metrics-badge">G2 COMET: {result_metrics.get('same_lang_comet', 0):.3f}</span>
@@ -232,7 +242,9 @@ def generate_review_html(results, metrics, language, selected_docs, output_file)
             </p>
 """
 
-            html_content += f"""
+        # Texts are written as separate pieces so no section string holds them all
+        for piece in (
+            f"""
         <div class="model-section">
             <h3>{model_name}</h3>
             {metrics_html}
@@ -240,22 +252,30 @@ def generate_review_html(results, metrics, language, selected_docs, output_file)
             <div class="comparison-grid">
                 <div>
                     <div class="label">Professional Translation</div>
-                    <div class="text-box professional">{result['professional_translation']}</div>
+                    <div class="text-box professional">""",
+            result['professional_translation'],
+            """</div>
                 </div>
                 <div>
                     <div class="label">LLM Translation</div>
-                    <div class="text-box llm">{result['llm_translation']}</div>
+                    <div class="text-box llm">""",
+            result['llm_translation'],
+            """</div>
                 </div>
             </div>
 
             <div class="comparison-grid">
                 <div>
                     <div class="label">Original English (reference)</div>
-                    <div class="text-box original">{result['english_original']}</div>
+                    <div class="text-box original">""",
+            result['english_original'],
+            """</div>
                 </div>
                 <div>
                     <div class="label">LLM Back-Translation (Goal 1)</div>
-                    <div class="text-box backtrans">{result['llm_back_translation']}</div>
+                    <div class="text-box backtrans">""",
+            result['llm_back_translation'],
+            """</div>
                 </div>
             </div>
 
@@ -263,52 +283,106 @@ def generate_review_html(results, metrics, language, selected_docs, output_file)
             <div class="comparison-grid">
                 <div>
                     <div class="label">Original English (reference)</div>
-                    <div class="text-box original">{result['english_original']}</div>
+                    <div class="text-box original">""",
+            result['english_original'],
+            """</div>
                 </div>
                 <div>
                     <div class="label">Professional Back-Translation (Goal 3)</div>
-                    <div class="text-box professional">{result.get('professional_back_translation', 'N/A')}</div>
+                    <div class="text-box professional">""",
+            result.get('professional_back_translation', 'N/A'),
+            """</div>
                 </div>
             </div>
         </div>
-"""
+""",
+        ):
+            f.write(piece)
 
-        html_content += "    </div>\n"
+    f.write("    </div>\n")
 
-    html_content += """
-</body>
-</html>
-"""
+
+def generate_review_html(results, metrics, language, selected_docs, output_file, category='cancer'):
+    """Generate an HTML file for human review, writing it section by section."""
+    results_index = index_by_key(results)
+    metrics_index = index_by_key(metrics)
+    models = list(dict.fromkeys(r['model'] for r in results))
 
     with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+        f.write(PAGE_HEAD.format(title=language.replace('_', ' ').title(),
+                                 category_note=CATEGORY_NOTES.get(category, category)))
+        for doc_stat in selected_docs:
+            doc_results = [results_index[key] for key in
+                           ((doc_stat['doc_id'], model, language) for model in models)
+                           if key in results_index]
+            if doc_results:
+                write_document_section(f, doc_stat, doc_results, metrics_index, language)
+        f.write(PAGE_FOOT)
 
     print(f"Generated: {output_file}")
 
 
-def main():
-    print("Loading data...")
-    results, metrics = load_data()
-
-    # Languages for bilingual review
-    review_languages = ['chinese_simplified', 'spanish']
-
-    for language in review_languages:
-        print(f"\n=== {language.replace('_', ' ').title()} ===")
+def generate_packet(language, category, results, metrics, n_docs=2):
+    """Select documents and write the review packet for one language and category."""
+    selected_docs = select_documents_for_review(metrics, language, n_docs=n_docs, category=category)
+    output_file = OUTPUT_DIR / f"review_{language}_{category}.html"
+    generate_review_html(results, metrics, language, selected_docs, output_file, category)
+    return language, category, selected_docs
 
-        # Select documents
-        selected_docs = select_documents_for_review(metrics, language, n_docs=2)
 
+def main(languages=None, categories=None, workers=None, force=False):
+    print("Loading data...")
+    with span("report.load"):
+        results, metrics = load_data()
+
+    languages = languages or list(dict.fromkeys(m['language'] for m in metrics))
+    categories = categories or list(CATEGORY_NOTES)
+
+    # One pass to split rows per packet, so each worker gets only its own rows
+    packets = {(language, category): ([], []) for language in languages for category in categories}
+    for position, rows in ((0, results), (1, metrics)):
+        for row in rows:
+            key = (row['language'], row['doc_id'].split('/')[0])
+            if key in packets:
+                packets[key][position].append(row)
+
+    # One artifact per packet, rebuilt only when its rows or the page code changed
+    graph = BuildGraph(OUTPUT_DIR / STATE_FILE)
+    for (language, category), (lang_results, lang_metrics) in packets.items():
+        graph.add(
+            f"review_{language}_{category}", [OUTPUT_DIR / f"review_{language}_{category}.html"],
+            inputs={'result_rows': [reference_row(r) for r in lang_results], 'metric_rows': lang_metrics},
+            build=generate_packet, args=(language, category, lang_results, lang_metrics),
+            code=(generate_packet, select_documents_for_review, generate_review_html, write_document_section,
+                  PAGE_HEAD, PAGE_FOOT, CATEGORY_NOTES, MODEL_NAMES),
+        )
+
+    with span("report.review_html", packets=len(packets)):
+        records = graph.run(force=force, workers=workers or os.cpu_count())
+
+    for record in records:
+        if not record['rebuilt']:
+            continue
+        language, category, selected_docs = record['result']
+        print(f"\n=== {language.replace('_', ' ').title()} ({category}) ===")
         print("Selected documents for review:")
         for doc in selected_docs:
             print(f"  - {doc['doc_id']}: mean={doc['mean_comet']:.3f}, var={doc['variance']:.4f}")
 
-        # Generate HTML review file
-        output_file = OUTPUT_DIR / f"review_{language}.html"
-        generate_review_html(results, metrics, language, selected_docs, output_file)
+    print()
+    print_build_report(records)
 
     print(f"\nAll review files saved to: {OUTPUT_DIR}")
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate human review packets")
+    parser.add_argument("--languages", nargs="+", help="Languages (default: all in the metrics)")
+    parser.add_argument("--categories", nargs="+", choices=list(CATEGORY_NOTES), help="Document categories (default: all)")
+    parser.add_argument("--workers", type=int, help="Parallel worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Rewrite every packet, even if up to date")
+    args = parser.parse_args()
+
+    main(args.languages, args.categories, args.workers, args.force)
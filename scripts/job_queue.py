@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""
+Lease-Based Job Queue for Cooperative Pipeline Runs
+
+Lets several workers (processes or machines) split the (doc, model, language)
+jobs of the translation pipeline without clobbering each other's files:
+
+- Workers CLAIM a job and hold a time-limited lease on it
+- A background heartbeat extends the lease while the job is running
+- If a worker dies, its lease expires and the job goes back to pending,
+  unless it has been claimed MAX_ATTEMPTS times: a document that keeps
+  crashing its worker is dead-lettered (kind "lease_expired") instead of
+  being reclaimed forever
+- Results are written to the queue itself (the shared store), and only the
+  worker that still holds the lease may complete a job, so a job that was
+  re-leased after a stall is never recorded twice
+- A job that failed with a retryable kind (retry_queue.classify_failure) is
+  put back with retry(): it stays pending but cannot be claimed before its
+  retry_at. Permanent failures are fail()ed as dead letters. failures()
+  lists both, with their kind, for retry_queue.print_failure_report
+
+Backends:
+- SQLite in WAL mode: a local file path or sqlite:///path/to/queue.db
+  (all workers must share a filesystem with working POSIX locks - not NFS)
+- Redis (or any Redis-compatible server): redis://host:6379/0
+  (use this when workers run on different machines)
+
+Usage:
+  python job_queue.py --queue queue.db --status
+  python job_queue.py --queue redis://localhost:6379/0 --status
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+DEFAULT_LEASE_SECONDS = 600  # Long VIS documents take several minutes for 3 steps
+MAX_ATTEMPTS = 4             # Claims per job, as retry_queue.MAX_ATTEMPTS
+LEASE_EXPIRED = "lease_expired"
+
+STATUS_PENDING = "pending"
+STATUS_LEASED = "leased"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+# =============================================================================
+# DATA STRUCTURES
+# =============================================================================
+
+@dataclass
+class Job:
+    """A single (doc, model, language) unit of pipeline work."""
+    key: str
+    doc_id: str
+    model: str
+    language: str
+    attempts: int = 0
+    priority: float = 0.0
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def make_job_key(doc_id: str, model: str, language: str) -> str:
+    """Same key format as the pipeline checkpoint."""
+    return f"{doc_id}|{model}|{language}"
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# =============================================================================
+# SQLITE BACKEND
+# =============================================================================
+
+class SQLiteJobQueue:
+    """Job queue backed by a SQLite database in WAL mode."""
+
+    def __init__(self, db_path: str, lease_seconds: float = DEFAULT_LEASE_SECONDS, max_attempts: int = MAX_ATTEMPTS):
+        self.db_path = str(db_path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread (heartbeats run on their own thread)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                key TEXT PRIMARY KEY,
+                doc_id TEXT NOT NULL,
+                model TEXT NOT NULL,
+                language TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                priority REAL NOT NULL DEFAULT 0,
+                worker_id TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                kind TEXT,
+                retry_at REAL,
+                updated_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, priority DESC);
+            CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs (status, lease_expires);
+        """)
+        columns = {row[1] for row in self._conn().execute("PRAGMA table_info(jobs)")}
+        for column, column_type in (("kind", "TEXT"), ("retry_at", "REAL")):
+            if column not in columns:  # Queues created before failed jobs were retried
+                self._conn().execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+
+    def enqueue(self, jobs: list[Job]) -> int:
+        """Add jobs; jobs that already exist (in any state) are left untouched."""
+        conn = self._conn()
+        before = conn.total_changes
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            "INSERT OR IGNORE INTO jobs (key, doc_id, model, language, priority, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(j.key, j.doc_id, j.model, j.language, j.priority, time.time()) for j in jobs]
+        )
+        conn.execute("COMMIT")
+        return conn.total_changes - before
+
+    def claim(self, worker_id: str) -> Optional[Job]:
+        """
+        Lease the highest-priority pending (or expired) job whose retry_at has
+        passed, or None if no job can be claimed now (see next_retry_at).
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = ?, kind = ?, error = ?, lease_expires = NULL, updated_at = ? "
+                "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                (STATUS_FAILED, LEASE_EXPIRED, "Lease expired on every attempt", now,
+                 STATUS_LEASED, now, self.max_attempts)
+            )
+            row = conn.execute(
+                "SELECT key, doc_id, model, language, attempts, priority FROM jobs "
+                "WHERE (status = ? AND (retry_at IS NULL OR retry_at <= ?)) OR (status = ? AND lease_expires < ?) "
+                "ORDER BY priority DESC, key LIMIT 1",
+                (STATUS_PENDING, now, STATUS_LEASED, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker_id = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE key = ?",
+                (STATUS_LEASED, worker_id, now + self.lease_seconds, now, row[0])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return Job(key=row[0], doc_id=row[1], model=row[2], language=row[3],
+                   attempts=row[4] + 1, priority=row[5])
+
+    def heartbeat(self, job: Job, worker_id: str) -> bool:
+        """Extend the lease. Returns False if the lease was lost."""
+        now = time.time()
+        cursor = self._conn().execute(
+            "UPDATE jobs SET lease_expires = ?, updated_at = ? "
+            "WHERE key = ? AND worker_id = ? AND status = ?",
+            (now + self.lease_seconds, now, job.key, worker_id, STATUS_LEASED)
+        )
+        return cursor.rowcount == 1
+
+    def _finish(self, job: Job, worker_id: str, status: str, result: Optional[dict], error: Optional[str],
+                kind: Optional[str] = None, retry_at: Optional[float] = None) -> bool:
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, kind = ?, retry_at = ?, lease_expires = NULL, "
+            "updated_at = ? WHERE key = ? AND worker_id = ? AND status = ?",
+            (status, json.dumps(result, ensure_ascii=False) if result else None, error, kind, retry_at,
+             time.time(), job.key, worker_id, STATUS_LEASED)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job: Job, worker_id: str, result: dict) -> bool:
+        """Store the result. Returns False (result discarded) if the lease was lost."""
+        return self._finish(job, worker_id, STATUS_DONE, result, None)
+
+    def fail(self, job: Job, worker_id: str, result: Optional[dict], error: str, kind: Optional[str] = None) -> bool:
+        """Dead-letter the job; result may be None when the job never ran."""
+        return self._finish(job, worker_id, STATUS_FAILED, result, error, kind)
+
+    def retry(self, job: Job, worker_id: str, error: str, kind: str, retry_at: float) -> bool:
+        """Put a failed job back; it can be claimed again from retry_at (Unix time)."""
+        return self._finish(job, worker_id, STATUS_PENDING, None, error, kind, retry_at)
+
+    def next_retry_at(self) -> Optional[float]:
+        """Earliest retry_at of the pending jobs still waiting out a backoff."""
+        return self._conn().execute(
+            "SELECT MIN(retry_at) FROM jobs WHERE status = ? AND retry_at > ?", (STATUS_PENDING, time.time())
+        ).fetchone()[0]
+
+    def failures(self) -> list[dict]:
+        """Failed jobs awaiting a retry and dead letters, as retry_queue.FailedJob fields."""
+        rows = self._conn().execute(
+            "SELECT key, doc_id, model, language, kind, error, attempts, retry_at, status FROM jobs "
+            "WHERE kind IS NOT NULL AND status != ? ORDER BY key", (STATUS_DONE,)
+        )
+        return [{'key': key, 'doc_id': doc_id, 'model': model, 'language': language, 'kind': kind,
+                 'error': error or '', 'attempts': attempts, 'retry_at': retry_at or 0.0,
+                 'permanent': status == STATUS_FAILED}
+                for key, doc_id, model, language, kind, error, attempts, retry_at, status in rows]
+
+    def stats(self) -> dict:
+        counts = {s: 0 for s in (STATUS_PENDING, STATUS_LEASED, STATUS_DONE, STATUS_FAILED)}
+        for status, count in self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            counts[status] = count
+        counts['expired'] = self._conn().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = ? AND lease_expires < ?",
+            (STATUS_LEASED, time.time())
+        ).fetchone()[0]
+        counts['waiting'] = self._conn().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = ? AND retry_at > ?", (STATUS_PENDING, time.time())
+        ).fetchone()[0]
+        return counts
+
+    def results(self, include_failed: bool = True) -> list[dict]:
+        statuses = (STATUS_DONE, STATUS_FAILED) if include_failed else (STATUS_DONE,)
+        rows = self._conn().execute(
+            f"SELECT result FROM jobs WHERE status IN ({','.join('?' * len(statuses))}) "
+            "AND result IS NOT NULL ORDER BY key",
+            statuses
+        )
+        return [json.loads(r[0]) for r in rows]
+
+
+# =============================================================================
+# REDIS BACKEND
+# =============================================================================
+
+# Requeue expired leases (dead-lettering jobs out of attempts) and retries
+# whose backoff is over, pop the highest-priority pending job and lease it,
+# all in one atomic script: a worker that dies mid-claim cannot lose the job,
+# and a requeue cannot interleave with _finish (whose WATCH then fails).
+# KEYS: pending, leases, delayed, finished, failures, counts.
+# ARGV: now, lease expiry, worker_id, job hash prefix, max attempts.
+CLAIM_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', ARGV[1])
+for _, key in ipairs(due) do
+    redis.call('ZREM', KEYS[3], key)
+    redis.call('ZADD', KEYS[1], -tonumber(redis.call('HGET', ARGV[4] .. key, 'priority') or 0), key)
+end
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, key in ipairs(expired) do
+    local job = ARGV[4] .. key
+    redis.call('ZREM', KEYS[2], key)
+    if tonumber(redis.call('HGET', job, 'attempts') or 0) >= tonumber(ARGV[5]) then
+        redis.call('HSET', job, 'status', 'failed', 'kind', 'lease_expired',
+                   'error', 'Lease expired on every attempt')
+        redis.call('SADD', KEYS[4], key)
+        redis.call('SADD', KEYS[5], key)
+        redis.call('HINCRBY', KEYS[6], 'failed', 1)
+    else
+        redis.call('HSET', job, 'status', 'pending')
+        redis.call('ZADD', KEYS[1], -tonumber(redis.call('HGET', job, 'priority') or 0), key)
+    end
+end
+local popped = redis.call('ZPOPMIN', KEYS[1])
+if #popped == 0 then
+    return false
+end
+local key = popped[1]
+local job = ARGV[4] .. key
+redis.call('HSET', job, 'status', 'leased', 'worker_id', ARGV[3])
+redis.call('HINCRBY', job, 'attempts', 1)
+redis.call('ZADD', KEYS[2], ARGV[2], key)
+local reply = redis.call('HGETALL', job)
+table.insert(reply, 1, key)
+return reply
+"""
+
+# Create each job that does not exist yet, atomically per job.
+# KEYS: pending. ARGV: job hash prefix, then key, doc_id, model, language, priority per job.
+ENQUEUE_SCRIPT = """
+local added = 0
+for i = 2, #ARGV, 5 do
+    local key = ARGV[i]
+    local job = ARGV[1] .. key
+    if redis.call('HSETNX', job, 'status', 'pending') == 1 then
+        redis.call('HSET', job, 'doc_id', ARGV[i + 1], 'model', ARGV[i + 2], 'language', ARGV[i + 3],
+                   'priority', ARGV[i + 4], 'attempts', 0)
+        redis.call('ZADD', KEYS[1], -tonumber(ARGV[i + 4]), key)
+        added = added + 1
+    end
+end
+return added
+"""
+ENQUEUE_CHUNK = 1000  # Jobs per script call
+
+class RedisJobQueue:
+    """
+    Job queue backed by Redis (or a Redis-compatible server).
+
+    Keys:
+      {prefix}:job:{key}   hash with job fields, status, worker_id, result
+      {prefix}:pending     sorted set of job keys (score = -priority)
+      {prefix}:leases      sorted set of leased job keys (score = lease expiry)
+      {prefix}:delayed     sorted set of failed jobs waiting to be retried (score = retry_at)
+      {prefix}:finished    set of done/failed job keys
+      {prefix}:failures    set of job keys with a failure kind (retrying or dead)
+      {prefix}:counts      hash of done / failed job counts, so stats() is O(1)
+    """
+
+    def __init__(self, url: str, lease_seconds: float = DEFAULT_LEASE_SECONDS, prefix: str = "medlineplus",
+                 max_attempts: int = MAX_ATTEMPTS):
+        import redis
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.prefix = prefix
+        self._claim = self.redis.register_script(CLAIM_SCRIPT)
+        self._enqueue = self.redis.register_script(ENQUEUE_SCRIPT)
+        if not self.redis.exists(f"{prefix}:counts") and self.redis.scard(f"{prefix}:finished"):
+            self._recount()
+
+    def _recount(self):
+        """Rebuild the done / failed counters (queues created before they were kept)."""
+        counts = {STATUS_DONE: 0, STATUS_FAILED: 0}
+        for key in self.redis.smembers(f"{self.prefix}:finished"):
+            counts[self.redis.hget(self._job_key(key), 'status')] += 1
+        self.redis.hset(f"{self.prefix}:counts", mapping=counts)
+
+    def _job_key(self, key: str) -> str:
+        return f"{self.prefix}:job:{key}"
+
+    def enqueue(self, jobs: list[Job]) -> int:
+        added = 0
+        for start in range(0, len(jobs), ENQUEUE_CHUNK):
+            args = [self._job_key("")]
+            for j in jobs[start:start + ENQUEUE_CHUNK]:
+                args += [j.key, j.doc_id, j.model, j.language, j.priority]
+            added += self._enqueue(keys=[f"{self.prefix}:pending"], args=args)
+        return added
+
+    def claim(self, worker_id: str) -> Optional[Job]:
+        now = time.time()
+        reply = self._claim(keys=[f"{self.prefix}:{name}" for name in
+                                  ("pending", "leases", "delayed", "finished", "failures", "counts")],
+                            args=[now, now + self.lease_seconds, worker_id, self._job_key(""), self.max_attempts])
+        if not reply:
+            return None
+        key, fields = reply[0], reply[1:]
+        data = dict(zip(fields[0::2], fields[1::2]))
+        return Job(key=key, doc_id=data['doc_id'], model=data['model'], language=data['language'],
+                   attempts=int(data['attempts']), priority=float(data.get('priority', 0)))
+
+    def _holds_lease(self, job: Job, worker_id: str) -> bool:
+        status, owner = self.redis.hmget(self._job_key(job.key), 'status', 'worker_id')
+        return status == STATUS_LEASED and owner == worker_id
+
+    def heartbeat(self, job: Job, worker_id: str) -> bool:
+        if not self._holds_lease(job, worker_id):
+            return False
+        # XX: only extend an existing lease, never resurrect a requeued one
+        self.redis.zadd(f"{self.prefix}:leases", {job.key: time.time() + self.lease_seconds}, xx=True)
+        return True
+
+    def _finish(self, job: Job, worker_id: str, status: str, result: dict, error: Optional[str],
+                kind: Optional[str] = None, retry_at: Optional[float] = None) -> bool:
+        import redis
+        job_key = self._job_key(job.key)
+        with self.redis.pipeline() as pipe:
+            try:
+                pipe.watch(job_key)
+                if pipe.hget(job_key, 'status') != STATUS_LEASED or pipe.hget(job_key, 'worker_id') != worker_id:
+                    return False
+                pipe.multi()
+                pipe.hset(job_key, mapping={
+                    'status': status,
+                    'result': json.dumps(result, ensure_ascii=False) if result else '',
+                    'error': error or '',
+                    'kind': kind or '',
+                    'retry_at': retry_at or '',
+                })
+                pipe.zrem(f"{self.prefix}:leases", job.key)
+                if status == STATUS_PENDING:
+                    pipe.zadd(f"{self.prefix}:delayed", {job.key: retry_at})
+                else:
+                    pipe.sadd(f"{self.prefix}:finished", job.key)
+                    pipe.hincrby(f"{self.prefix}:counts", status, 1)
+                if kind:
+                    pipe.sadd(f"{self.prefix}:failures", job.key)
+                else:
+                    pipe.srem(f"{self.prefix}:failures", job.key)
+                pipe.execute()
+                return True
+            except redis.WatchError:
+                return False
+
+    def complete(self, job: Job, worker_id: str, result: dict) -> bool:
+        return self._finish(job, worker_id, STATUS_DONE, result, None)
+
+    def fail(self, job: Job, worker_id: str, result: Optional[dict], error: str, kind: Optional[str] = None) -> bool:
+        return self._finish(job, worker_id, STATUS_FAILED, result, error, kind)
+
+    def retry(self, job: Job, worker_id: str, error: str, kind: str, retry_at: float) -> bool:
+        return self._finish(job, worker_id, STATUS_PENDING, None, error, kind, retry_at)
+
+    def next_retry_at(self) -> Optional[float]:
+        earliest = self.redis.zrange(f"{self.prefix}:delayed", 0, 0, withscores=True)
+        return earliest[0][1] if earliest else None
+
+    def failures(self) -> list[dict]:
+        failures = []
+        for key in sorted(self.redis.smembers(f"{self.prefix}:failures")):
+            data = self.redis.hgetall(self._job_key(key))
+            failures.append({'key': key, 'doc_id': data['doc_id'], 'model': data['model'],
+                             'language': data['language'], 'kind': data['kind'], 'error': data.get('error', ''),
+                             'attempts': int(data['attempts']), 'retry_at': float(data.get('retry_at') or 0),
+                             'permanent': data['status'] == STATUS_FAILED})
+        return failures
+
+    def stats(self) -> dict:
+        counts = {s: 0 for s in (STATUS_PENDING, STATUS_LEASED, STATUS_DONE, STATUS_FAILED)}
+        counts['waiting'] = self.redis.zcard(f"{self.prefix}:delayed")
+        counts[STATUS_PENDING] = self.redis.zcard(f"{self.prefix}:pending") + counts['waiting']
+        counts[STATUS_LEASED] = self.redis.zcard(f"{self.prefix}:leases")
+        finished = self.redis.hgetall(f"{self.prefix}:counts")
+        counts[STATUS_DONE] = int(finished.get(STATUS_DONE, 0))
+        counts[STATUS_FAILED] = int(finished.get(STATUS_FAILED, 0))
+        counts['expired'] = self.redis.zcount(f"{self.prefix}:leases", '-inf', time.time())
+        return counts
+
+    def results(self, include_failed: bool = True) -> list[dict]:
+        results = []
+        for key in sorted(self.redis.smembers(f"{self.prefix}:finished")):
+            status, result = self.redis.hmget(self._job_key(key), 'status', 'result')
+            if result and (include_failed or status == STATUS_DONE):
+                results.append(json.loads(result))
+        return results
+
+
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+def open_queue(url: str, lease_seconds: float = DEFAULT_LEASE_SECONDS, max_attempts: int = MAX_ATTEMPTS):
+    """Open a queue from a path, sqlite:///path or redis://host:port/db URL."""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisJobQueue(url, lease_seconds=lease_seconds, max_attempts=max_attempts)
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    return SQLiteJobQueue(url, lease_seconds=lease_seconds, max_attempts=max_attempts)
+
+
+@contextmanager
+def keep_alive(queue, job: Job, worker_id: str, interval: Optional[float] = None):
+    """Heartbeat the job's lease on a background thread while the block runs."""
+    interval = interval or queue.lease_seconds / 3
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(interval):
+            if not queue.heartbeat(job, worker_id):
+                break
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect the pipeline job queue")
+    parser.add_argument("--queue", required=True, help="Queue path or URL (sqlite path or redis://...)")
+    parser.add_argument("--status", action="store_true", help="Show job counts by status")
+
+    args = parser.parse_args()
+
+    if args.status:
+        stats = open_queue(args.queue).stats()
+        print(f"\nJob queue: {args.queue}")
+        for status in (STATUS_PENDING, STATUS_LEASED, STATUS_DONE, STATUS_FAILED):
+            print(f"  {status:<10} {stats[status]:>6}")
+        if stats['waiting']:
+            print(f"  ({stats['waiting']} pending jobs are waiting out a retry backoff)")
+        if stats['expired']:
+            print(f"  ({stats['expired']} leased jobs have expired leases and will be reclaimed)")
+    else:
+        parser.print_help()
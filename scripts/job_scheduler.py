@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Cost- and Length-Aware Job Scheduler
+
+Orders the (doc, model, language) jobs of the translation pipeline so that:
+1. Jobs are sized by ESTIMATED TOKENS (from the English and professional text)
+2. Longest jobs run first, so a long VIS job never lands at the end of a run
+   (or, with --queue, at the end of a worker's share)
+3. Providers are interleaved, so consecutive calls never hammer one provider
+
+Also predicts total runtime and API cost before a run starts. The runtime is
+for run_full_pipeline, which runs one job at a time.
+
+Each job has 3 steps (see run_comparison_pipeline):
+- forward:   English -> Target      (in: English,      out: ~professional length)
+- llm_back:  Target -> English      (in: LLM output,   out: ~English length)
+- prof_back: Professional -> English (in: professional, out: ~English length)
+
+Usage:
+  python job_scheduler.py                        # Print plan for all active jobs
+  python job_scheduler.py --models gpt-5.1 kimi-k2
+"""
+
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from provider_transport import MODEL_PROVIDERS
+
+# =============================================================================
+# COST / THROUGHPUT ASSUMPTIONS (update when pricing or provider speed changes)
+# =============================================================================
+
+# USD per 1M tokens: (input, output)
+MODEL_PRICING = {
+    "gpt-5.1": (1.25, 10.00),
+    "claude-opus-4.5": (5.00, 25.00),
+    "gemini-3-pro": (2.00, 12.00),
+    "kimi-k2": (0.60, 2.50),
+}
+
+# Observed generation speed (output tokens/sec) and fixed per-call overhead (s)
+MODEL_OUTPUT_TPS = {
+    "gpt-5.1": 60.0,
+    "claude-opus-4.5": 45.0,
+    "gemini-3-pro": 70.0,
+    "kimi-k2": 35.0,
+}
+CALL_OVERHEAD_SECONDS = 2.0
+
+# Fixed sleeps in run_comparison_pipeline / run_full_pipeline (rate limiting)
+SLEEP_PER_JOB_SECONDS = 3.0
+
+# Target text is usually a bit longer than English when no professional text exists
+DEFAULT_EXPANSION = 1.3
+
+# =============================================================================
+# TOKEN ESTIMATION
+# =============================================================================
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count without loading a tokenizer.
+
+    ASCII text averages ~4 chars/token. Non-Latin scripts (Hanzi, Hangul,
+    Arabic, Cyrillic) and diacritic-heavy Vietnamese tokenize far less
+    efficiently, so each non-ASCII char counts as ~0.7 tokens.
+    """
+    if not text:
+        return 0
+    non_ascii = sum(1 for c in text if ord(c) > 127)
+    ascii_chars = len(text) - non_ascii
+    return int(ascii_chars / 4 + non_ascii * 0.7) + 1
+
+
+# =============================================================================
+# DATA STRUCTURES
+# =============================================================================
+
+@dataclass
+class JobEstimate:
+    """Predicted size, duration and cost of one (doc, model, language) job."""
+    doc_id: str
+    model: str
+    language: str
+    provider: str
+    input_tokens: int
+    output_tokens: int
+    est_seconds: float
+    est_cost: float
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def estimate_step_tokens(english_text: str, professional_text: str) -> dict:
+    """Estimated (input, output) tokens per step for one job."""
+    english_tokens = estimate_tokens(english_text)
+    target_tokens = estimate_tokens(professional_text) or int(english_tokens * DEFAULT_EXPANSION)
+
+    steps = {
+        "forward": (english_tokens, target_tokens),
+        "llm_back": (target_tokens, english_tokens),
+    }
+    if professional_text:
+        steps["prof_back"] = (target_tokens, english_tokens)
+    return steps
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    price_in, price_out = MODEL_PRICING.get(model, (0.0, 0.0))
+    return (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+
+def estimate_job(doc, model: str, lang_key: str) -> JobEstimate:
+    """Estimate a job from a MedlinePlusDocument."""
+    steps = estimate_step_tokens(doc.english_text, doc.professional_translations.get(lang_key, ""))
+    input_tokens = sum(i for i, _ in steps.values())
+    output_tokens = sum(o for _, o in steps.values())
+    tps = MODEL_OUTPUT_TPS.get(model, 50.0)
+    est_seconds = (output_tokens / tps + CALL_OVERHEAD_SECONDS * len(steps) + SLEEP_PER_JOB_SECONDS)
+
+    return JobEstimate(
+        doc_id=doc.doc_id,
+        model=model,
+        language=lang_key,
+        provider=MODEL_PROVIDERS.get(model, model),
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        est_seconds=est_seconds,
+        est_cost=estimate_cost(model, input_tokens, output_tokens),
+    )
+
+
+# =============================================================================
+# SCHEDULING
+# =============================================================================
+
+def schedule_jobs(estimates: list[JobEstimate]) -> list[JobEstimate]:
+    """
+    Longest-first per provider, then round-robin across providers.
+
+    Each round takes the next-longest job from every provider that still has
+    work, providers with the most remaining work first, so consecutive calls
+    always go to different providers.
+    """
+    by_provider = defaultdict(list)
+    for est in estimates:
+        by_provider[est.provider].append(est)
+    for jobs in by_provider.values():
+        jobs.sort(key=lambda e: e.est_seconds, reverse=True)
+
+    remaining = {p: sum(e.est_seconds for e in jobs) for p, jobs in by_provider.items()}
+    ordered = []
+
+    for round_index in range(max((len(jobs) for jobs in by_provider.values()), default=0)):
+        for provider in sorted(by_provider, key=lambda p: (-remaining[p], p)):
+            jobs = by_provider[provider]
+            if round_index < len(jobs):
+                ordered.append(jobs[round_index])
+                remaining[provider] -= jobs[round_index].est_seconds
+
+    return ordered
+
+
+def summarize_plan(estimates: list[JobEstimate]) -> dict:
+    by_model = defaultdict(lambda: {'jobs': 0, 'input_tokens': 0, 'output_tokens': 0,
+                                    'est_seconds': 0.0, 'est_cost': 0.0})
+    for est in estimates:
+        m = by_model[est.model]
+        m['jobs'] += 1
+        m['input_tokens'] += est.input_tokens
+        m['output_tokens'] += est.output_tokens
+        m['est_seconds'] += est.est_seconds
+        m['est_cost'] += est.est_cost
+
+    return {
+        'jobs': len(estimates),
+        'sequential_seconds': sum(e.est_seconds for e in estimates),
+        'total_cost': sum(e.est_cost for e in estimates),
+        'by_model': dict(by_model),
+    }
+
+
+def format_duration(seconds: float) -> str:
+    hours, rest = divmod(int(seconds), 3600)
+    minutes = rest // 60
+    return f"{hours}h {minutes:02d}m" if hours else f"{minutes}m {int(seconds) % 60:02d}s"
+
+
+def print_plan(estimates: list[JobEstimate]) -> dict:
+    """Print predicted runtime and cost for a list of jobs."""
+    summary = summarize_plan(estimates)
+
+    print("\n" + "="*80)
+    print(f"RUN PLAN: {summary['jobs']} jobs")
+    print("="*80)
+    print(f"{'Model':<20} {'Jobs':>6} {'In tok':>10} {'Out tok':>10} {'Time':>10} {'Cost ($)':>10}")
+    print("-"*70)
+    for model, m in sorted(summary['by_model'].items()):
+        print(f"{model:<20} {m['jobs']:>6} {m['input_tokens']:>10,} {m['output_tokens']:>10,} "
+              f"{format_duration(m['est_seconds']):>10} {m['est_cost']:>10.2f}")
+    print("-"*70)
+    print(f"Predicted runtime (sequential): {format_duration(summary['sequential_seconds'])}")
+    print(f"Predicted cost:                 ${summary['total_cost']:.2f}")
+
+    return summary
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+if __name__ == "__main__":
+    import argparse
+    from config import ACTIVE_MODELS, ACTIVE_LANGUAGES
+    from run_medlineplus_pipeline import load_all_documents
+
+    parser = argparse.ArgumentParser(description="Plan pipeline jobs and predict runtime/cost")
+    parser.add_argument("--models", nargs="+", help="Specific models")
+    parser.add_argument("--languages", nargs="+", help="Specific languages")
+    parser.add_argument("--top", type=int, default=10, help="Show first N scheduled jobs")
+
+    args = parser.parse_args()
+
+    documents = load_all_documents()
+    estimates = [
+        estimate_job(doc, model, lang)
+        for doc in documents
+        for model in (args.models or ACTIVE_MODELS)
+        for lang in (args.languages or ACTIVE_LANGUAGES)
+    ]
+    ordered = schedule_jobs(estimates)
+    print_plan(ordered)
+
+    print(f"\nFirst {args.top} jobs:")
+    for est in ordered[:args.top]:
+        print(f"  {est.doc_id:<45} {est.model:<16} {est.language:<20} "
+              f"{est.input_tokens + est.output_tokens:>7,} tok  {est.est_seconds:>6.0f}s")
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Cached-Reference Lexical Scoring (BLEU, chrF)
+
+Every row scores its hypotheses against a handful of references that repeat
+across the whole run: the English original is the reference for Goal 1 and
+Goal 3 of all 32 model x language rows of a document, and each professional
+translation / back-translation is the reference for 4 models.
+scorer.corpus_score([hypothesis], [[reference]]) re-tokenises the reference
+and re-extracts its n-grams on every call.
+
+LexicalScorer wraps a sacrebleu metric and keeps the extracted reference
+statistics (word n-gram counts and length for BLEU, character and word
+n-gram counts for chrF) per distinct reference text, in a bounded LRU cache.
+A hypothesis is then preprocessed and matched against the cached statistics
+through the same sacrebleu code paths corpus_score uses, so the scores are
+identical (python lexical_scoring.py --verify checks this on a results file).
+
+segment_stats() exposes the per-row sufficient statistics (BLEU: hyp/ref
+length and matches/totals per order; chrF: hyp/ref/match counts per order).
+The metrics module keeps them on each row under LEXICAL_STATS_FIELD, and
+corpus_scores() sums them per group (model, language, category, topic, ...)
+with numpy and scores each sum once: a true corpus BLEU/chrF for any
+grouping, without re-tokenising a sentence.
+
+Usage:
+  python lexical_scoring.py --verify all_results.json [--limit 50]
+  python lexical_scoring.py --corpus all_metrics.json --by model_category
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from text_store import text_key
+
+REFERENCE_CACHE_SIZE = 1024  # Distinct references per scorer (~400 in the full run)
+LEXICAL_STATS_FIELD = "lexical_stats"  # Metric row key: {score field: segment statistics}
+LEXICAL_METRICS = ("bleu", "chrf")
+
+# Group name -> key of a metric row
+CORPUS_GROUPS = {
+    'model': lambda row: row['model'],
+    'language': lambda row: row['language'],
+    'category': lambda row: row['doc_id'].split('/')[0],
+    'model_category': lambda row: f"{row['model']}|{row['doc_id'].split('/')[0]}",
+    'topic': lambda row: row['doc_id'],
+}
+
+
+class LexicalScorer:
+    """A sacrebleu metric with per-reference statistics cached across calls."""
+
+    def __init__(self, metric, cache_size: int = REFERENCE_CACHE_SIZE):
+        self.metric = metric
+        self.cache_size = cache_size
+        self._references = OrderedDict()
+        self._lock = threading.Lock()  # The scoring server calls in from several threads
+        self.hits = 0
+        self.misses = 0
+
+    def reference_info(self, reference: str) -> dict:
+        """Extracted n-gram statistics of one reference (cached by text hash)."""
+        key = text_key(reference)
+        with self._lock:
+            info = self._references.get(key)
+            if info is not None:
+                self.hits += 1
+                self._references.move_to_end(key)
+                return info
+            self.misses += 1
+        info = self.metric._extract_reference_info([self.metric._preprocess_segment(reference)])
+        with self._lock:
+            self._references[key] = info
+            if len(self._references) > self.cache_size:
+                self._references.popitem(last=False)
+        return info
+
+    def segment_stats(self, hypothesis: str, reference: str) -> list[int]:
+        """Sufficient statistics of one hypothesis against one reference."""
+        return self.metric._compute_segment_statistics(
+            self.metric._preprocess_segment(hypothesis), self.reference_info(reference)
+        )
+
+    def score_stats(self, stats: list) -> float:
+        """Score from (summed) sufficient statistics."""
+        return self.metric._compute_score_from_stats(stats).score
+
+    def score(self, hypothesis: str, reference: str) -> float:
+        """Same value as metric.corpus_score([hypothesis], [[reference]]).score."""
+        return self.score_stats(self.segment_stats(hypothesis, reference))
+
+    def score_many(self, pairs: list) -> list[float]:
+        """Score (hypothesis, reference) pairs, references shared through the cache."""
+        return [self.score(hypothesis, reference) for hypothesis, reference in pairs]
+
+
+def make_scorer(metric: str) -> LexicalScorer:
+    """LexicalScorer for "bleu" or "chrf", configured as the metrics module always has."""
+    if metric == "bleu":
+        from sacrebleu.metrics import BLEU
+        return LexicalScorer(BLEU(effective_order=True))
+    if metric == "chrf":
+        from sacrebleu.metrics import CHRF
+        return LexicalScorer(CHRF())
+    raise ValueError(f"Unknown lexical metric: {metric}")
+
+
+# =============================================================================
+# CORPUS-LEVEL SCORES
+# =============================================================================
+
+def corpus_scores(rows: list, group_key, fields: list = None) -> dict:
+    """
+    Corpus-level score of each lexical field per group: {group: {field: score}}.
+
+    The rows' statistics (under LEXICAL_STATS_FIELD) are summed per group in
+    one numpy pass per field and each sum is scored once. Rows without
+    statistics for a field (scored before they were kept) are left out of
+    that field's sums. fields defaults to every field found in the rows.
+    """
+    import numpy as np
+
+    if fields is None:
+        fields = list(dict.fromkeys(f for row in rows for f in row.get(LEXICAL_STATS_FIELD) or {}))
+    scorers = {}
+    corpus = defaultdict(dict)
+    for field in fields:
+        metric = field.rsplit('_', 1)[-1]
+        if metric not in LEXICAL_METRICS:
+            raise ValueError(f"Not a BLEU/chrF field: {field}")
+        selected = [row for row in rows if (row.get(LEXICAL_STATS_FIELD) or {}).get(field)]
+        if not selected:
+            continue
+        groups, inverse = np.unique([str(group_key(row)) for row in selected], return_inverse=True)
+        stats = np.array([row[LEXICAL_STATS_FIELD][field] for row in selected], dtype=np.int64)
+        sums = np.zeros((len(groups), stats.shape[1]), dtype=np.int64)
+        np.add.at(sums, inverse, stats)
+        if metric not in scorers:
+            scorers[metric] = make_scorer(metric)
+        for group, total in zip(groups.tolist(), sums.tolist()):
+            corpus[group][field] = scorers[metric].score_stats(total)
+    return dict(corpus)
+
+
+# =============================================================================
+# VERIFICATION
+# =============================================================================
+
+def verify(results_file, limit: int = None) -> dict:
+    """
+    Score every BLEU/chrF pair of the metric plan both ways and compare.
+
+    Returns pair counts, mismatches and timings per metric.
+    """
+    from calculate_medlineplus_metrics import metric_plan
+    from text_store import load_results_file
+
+    rows = load_results_file(results_file)[:limit]
+    pairs = {"bleu": [], "chrf": []}
+    for row in rows:
+        for _, metric, args in metric_plan(row):
+            if metric in pairs:
+                pairs[metric].append(args)
+
+    report = {}
+    for metric, items in pairs.items():
+        scorer = make_scorer(metric)
+        start_time = time.perf_counter()
+        expected = [scorer.metric.corpus_score([h], [[r]]).score for h, r in items]
+        plain_seconds = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        cached = scorer.score_many(items)
+        cached_seconds = time.perf_counter() - start_time
+        report[metric] = {
+            'pairs': len(items),
+            'references': scorer.misses,
+            'mismatches': sum(1 for a, b in zip(expected, cached) if a != b),
+            'plain_seconds': plain_seconds,
+            'cached_seconds': cached_seconds,
+        }
+    return report
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cached-reference BLEU/chrF scoring")
+    parser.add_argument("--verify", metavar="FILE",
+                        help="Compare against sacrebleu corpus_score on a results file")
+    parser.add_argument("--limit", type=int, help="Only the first N rows")
+    parser.add_argument("--corpus", metavar="FILE", help="Corpus-level BLEU/chrF from a metrics file")
+    parser.add_argument("--by", choices=list(CORPUS_GROUPS), default="model", help="Grouping for --corpus")
+    args = parser.parse_args()
+
+    if args.verify:
+        report = verify(args.verify, args.limit)
+        print(f"{'Metric':<8} {'Pairs':>7} {'Refs':>6} {'Mismatch':>9} {'sacrebleu':>10} {'cached':>8}")
+        for metric, r in report.items():
+            print(f"{metric:<8} {r['pairs']:>7} {r['references']:>6} {r['mismatches']:>9} "
+                  f"{r['plain_seconds']:>9.1f}s {r['cached_seconds']:>7.1f}s")
+        if any(r['mismatches'] for r in report.values()):
+            sys.exit(1)
+    elif args.corpus:
+        import json
+        with open(args.corpus, 'r') as f:
+            rows = json.load(f)
+        corpus = corpus_scores(rows, CORPUS_GROUPS[args.by])
+        if not corpus:
+            sys.exit(f"No {LEXICAL_STATS_FIELD} in {args.corpus}; re-run the evaluation to record them")
+        fields = list(dict.fromkeys(f for scores in corpus.values() for f in scores))
+        print(f"{args.by:<32} " + " ".join(f"{f:>26}" for f in fields))
+        for group, scores in sorted(corpus.items()):
+            print(f"{group:<32} " + " ".join(
+                f"{scores[f]:>26.2f}" if f in scores else f"{'N/A':>26}" for f in fields))
+    else:
+        parser.print_help()
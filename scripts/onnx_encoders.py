@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+ONNX Runtime (int8) Backend for the Embedding Scorers
+
+CPU-only alternative to the fp32 PyTorch SentenceTransformer encoders used for
+LaBSE, XLM-R and mBERT (multilingual MiniLM) similarity:
+
+1. --export: the transformer is exported to ONNX and dynamically quantised to
+   int8 weights. The SentenceTransformer head (pooling, Dense, Normalize) is
+   saved alongside and re-applied in NumPy.
+2. OnnxEncoder: same encode() interface as SentenceTransformer, run with
+   ONNX Runtime with an explicit thread count.
+3. --check: recomputes the embedding metrics for stored results and compares
+   them with the fp32 scores in all_metrics.json (per row and per
+   model/language mean, which is what the reports show).
+
+Usage:
+  python onnx_encoders.py --export                    # Export + quantise all three encoders
+  python onnx_encoders.py --check --limit 100         # Accuracy/speed vs stored fp32 scores
+  python calculate_medlineplus_metrics.py --evaluate --backend onnx --threads 8
+"""
+
+import json
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import logger
+from text_store import load_results_file
+
+BASE_DIR = Path("/Users/chukanya/Documents/Coding/Back translation project")
+ONNX_DIR = BASE_DIR / "models" / "onnx"
+RESULTS_FILE = BASE_DIR / "output" / "medlineplus_results" / "all_results.json"
+METRICS_FILE = BASE_DIR / "output" / "medlineplus_metrics" / "all_metrics.json"
+
+# Metric key -> SentenceTransformer model id (as in calculate_medlineplus_metrics)
+ENCODERS = {
+    "labse": "sentence-transformers/LaBSE",
+    "xlm_roberta": "sentence-transformers/xlm-r-100langs-bert-base-nli-stsb-mean-tokens",
+    "mbert": "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+}
+
+ONNX_OPSET = 17
+DEFAULT_TOLERANCE = 0.005  # Max allowed shift in a reported model/language mean
+
+
+# =============================================================================
+# EXPORT
+# =============================================================================
+
+def export_encoder(name: str, quantize: bool = True) -> Path:
+    """Export one SentenceTransformer encoder to ONNX (+ int8) and save its head."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Dense, Normalize, Pooling
+
+    out_dir = ONNX_DIR / name
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    st_model = SentenceTransformer(ENCODERS[name], device="cpu")
+    transformer = st_model[0]
+    tokenizer = transformer.tokenizer
+    tokenizer.save_pretrained(out_dir)
+
+    class _LastHiddenState(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    dummy = tokenizer(["Take this medicine twice a day."], return_tensors="pt")
+    fp32_path = out_dir / "model.onnx"
+    torch.onnx.export(
+        _LastHiddenState(transformer.auto_model).eval(),
+        (dummy["input_ids"], dummy["attention_mask"]),
+        str(fp32_path),
+        input_names=["input_ids", "attention_mask"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "last_hidden_state": {0: "batch", 1: "sequence"},
+        },
+        opset_version=ONNX_OPSET,
+    )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(str(fp32_path), str(out_dir / "model.int8.onnx"), weight_type=QuantType.QInt8)
+
+    # Head applied after the transformer: pooling, optional Dense layers, optional Normalize
+    head = {"max_seq_length": st_model.max_seq_length, "pooling": "mean", "dense": [], "normalize": False}
+    weights = {}
+    for module in list(st_model)[1:]:
+        if isinstance(module, Pooling):
+            config = module.get_config_dict()
+            head["pooling"] = "cls" if config.get("pooling_mode_cls_token") else "mean"
+        elif isinstance(module, Dense):
+            i = len(head["dense"])
+            weights[f"dense{i}_weight"] = module.linear.weight.detach().numpy()
+            weights[f"dense{i}_bias"] = module.linear.bias.detach().numpy()
+            head["dense"].append(type(module.activation_function).__name__)
+        elif isinstance(module, Normalize):
+            head["normalize"] = True
+    with open(out_dir / "head.json", 'w') as f:
+        json.dump(head, f, indent=2)
+    np.savez(out_dir / "head.npz", **weights)
+
+    logger.info(f"Exported {name} to {out_dir} (head: {head['pooling']} pooling, "
+                f"{len(head['dense'])} dense, normalize={head['normalize']})")
+    return out_dir
+
+
+# =============================================================================
+# ENCODER
+# =============================================================================
+
+ACTIVATIONS = {
+    "Tanh": np.tanh,
+    "Identity": lambda x: x,
+}
+
+
+class OnnxEncoder:
+    """Drop-in for SentenceTransformer.encode() backed by ONNX Runtime."""
+
+    def __init__(self, name: str, threads: int = None, quantized: bool = True):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_dir = ONNX_DIR / name
+        model_path = model_dir / ("model.int8.onnx" if quantized else "model.onnx")
+        if not model_path.exists():
+            raise FileNotFoundError(f"{model_path} not found; run: python onnx_encoders.py --export {name}")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        with open(model_dir / "head.json") as f:
+            self.head = json.load(f)
+        self.max_seq_length = self.head["max_seq_length"]
+        weights = np.load(model_dir / "head.npz")
+        self.dense = [
+            (weights[f"dense{i}_weight"], weights[f"dense{i}_bias"], ACTIVATIONS[activation])
+            for i, activation in enumerate(self.head["dense"])
+        ]
+        self.name = name
+        logger.info(f"ONNX {name} encoder loaded ({model_path.name}, threads={threads or 'default'})")
+
+    def _encode_batch(self, texts: list) -> np.ndarray:
+        tokens = self.tokenizer(texts, padding=True, truncation=True,
+                                max_length=self.head["max_seq_length"], return_tensors="np")
+        mask = tokens["attention_mask"].astype(np.int64)
+        hidden = self.session.run(None, {
+            "input_ids": tokens["input_ids"].astype(np.int64),
+            "attention_mask": mask,
+        })[0]
+
+        if self.head["pooling"] == "cls":
+            pooled = hidden[:, 0]
+        else:
+            weights = mask[..., None].astype(hidden.dtype)
+            pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+
+        for weight, bias, activation in self.dense:
+            pooled = activation(pooled @ weight.T + bias)
+        if self.head["normalize"]:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled
+
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        # Sort by length so each batch pads to similar lengths
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            for i, embedding in zip(batch, self._encode_batch([texts[i] for i in batch])):
+                embeddings[i] = embedding
+        result = np.stack(embeddings)
+        return result[0] if single else result
+
+
+# =============================================================================
+# ACCURACY CHECK
+# =============================================================================
+
+def check_accuracy(
+    names: list = None,
+    threads: int = None,
+    limit: int = None,
+    tolerance: float = DEFAULT_TOLERANCE
+) -> dict:
+    """
+    Recompute the embedding metrics with the ONNX encoders and compare with
+    the fp32 scores stored in all_metrics.json.
+
+    Returns per-encoder row-level and mean-level differences; `passed` is
+    False if any model/language mean moves by more than `tolerance`.
+    """
+    import calculate_medlineplus_metrics as scorers
+    from token_batching import set_long_text_policy
+
+    # The stored fp32 scores were computed on truncated texts; compare like for like
+    set_long_text_policy("truncate")
+    names = names or list(ENCODERS)
+    results = load_results_file(RESULTS_FILE)
+    with open(METRICS_FILE, 'r', encoding='utf-8') as f:
+        stored = {(m['doc_id'], m['model'], m['language']): m for m in json.load(f)}
+    results = [r for r in results if (r['doc_id'], r['model'], r['language']) in stored][:limit]
+
+    report = {}
+    for name in names:
+        encoder = OnnxEncoder(name, threads=threads)
+        # (stored fp32 score, args, model, language) for every call of this metric
+        calls = []
+        for result in results:
+            row = stored[(result['doc_id'], result['model'], result['language'])]
+            for field_name, metric, args in scorers.metric_plan(result):
+                if metric == name and row.get(field_name) is not None:
+                    calls.append((row[field_name], args, result['model'], result['language']))
+        if not calls:
+            continue
+
+        start_time = time.perf_counter()
+        scores = scorers.batch_embedding_similarity(encoder, [args for _, args, _, _ in calls])
+        elapsed = time.perf_counter() - start_time
+
+        diffs = np.array([score - fp32 for score, (fp32, _, _, _) in zip(scores, calls)])
+        groups = defaultdict(lambda: ([], []))
+        for score, (fp32, _, model, language) in zip(scores, calls):
+            groups[(model, language)][0].append(fp32)
+            groups[(model, language)][1].append(score)
+        mean_shift = max(abs(np.mean(new) - np.mean(old)) for old, new in groups.values())
+
+        report[name] = {
+            'pairs': len(calls),
+            'seconds': elapsed,
+            'pairs_per_sec': len(calls) / elapsed if elapsed else None,
+            'mean_abs_diff': float(np.abs(diffs).mean()),
+            'max_abs_diff': float(np.abs(diffs).max()),
+            'mean_diff': float(diffs.mean()),
+            'max_group_mean_shift': float(mean_shift),
+            'passed': bool(mean_shift <= tolerance),
+        }
+    return report
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="ONNX Runtime int8 embedding encoders")
+    parser.add_argument("--export", nargs="*", choices=list(ENCODERS), help="Export encoders (default: all)")
+    parser.add_argument("--no-quantize", action="store_true", help="Export fp32 ONNX only")
+    parser.add_argument("--check", nargs="*", choices=list(ENCODERS),
+                        help="Compare with stored fp32 scores (default: all)")
+    parser.add_argument("--threads", type=int, help="ONNX Runtime intra-op threads")
+    parser.add_argument("--limit", type=int, help="Only check the first N results")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Max allowed shift of a model/language mean")
+
+    args = parser.parse_args()
+
+    if args.export is not None:
+        for name in args.export or ENCODERS:
+            export_encoder(name, quantize=not args.no_quantize)
+    elif args.check is not None:
+        report = check_accuracy(args.check or None, args.threads, args.limit, args.tolerance)
+        print(f"\n{'Encoder':<12} {'Pairs':>6} {'Pairs/s':>8} {'Mean |d|':>9} {'Max |d|':>9} "
+              f"{'Max mean shift':>15}  Result")
+        print("-" * 75)
+        for name, r in report.items():
+            print(f"{name:<12} {r['pairs']:>6} {r['pairs_per_sec']:>8.1f} {r['mean_abs_diff']:>9.5f} "
+                  f"{r['max_abs_diff']:>9.5f} {r['max_group_mean_shift']:>15.5f}  "
+                  f"{'PASS' if r['passed'] else 'FAIL'}")
+        sys.exit(0 if all(r['passed'] for r in report.values()) else 1)
+    else:
+        parser.print_help()
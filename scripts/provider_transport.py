@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP Transport for Translation Providers
+
+Every provider SDK used by the pipeline (OpenAI, Anthropic, Google GenAI and
+Moonshot via the OpenAI SDK) accepts a caller-supplied httpx client. This module
+keeps ONE pooled, keep-alive HTTP/2 client per provider so that DNS lookups and
+TLS handshakes are paid once per connection instead of once per API call.
+
+Only the streamed path (--stream, and --fake-llm which implies it) goes
+through these clients. The default path calls
+translation_pipeline.translate_with_retry, which builds its own SDK clients,
+so it gets no pooling and the pipeline skips warm_up() for it.
+
+- HTTP/2 when h2 is installed (httpx[http2]), else HTTP/1.1 keep-alive
+- Pool sizes follow PROVIDER_CONCURRENCY (max in-flight requests per provider)
+- All clients share one SSL context (CA bundle is loaded once per process)
+- warm_up() opens the connections before the first timed translation call
+
+Usage:
+  python provider_transport.py --check https://localhost:8443 --insecure
+  python provider_transport.py --check https://localhost:8443 --insecure --requests 50
+"""
+
+import os
+import ssl
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import logger
+
+# =============================================================================
+# PROVIDER CONFIGURATION
+# =============================================================================
+
+# Pipeline model name -> provider
+MODEL_PROVIDERS = {
+    "gpt-5.1": "openai",
+    "claude-opus-4.5": "anthropic",
+    "gemini-3-pro": "google",
+    "kimi-k2": "moonshot",
+}
+
+PROVIDER_BASE_URLS = {
+    "openai": "https://api.openai.com/v1",
+    "anthropic": "https://api.anthropic.com",
+    "google": "https://generativelanguage.googleapis.com",
+    "moonshot": "https://api.moonshot.ai/v1",
+}
+
+PROVIDER_API_KEY_ENV = {
+    "openai": "OPENAI_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY",
+    "google": "GOOGLE_API_KEY",
+    "moonshot": "MOONSHOT_API_KEY",
+}
+
+# Max concurrent requests per provider. The connection pool is sized to match,
+# so every in-flight request has a warm connection and none are left idle.
+PROVIDER_CONCURRENCY = {
+    "openai": 8,
+    "anthropic": 8,
+    "google": 8,
+    "moonshot": 4,
+}
+
+# Translations of long VIS documents can take minutes; connect should not.
+CONNECT_TIMEOUT = 10.0
+READ_TIMEOUT = 600.0
+KEEPALIVE_EXPIRY = 120.0
+
+# =============================================================================
+# LAZY-LOADED CLIENTS
+# =============================================================================
+
+_ssl_context = None
+_http_clients = {}
+_sdk_clients = {}
+_verify_tls = True
+
+
+def configure_transport(
+    concurrency: Optional[dict] = None,
+    base_urls: Optional[dict] = None,
+    verify_tls: Optional[bool] = None
+):
+    """
+    Override pool sizes, endpoints or TLS verification.
+
+    Must be called before the first client is created; existing clients are
+    closed so the new settings take effect.
+    """
+    global _verify_tls, _ssl_context
+    if concurrency:
+        PROVIDER_CONCURRENCY.update(concurrency)
+    if base_urls:
+        PROVIDER_BASE_URLS.update(base_urls)
+    if verify_tls is not None:
+        _verify_tls = verify_tls
+        _ssl_context = None
+    close_all()
+
+
+def get_ssl_context() -> ssl.SSLContext:
+    """One SSL context for all providers (CA bundle parsed once)."""
+    global _ssl_context
+    if _ssl_context is None:
+        if _verify_tls:
+            _ssl_context = ssl.create_default_context()
+        else:
+            _ssl_context = ssl.create_default_context()
+            _ssl_context.check_hostname = False
+            _ssl_context.verify_mode = ssl.CERT_NONE
+    return _ssl_context
+
+
+def _new_client(**kwargs):
+    """httpx client over HTTP/2, or HTTP/1.1 if httpx refuses http2=True because h2 is missing."""
+    import httpx
+    try:
+        return httpx.Client(http2=True, verify=get_ssl_context(), **kwargs)
+    except ImportError:
+        logger.warning("h2 not installed; falling back to HTTP/1.1 keep-alive (pip install 'httpx[http2]')")
+        return httpx.Client(verify=get_ssl_context(), **kwargs)
+
+
+def get_provider(model_name: str) -> str:
+    if model_name not in MODEL_PROVIDERS:
+        raise ValueError(f"Unknown model: {model_name}. Known: {list(MODEL_PROVIDERS)}")
+    return MODEL_PROVIDERS[model_name]
+
+
+def _pooled_client(pool_size: int):
+    """Keep-alive httpx client with `pool_size` connections."""
+    import httpx
+    return _new_client(
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+    )
+
+
+def get_http_client(provider: str):
+    """Get the pooled keep-alive httpx client for a provider."""
+    if provider not in _http_clients:
+        pool_size = PROVIDER_CONCURRENCY.get(provider, 4)
+        _http_clients[provider] = _pooled_client(pool_size)
+        logger.info(f"HTTP client for {provider} initialized (pool={pool_size})")
+    return _http_clients[provider]
+
+
+def get_sdk_client(model_name: str):
+    """
+    Get the provider SDK client for a model, built on the shared transport.
+
+    SDK clients are cached per provider, so every translation call for the same
+    provider reuses the same connection pool.
+    """
+    provider = get_provider(model_name)
+    if provider in _sdk_clients:
+        return _sdk_clients[provider]
+
+    http_client = get_http_client(provider)
+    base_url = PROVIDER_BASE_URLS[provider]
+    api_key = os.environ.get(PROVIDER_API_KEY_ENV[provider])
+
+    # translate_streaming retries (counting attempts and honouring Retry-After),
+    # so the SDKs' own retry loops are turned off
+    if provider in ("openai", "moonshot"):
+        from openai import OpenAI
+        client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+    elif provider == "anthropic":
+        from anthropic import Anthropic
+        client = Anthropic(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+    elif provider == "google":
+        from google import genai
+        from google.genai import types
+        client = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(base_url=base_url, httpx_client=http_client)
+        )
+    else:
+        raise ValueError(f"No SDK client for provider: {provider}")
+
+    _sdk_clients[provider] = client
+    return client
+
+
+def use_local_server(base_url: str):
+    """
+    Point every provider at one local stand-in (see fake_llm_server.py).
+
+    TLS verification is disabled (self-signed certs) and placeholder API keys
+    are set so the SDKs can be constructed without real credentials.
+    """
+    base_url = base_url.rstrip("/")
+    configure_transport(
+        base_urls={
+            "openai": f"{base_url}/v1",
+            "moonshot": f"{base_url}/v1",
+            "anthropic": base_url,
+            "google": base_url,
+        },
+        verify_tls=False
+    )
+    for env_var in PROVIDER_API_KEY_ENV.values():
+        os.environ.setdefault(env_var, "local-stand-in")
+    logger.info(f"All providers routed to local server: {base_url}")
+
+
+def warm_up(providers) -> dict:
+    """
+    Open one connection per provider ahead of the first translation call.
+
+    Any HTTP status counts as success - we only want the TCP/TLS session up.
+    Returns {provider: seconds to connect} for logging.
+    """
+    timings = {}
+    for provider in sorted(set(providers)):
+        client = get_http_client(provider)
+        start_time = time.time()
+        try:
+            client.head(PROVIDER_BASE_URLS[provider])
+            timings[provider] = time.time() - start_time
+            logger.info(f"  Warmed {provider} connection: {timings[provider]*1000:.0f}ms")
+        except Exception as e:
+            logger.warning(f"  Could not warm {provider} connection: {e}")
+    return timings
+
+
+def close_all():
+    """Close all pooled connections (call at the end of a run)."""
+    for client in _http_clients.values():
+        client.close()
+    _http_clients.clear()
+    _sdk_clients.clear()
+
+
+# =============================================================================
+# CONNECTION REUSE CHECK
+# =============================================================================
+
+def check_connection_reuse(url: str, n_requests: int = 20, pool_size: int = 1) -> dict:
+    """
+    Compare per-request latency with a fresh client per request (new TCP + TLS
+    handshake each time) against the pooled client (handshake once).
+    Point this at a local HTTPS stand-in to verify the transport offline.
+    """
+    def timed_requests(get_client, close_each):
+        latencies = []
+        http_version = None
+        for _ in range(n_requests):
+            client = get_client()
+            start_time = time.perf_counter()
+            response = client.get(url)
+            latencies.append(time.perf_counter() - start_time)
+            http_version = response.http_version
+            if close_each:
+                client.close()
+        return latencies, http_version
+
+    fresh, fresh_version = timed_requests(_new_client, close_each=True)
+
+    # A client of its own: the check must not touch the providers' pools or settings
+    pooled_client = _pooled_client(pool_size)
+    try:
+        pooled, pooled_version = timed_requests(lambda: pooled_client, close_each=False)
+    finally:
+        pooled_client.close()
+
+    def ms(values):
+        return sum(values) / len(values) * 1000
+
+    return {
+        'url': url,
+        'requests': n_requests,
+        'fresh_mean_ms': ms(fresh),
+        'pooled_mean_ms': ms(pooled),
+        # First pooled call pays the handshake; the rest should not
+        'pooled_first_ms': pooled[0] * 1000,
+        'pooled_reused_mean_ms': ms(pooled[1:]) if n_requests > 1 else None,
+        'http_version': pooled_version or fresh_version,
+    }
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Shared provider transport")
+    parser.add_argument("--check", metavar="URL", help="Measure connection reuse against URL")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per mode for --check")
+    parser.add_argument("--insecure", action="store_true", help="Skip TLS verification (self-signed stand-in)")
+
+    args = parser.parse_args()
+
+    if args.check:
+        if args.insecure:
+            configure_transport(verify_tls=False)
+        report = check_connection_reuse(args.check, args.requests)
+        print(f"\nConnection reuse check: {report['url']} ({report['http_version']})")
+        print(f"  Fresh client per request:  {report['fresh_mean_ms']:8.1f} ms/request")
+        print(f"  Pooled client:             {report['pooled_mean_ms']:8.1f} ms/request")
+        print(f"    first request:           {report['pooled_first_ms']:8.1f} ms")
+        if report['pooled_reused_mean_ms'] is not None:
+            print(f"    reused connection:       {report['pooled_reused_mean_ms']:8.1f} ms/request")
+    else:
+        parser.print_help()
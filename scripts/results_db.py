@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+SQLite Results and Metrics Database
+
+Pipeline results and metric rows, kept in one SQLite file so questions about
+them are answered by indexed queries instead of loading and filtering the
+JSON files:
+
+- results:       one row per (doc_id, model, language) job
+- texts:         each distinct text once (keyed by the same SHA-256 as text_store.py),
+                 with result_texts linking jobs to their five texts
+- texts_fts:     FTS5 full-text index over the texts (trigram tokenizer, so
+                 Chinese, Korean and Vietnamese substrings match as well as
+                 English words; databases built with the old word tokenizer
+                 are re-indexed on open)
+- metrics:       one row per job and metric (long format, so new metric
+                 fields need no schema change)
+
+The pipeline and the metrics script insert into it as rows are produced, each
+insert in its own transaction; --import backfills from the JSON files.
+
+Usage:
+  python results_db.py --import                                   # Load all_results.json + all_metrics.json
+  python results_db.py --worst cross_lang_labse --language haitian_creole --n 20
+  python results_db.py --best same_lang_comet --model gpt-5.1 --category cancer
+  python results_db.py --mean backtrans_bleu --by model language
+  python results_db.py --search anaphylaxis
+  python results_db.py --search "severe allergic reaction" --field llm_back_translation --language spanish
+"""
+
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from text_store import TEXT_FIELDS, text_key, load_results_file
+
+BASE_DIR = Path("/Users/chukanya/Documents/Coding/Back translation project")
+RESULTS_DB = BASE_DIR / "output" / "medlineplus_results" / "results.db"
+RESULTS_FILE = BASE_DIR / "output" / "medlineplus_results" / "all_results.json"
+METRICS_FILE = BASE_DIR / "output" / "medlineplus_metrics" / "all_metrics.json"
+
+FILTER_COLUMNS = ("doc_id", "model", "language", "category")
+
+# unicode61 splits on spaces only, so a Chinese paragraph was one token and
+# never matched a word inside it; trigrams match any substring of 3+ characters
+FTS_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS texts_fts USING fts5 (
+        text, content='texts', content_rowid='id', tokenize='trigram'
+    );
+"""
+MIN_FTS_QUERY = 3  # Shorter phrases (e.g. 2-character Chinese words) are scanned instead
+SNIPPET_CHARS = 40
+
+# ComparisonResult fields stored as columns (texts go to the texts table)
+RESULT_COLUMNS = (
+    "success", "error_message", "timestamp", "translation_time",
+    "back_translation_time", "professional_back_translation_time",
+)
+
+
+def result_key(doc_id: str, model: str, language: str) -> str:
+    """Same key format as the pipeline and metrics checkpoints."""
+    return f"{doc_id}|{model}|{language}"
+
+
+def _snippet(text: str, phrase: str) -> str:
+    """FTS5-style snippet around the first occurrence of phrase (for scanned searches)."""
+    i = text.lower().find(phrase.lower())
+    start, end = max(i - SNIPPET_CHARS // 2, 0), i + len(phrase) + SNIPPET_CHARS // 2
+    return ("..." if start else "") + text[start:i] + "[" + text[i:i + len(phrase)] + "]" + \
+        text[i + len(phrase):end] + ("..." if end < len(text) else "")
+
+
+class ResultsDB:
+    """Results, texts and metrics in SQLite (WAL mode)."""
+
+    def __init__(self, db_path=None):
+        self.db_path = Path(db_path or RESULTS_DB)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                doc_id TEXT NOT NULL,
+                category TEXT NOT NULL,
+                model TEXT NOT NULL,
+                language TEXT NOT NULL,
+                success INTEGER,
+                error_message TEXT,
+                timestamp TEXT,
+                translation_time REAL,
+                back_translation_time REAL,
+                professional_back_translation_time REAL,
+                step_stats TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_results_doc ON results (doc_id);
+            CREATE INDEX IF NOT EXISTS idx_results_model ON results (model, language);
+            CREATE INDEX IF NOT EXISTS idx_results_language ON results (language);
+            CREATE INDEX IF NOT EXISTS idx_results_category ON results (category);
+
+            CREATE TABLE IF NOT EXISTS texts (
+                id INTEGER PRIMARY KEY,
+                hash TEXT NOT NULL UNIQUE,
+                text TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS result_texts (
+                key TEXT NOT NULL,
+                field TEXT NOT NULL,
+                text_id INTEGER NOT NULL REFERENCES texts (id),
+                PRIMARY KEY (key, field)
+            );
+            CREATE INDEX IF NOT EXISTS idx_result_texts_text ON result_texts (text_id);
+
+            CREATE TABLE IF NOT EXISTS metrics (
+                key TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                category TEXT NOT NULL,
+                model TEXT NOT NULL,
+                language TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                value REAL,
+                PRIMARY KEY (key, metric)
+            );
+            CREATE INDEX IF NOT EXISTS idx_metrics_language ON metrics (metric, language, value);
+            CREATE INDEX IF NOT EXISTS idx_metrics_model ON metrics (metric, model, value);
+            CREATE INDEX IF NOT EXISTS idx_metrics_category ON metrics (metric, category, value);
+            CREATE INDEX IF NOT EXISTS idx_metrics_doc ON metrics (doc_id);
+        """)
+        self._migrate_fts()
+
+    def _migrate_fts(self):
+        """Create texts_fts, rebuilding it if an older version used the word tokenizer."""
+        row = self.conn.execute("SELECT sql FROM sqlite_master WHERE name = 'texts_fts'").fetchone()
+        if row and "trigram" in row[0]:
+            return
+        with self.conn:
+            if row:
+                self.conn.execute("DROP TABLE texts_fts")
+            self.conn.execute(FTS_SCHEMA)
+            self.conn.execute("INSERT INTO texts_fts (texts_fts) VALUES ('rebuild')")
+
+    # =========================================================================
+    # WRITES
+    # =========================================================================
+
+    def _text_id(self, text: str) -> int:
+        key = text_key(text)
+        row = self.conn.execute("SELECT id FROM texts WHERE hash = ?", (key,)).fetchone()
+        if row:
+            return row[0]
+        text_id = self.conn.execute("INSERT INTO texts (hash, text) VALUES (?, ?)", (key, text)).lastrowid
+        self.conn.execute("INSERT INTO texts_fts (rowid, text) VALUES (?, ?)", (text_id, text))
+        return text_id
+
+    def insert_results(self, results: list):
+        """Insert or replace ComparisonResult dicts (one transaction)."""
+        with self.conn:
+            for result in results:
+                key = result_key(result['doc_id'], result['model'], result['language'])
+                step_stats = result.get('step_stats')
+                self.conn.execute(
+                    f"INSERT OR REPLACE INTO results (key, doc_id, category, model, language, "
+                    f"{', '.join(RESULT_COLUMNS)}, step_stats) VALUES ({', '.join('?' * (len(RESULT_COLUMNS) + 6))})",
+                    (key, result['doc_id'], result['doc_id'].split('/')[0], result['model'], result['language'],
+                     *(result.get(c) for c in RESULT_COLUMNS), json.dumps(step_stats) if step_stats else None)
+                )
+                self.conn.execute("DELETE FROM result_texts WHERE key = ?", (key,))
+                for field in TEXT_FIELDS:
+                    text = result.get(field)
+                    if text:
+                        self.conn.execute("INSERT INTO result_texts (key, field, text_id) VALUES (?, ?, ?)",
+                                          (key, field, self._text_id(text)))
+
+    def insert_metrics(self, rows: list):
+        """Insert or replace TranslationMetrics dicts (one transaction)."""
+        with self.conn:
+            for row in rows:
+                key = result_key(row['doc_id'], row['model'], row['language'])
+                category = row['doc_id'].split('/')[0]
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO metrics (key, doc_id, category, model, language, metric, value) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(key, row['doc_id'], category, row['model'], row['language'], metric, value)
+                     for metric, value in row.items()
+                     if metric not in ("doc_id", "model", "language") and isinstance(value, (int, float, type(None)))]
+                )
+
+    # =========================================================================
+    # QUERIES
+    # =========================================================================
+
+    @staticmethod
+    def _where(filters: dict, prefix: str = "") -> tuple[str, list]:
+        clauses, params = [], []
+        for col, value in filters.items():
+            if col not in FILTER_COLUMNS:
+                raise ValueError(f"Cannot filter by {col}. Choose from {FILTER_COLUMNS}")
+            if value is not None:
+                clauses.append(f"{prefix}{col} = ?")
+                params.append(value)
+        return "".join(f" AND {c}" for c in clauses), params
+
+    def ranked(self, metric: str, n: int = 20, worst: bool = True, **filters) -> list[dict]:
+        """The n lowest (or highest) scoring rows for a metric, optionally filtered."""
+        where, params = self._where(filters)
+        rows = self.conn.execute(f"""
+            SELECT doc_id, model, language, value FROM metrics
+            WHERE metric = ? AND value IS NOT NULL{where}
+            ORDER BY value {'ASC' if worst else 'DESC'} LIMIT ?
+        """, [metric, *params, n]).fetchall()
+        return [dict(zip(("doc_id", "model", "language", "value"), row)) for row in rows]
+
+    def mean(self, metric: str, group_by: tuple = ("model",), **filters) -> list[dict]:
+        """Mean and count of a metric grouped by any of doc_id/model/language/category."""
+        for col in group_by:
+            if col not in FILTER_COLUMNS:
+                raise ValueError(f"Cannot group by {col}. Choose from {FILTER_COLUMNS}")
+        where, params = self._where(filters)
+        cols = ", ".join(group_by)
+        rows = self.conn.execute(f"""
+            SELECT {cols}, AVG(value), COUNT(value) FROM metrics
+            WHERE metric = ?{where} GROUP BY {cols} ORDER BY {cols}
+        """, [metric, *params]).fetchall()
+        n = len(group_by)
+        return [{**dict(zip(group_by, row[:n])), 'mean': row[n], 'n': row[n + 1]} for row in rows]
+
+    def search(self, query: str, field: str = None, limit: int = 50, **filters) -> list[dict]:
+        """
+        Rows whose texts contain a phrase (case-insensitive substring), with a
+        snippet. FTS5 syntax (AND, OR, NOT, prefix*) is passed through when the
+        query contains quotes or operators. Phrases under MIN_FTS_QUERY
+        characters, too short for a trigram index, are found by a scan.
+        """
+        plain = not any(op in query for op in ('"', ' AND ', ' OR ', ' NOT ', '*'))
+        where, params = self._where(filters, prefix="r.")
+        if field:
+            where += " AND rt.field = ?"
+            params.append(field)
+        columns = ("doc_id", "model", "language", "field", "snippet")
+        if plain and len(query) < MIN_FTS_QUERY:
+            rows = self.conn.execute(f"""
+                SELECT r.doc_id, r.model, r.language, rt.field, t.text
+                FROM texts t
+                JOIN result_texts rt ON rt.text_id = t.id
+                JOIN results r ON r.key = rt.key
+                WHERE instr(lower(t.text), lower(?)) > 0{where}
+                ORDER BY r.doc_id, r.model, r.language, rt.field
+                LIMIT ?
+            """, [query, *params, limit]).fetchall()
+            return [dict(zip(columns, (*row[:4], _snippet(row[4], query)))) for row in rows]
+        if plain:
+            query = '"' + query.replace('"', '""') + '"'
+        rows = self.conn.execute(f"""
+            SELECT r.doc_id, r.model, r.language, rt.field,
+                   snippet(texts_fts, 0, '[', ']', '...', {SNIPPET_CHARS})
+            FROM texts_fts
+            JOIN result_texts rt ON rt.text_id = texts_fts.rowid
+            JOIN results r ON r.key = rt.key
+            WHERE texts_fts MATCH ?{where}
+            ORDER BY r.doc_id, r.model, r.language, rt.field
+            LIMIT ?
+        """, [query, *params, limit]).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def text(self, doc_id: str, model: str, language: str, field: str) -> str:
+        row = self.conn.execute("""
+            SELECT t.text FROM result_texts rt JOIN texts t ON t.id = rt.text_id
+            WHERE rt.key = ? AND rt.field = ?
+        """, (result_key(doc_id, model, language), field)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        self.conn.close()
+
+
+def import_files(db: ResultsDB, results_file=None, metrics_file=None) -> tuple[int, int]:
+    """Backfill the database from the JSON results and metrics files."""
+    results_file = Path(results_file or RESULTS_FILE)
+    metrics_file = Path(metrics_file or METRICS_FILE)
+    n_results = n_metrics = 0
+    if results_file.exists():
+        results = load_results_file(results_file)
+        db.insert_results(results)
+        n_results = len(results)
+    if metrics_file.exists():
+        with open(metrics_file, 'r', encoding='utf-8') as f:
+            metrics = json.load(f)
+        db.insert_metrics(metrics)
+        n_metrics = len(metrics)
+    return n_results, n_metrics
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Query the results/metrics database")
+    parser.add_argument("--db", help="Database file (default: output/medlineplus_results/results.db)")
+    parser.add_argument("--import", dest="import_files", action="store_true",
+                        help="Load all_results.json and all_metrics.json into the database")
+    parser.add_argument("--worst", metavar="METRIC", help="Lowest-scoring rows for a metric")
+    parser.add_argument("--best", metavar="METRIC", help="Highest-scoring rows for a metric")
+    parser.add_argument("--mean", metavar="METRIC", help="Mean of a metric per group")
+    parser.add_argument("--by", nargs="+", default=["model"], choices=FILTER_COLUMNS, help="Group --mean by")
+    parser.add_argument("--search", metavar="QUERY", help="Full-text search over all texts")
+    parser.add_argument("--field", choices=TEXT_FIELDS, help="Only search this text field")
+    parser.add_argument("--n", type=int, default=20, help="Rows to show")
+    for col in FILTER_COLUMNS:
+        parser.add_argument(f"--{col.replace('_', '-')}", dest=col, help=f"Filter by {col}")
+
+    args = parser.parse_args()
+    db = ResultsDB(args.db)
+    filters = {col: getattr(args, col) for col in FILTER_COLUMNS}
+    start_time = time.perf_counter()
+
+    if args.import_files:
+        n_results, n_metrics = import_files(db)
+        print(f"Imported {n_results} results and {n_metrics} metric rows into {db.db_path}")
+
+    elif args.worst or args.best:
+        metric = args.worst or args.best
+        print(f"\n{'Document':<40} {'Model':<18} {'Language':<20} {metric:>12}")
+        print("-" * 93)
+        for row in db.ranked(metric, args.n, worst=bool(args.worst), **filters):
+            print(f"{row['doc_id']:<40} {row['model']:<18} {row['language']:<20} {row['value']:>12.4f}")
+
+    elif args.mean:
+        header = " ".join(f"{c:<24}" for c in args.by)
+        print(f"\n{header} {args.mean:>12} {'N':>6}")
+        print("-" * (25 * len(args.by) + 20))
+        for row in db.mean(args.mean, tuple(args.by), **filters):
+            keys = " ".join(f"{str(row[c]):<24}" for c in args.by)
+            mean = f"{row['mean']:.4f}" if row['mean'] is not None else "-"
+            print(f"{keys} {mean:>12} {row['n']:>6}")
+
+    elif args.search:
+        rows = db.search(args.search, args.field, args.n, **filters)
+        for row in rows:
+            print(f"{row['doc_id']} | {row['model']} | {row['language']} | {row['field']}")
+            print(f"    {row['snippet']}")
+        print(f"\n{len(rows)} matches")
+
+    else:
+        parser.print_help()
+        sys.exit(0)
+
+    print(f"({(time.perf_counter() - start_time) * 1000:.1f} ms)")
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Failure Classification and Retry Queue for Pipeline Jobs
+
+translate_with_retry / translate_streaming already retry a call a few times
+within seconds. A job that still fails (a rate-limit window that outlasts
+those retries, a provider outage, a filtered document, a bad key) used to be
+checkpointed as completed with empty texts, so it was never retried and
+surfaced later as "Missing data" in the metrics.
+
+Failures are now classified from the exception: its HTTP status, then its
+type, then its message (content-filter wording only counts for 400s and
+errors without a status, so a 429 that mentions "blocked" stays retryable):
+
+  rate_limit      429, quota / resource exhausted        retryable
+  timeout         read/connect timeouts, 408, deadlines   retryable
+  server_error    5xx, 529 overloaded                     retryable
+  connection      dropped or refused connections          retryable
+  empty_output    the model returned no text              retryable
+  other           anything unrecognised                   retryable
+  content_filter  safety / content-policy blocks          permanent
+  auth            401 / 403, missing or invalid API key   permanent
+
+RetryQueue keeps every failed job (failed_jobs.json next to the results) with
+its kind, attempt count and the time it may be retried, backing off
+exponentially from a per-kind base delay. A job becomes a dead letter when
+its kind is permanent or it has used MAX_ATTEMPTS; dead letters are reported
+separately and skipped on resume until --retry-failed clears them.
+
+The shared job queue (job_queue.py, --worker) applies the same rules with
+backoff_seconds(), keeping the failures in the queue itself.
+"""
+
+import json
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Optional
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import logger
+
+FAILED_JOBS_FILE = "failed_jobs.json"
+MAX_ATTEMPTS = 4                 # Main pass + 3 retries
+MAX_BACKOFF_SECONDS = 900.0
+
+RATE_LIMIT = "rate_limit"
+TIMEOUT = "timeout"
+SERVER_ERROR = "server_error"
+CONNECTION = "connection"
+EMPTY_OUTPUT = "empty_output"
+OTHER = "other"
+CONTENT_FILTER = "content_filter"
+AUTH = "auth"
+
+# Kind -> base backoff before the first retry (doubled on each further attempt)
+RETRYABLE_KINDS = {
+    RATE_LIMIT: 60.0,
+    TIMEOUT: 15.0,
+    SERVER_ERROR: 30.0,
+    CONNECTION: 15.0,
+    EMPTY_OUTPUT: 5.0,
+    OTHER: 30.0,
+}
+
+STATUS_KINDS = {
+    401: AUTH, 403: AUTH, 408: TIMEOUT, 429: RATE_LIMIT,
+    500: SERVER_ERROR, 502: SERVER_ERROR, 503: SERVER_ERROR, 504: SERVER_ERROR, 529: SERVER_ERROR,
+}
+
+# Exception class name fragments (openai, anthropic, google-genai, httpx)
+TYPE_KINDS = (
+    ("RateLimit", RATE_LIMIT),
+    ("Timeout", TIMEOUT),
+    ("Authentication", AUTH),
+    ("PermissionDenied", AUTH),
+    ("InternalServer", SERVER_ERROR),
+    ("Overloaded", SERVER_ERROR),
+    ("Connect", CONNECTION),
+)
+
+# Provider wording for blocked prompts/outputs (OpenAI/Azure content_filter,
+# Gemini SAFETY / PROHIBITED_CONTENT / RECITATION block reasons)
+CONTENT_FILTER_PATTERN = re.compile(
+    r"content[ _-]?(filter|policy|management)|prohibited[ _]content|"
+    r"(block|finish)[ _]?reason\W+(safety|prohibited_content|recitation|blocklist)|"
+    r"blocked (by|due to) (the )?(safety|content|moderation)|flagged by (the )?moderation",
+    re.IGNORECASE,
+)
+# Status in the message, for errors saved as text ("Error code: 429 - ...")
+MESSAGE_STATUS = re.compile(r"\b(?:error code|status(?: code)?)\W+(\d{3})\b", re.IGNORECASE)
+
+# Checked in order, after the status, exception type and content-filter checks
+MESSAGE_KINDS = (
+    (RATE_LIMIT, re.compile(r"rate[ _-]?limit|too many requests|quota|resource[ _]exhausted|\b429\b",
+                            re.IGNORECASE)),
+    (AUTH, re.compile(r"api[ _-]?key|unauthori[sz]ed|authenticat|permission[ _]denied|forbidden|\b40[13]\b",
+                      re.IGNORECASE)),
+    (TIMEOUT, re.compile(r"timed? ?out|timeout|deadline", re.IGNORECASE)),
+    (SERVER_ERROR, re.compile(r"\b50[0234]\b|\b529\b|overloaded|internal (server )?error|unavailable",
+                              re.IGNORECASE)),
+    (CONNECTION, re.compile(r"connection|remote.*closed|reset by peer|broken pipe", re.IGNORECASE)),
+    (EMPTY_OUTPUT, re.compile(r"empty translation", re.IGNORECASE)),
+)
+
+
+def _status(error, message: str) -> Optional[int]:
+    """HTTP status of an exception (status_code / code / status), else one quoted in the message."""
+    for attr in ("status_code", "code", "status"):
+        status = getattr(error, attr, None)
+        if isinstance(status, int):
+            return status
+    match = MESSAGE_STATUS.search(message)
+    return int(match.group(1)) if match else None
+
+
+def classify_failure(error) -> str:
+    """Failure kind of an exception (or, for results saved earlier, its message)."""
+    message = str(error or "")
+    status = _status(error, message)
+    if status in STATUS_KINDS:
+        return STATUS_KINDS[status]
+    if isinstance(error, BaseException):
+        for cls in type(error).__mro__:
+            for fragment, kind in TYPE_KINDS:
+                if fragment in cls.__name__:
+                    return kind
+    if status in (None, 400) and CONTENT_FILTER_PATTERN.search(message):
+        return CONTENT_FILTER
+    for kind, pattern in MESSAGE_KINDS:
+        if pattern.search(message):
+            return kind
+    return OTHER
+
+
+def is_retryable(kind: str) -> bool:
+    return kind in RETRYABLE_KINDS
+
+
+def backoff_seconds(kind: str, attempts: int, scale: float = 1.0) -> float:
+    """Seconds to wait before the next attempt of a job that has failed `attempts` times."""
+    delay = RETRYABLE_KINDS.get(kind, RETRYABLE_KINDS[OTHER]) * 2 ** (attempts - 1)
+    return min(delay, MAX_BACKOFF_SECONDS) * scale
+
+
+# =============================================================================
+# RETRY QUEUE
+# =============================================================================
+
+@dataclass
+class FailedJob:
+    key: str
+    doc_id: str
+    model: str
+    language: str
+    kind: str
+    error: str
+    attempts: int = 1
+    retry_at: float = 0.0       # Unix time
+    permanent: bool = False     # Dead letter: not retried again
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class RetryQueue:
+    """Failed jobs awaiting a retry plus dead letters, persisted as JSON."""
+
+    def __init__(self, path, max_attempts: int = MAX_ATTEMPTS, backoff_scale: float = 1.0):
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        self.backoff_scale = backoff_scale
+        self.jobs = {}
+        if self.path.exists():
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            for entry in data.get("retryable", []) + data.get("permanent", []):
+                self.jobs[entry["key"]] = FailedJob(**entry)
+
+    def _save(self):
+        data = {
+            "retryable": [job.to_dict() for job in self.jobs.values() if not job.permanent],
+            "permanent": [job.to_dict() for job in self.jobs.values() if job.permanent],
+        }
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def backoff(self, kind: str, attempts: int) -> float:
+        return backoff_seconds(kind, attempts, self.backoff_scale)
+
+    def record(self, key: str, doc_id: str, model: str, language: str,
+               kind: Optional[str], error: Optional[str]) -> FailedJob:
+        """Record a failed attempt; the job is dead-lettered if permanent or out of attempts."""
+        kind = kind or classify_failure(error)
+        previous = self.jobs.get(key)
+        attempts = previous.attempts + 1 if previous else 1
+        job = FailedJob(key, doc_id, model, language, kind, error or "", attempts,
+                        permanent=not is_retryable(kind) or attempts >= self.max_attempts)
+        job.retry_at = time.time() + self.backoff(kind, attempts)
+        self.jobs[key] = job
+        self._save()
+        return job
+
+    def resolve(self, key: str):
+        """The job succeeded; forget its failures."""
+        if self.jobs.pop(key, None) is not None:
+            self._save()
+
+    def is_dead(self, key: str) -> bool:
+        job = self.jobs.get(key)
+        return job is not None and job.permanent
+
+    def next_due(self, keys=None) -> Optional[FailedJob]:
+        """The retryable job (among `keys`, if given) that may be retried soonest."""
+        waiting = [job for job in self.jobs.values()
+                   if not job.permanent and (keys is None or job.key in keys)]
+        return min(waiting, key=lambda job: job.retry_at) if waiting else None
+
+    def dead_letters(self) -> list[FailedJob]:
+        return sorted((job for job in self.jobs.values() if job.permanent), key=lambda job: job.key)
+
+    def clear(self):
+        """Forget every failure, dead letters included (--no-resume, --retry-failed)."""
+        self.jobs = {}
+        self._save()
+
+
+def print_failure_report(failures: list[FailedJob], location):
+    """Dead letters grouped by kind (jobs still retryable are listed as pending)."""
+    pending = [job for job in failures if not job.permanent]
+    dead = sorted((job for job in failures if job.permanent), key=lambda job: job.key)
+    if not pending and not dead:
+        logger.info("No failed jobs")
+        return
+    if pending:
+        logger.warning(f"{len(pending)} jobs still waiting for a retry (resume to continue)")
+    if dead:
+        logger.error(f"{len(dead)} permanent failures (dead letters in {location}):")
+        for kind in sorted({job.kind for job in dead}):
+            jobs = [job for job in dead if job.kind == kind]
+            logger.error(f"  {kind}: {len(jobs)}")
+            for job in jobs:
+                logger.error(f"    {job.key} after {job.attempts} attempt(s): {job.error[:120]}")
@@ -19,7 +19,7 @@ Translation pairs: 22 topics × 8 languages × 4 models = 704 pairs
 import json
 import time
 from pathlib import Path
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields, MISSING
 from datetime import datetime
 from typing import Optional
 import sys
@@ -31,9 +31,17 @@ from config import (
     ACTIVE_MODELS, ACTIVE_LANGUAGES, LANGUAGES,
     TRANSLATIONS_DIR, logger
 )
-from translation_pipeline import (
-    run_translation_pipeline, translate_with_retry,
-    save_checkpoint, load_checkpoint, TranslationResult
+from provider_transport import MODEL_PROVIDERS, warm_up, close_all, use_local_server
+from job_queue import Job, open_queue, keep_alive, default_worker_id
+from job_scheduler import estimate_job, estimate_tokens, schedule_jobs, print_plan
+from streaming_translation import translate_streaming, StepStats, prompt_source, use_load_test_prompts
+from cost_ledger import CostLedger
+from results_db import ResultsDB
+from tracing import span, configure_tracing
+from text_store import save_results_file, load_results_file
+from retry_queue import (
+    RetryQueue, FailedJob, FAILED_JOBS_FILE, MAX_ATTEMPTS, classify_failure, is_retryable, backoff_seconds,
+    print_failure_report
 )
 
 # =============================================================================
@@ -45,6 +53,11 @@ EXTRACTED_DIR = BASE_DIR / "data" / "extracted_text"
 OUTPUT_DIR = BASE_DIR / "output" / "medlineplus_results"
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# Pause between API calls (set to 0 when running against the local fake server)
+RATE_LIMIT_SECONDS = 1.0
+# Multiplier on the retry queue's backoff (minutes against real providers)
+RETRY_BACKOFF_SCALE = 1.0
+
 # =============================================================================
 # LANGUAGE MAPPING
 # =============================================================================
@@ -114,6 +127,9 @@ class ComparisonResult:
     timestamp: str
     success: bool
     error_message: Optional[str] = None
+    failure_kind: Optional[str] = None  # retry_queue.classify_failure kind when success is False
+    # Per-step latency/token breakdown: {"forward"|"llm_back"|"prof_back": StepStats dict}
+    step_stats: Optional[dict] = None
 
     def to_dict(self):
         return asdict(self)
@@ -194,14 +210,128 @@ def load_all_documents() -> list[MedlinePlusDocument]:
     return documents
 
 
+def scale_documents(documents: list[MedlinePlusDocument], scale: int) -> list[MedlinePlusDocument]:
+    """
+    Replicate the corpus `scale` times (doc_ids get a ~N suffix) for load tests
+    against the fake server. scale=1 returns the documents unchanged.
+    """
+    if scale <= 1:
+        return documents
+    scaled = list(documents)
+    for copy_index in range(1, scale):
+        for doc in documents:
+            scaled.append(MedlinePlusDocument(
+                doc_id=f"{doc.doc_id}~{copy_index}",
+                category=doc.category,
+                topic=doc.topic,
+                english_text=doc.english_text,
+                professional_translations=doc.professional_translations
+            ))
+    return scaled
+
+
+def find_document(documents: dict, doc_id: str) -> Optional[MedlinePlusDocument]:
+    """
+    Look up a doc_id, including the ~N copies made by scale_documents, so a
+    queue worker can run jobs enqueued with --scale from the unscaled corpus.
+    """
+    if doc_id in documents:
+        return documents[doc_id]
+    base_id, _, copy_index = doc_id.rpartition("~")
+    if base_id in documents and copy_index.isdigit():
+        return scale_documents([documents[base_id]], int(copy_index) + 1)[-1]
+    return None
+
+
+def use_fake_llm(base_url: str):
+    """
+    Route all models to a local fake server (fake_llm_server.py) for offline
+    load testing. Results go to a separate directory so real results are never
+    overwritten, and rate-limit pauses are disabled.
+    """
+    global OUTPUT_DIR, RATE_LIMIT_SECONDS, RETRY_BACKOFF_SCALE
+    use_local_server(base_url)
+    OUTPUT_DIR = BASE_DIR / "output" / "fake_llm_results"
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    RATE_LIMIT_SECONDS = 0.0
+    RETRY_BACKOFF_SCALE = 0.01
+    use_load_test_prompts()  # The fake server parses these; real runs use translation_pipeline's
+    logger.info(f"Fake LLM mode: results in {OUTPUT_DIR}")
+
+
 # =============================================================================
 # TRANSLATION PIPELINE
 # =============================================================================
 
+def translate_with_retry(**kwargs) -> str:
+    """
+    translation_pipeline.translate_with_retry, imported on first use so that
+    --list-docs, --help and queue/scheduler commands do not load the provider SDKs.
+    """
+    from translation_pipeline import translate_with_retry as _translate_with_retry
+    return _translate_with_retry(**kwargs)
+
+
+def translate_step(
+    stream: bool = False,
+    step: str = "forward",
+    doc_id: str = None,
+    language: str = None,
+    ledger: CostLedger = None,
+    **kwargs
+) -> tuple[str, StepStats]:
+    """
+    One translation call, streamed (full latency breakdown) or via translate_with_retry (total time only).
+
+    language is the job's language key, so back-translation steps (whose
+    target_language is English) are attributed to the job in traces and in
+    the cost ledger, which gets a row per call (per attempt when streamed),
+    failed calls included.
+    """
+    def record_call(input_tokens, output_tokens, estimated, failed):
+        if ledger:
+            ledger.record_call(doc_id, kwargs.get("model_name"), language, step,
+                               input_tokens, output_tokens, estimated, failed)
+
+    with span(f"translate.{step}", doc_id=doc_id, model=kwargs.get("model_name"),
+              language=language, streamed=stream) as step_span:
+        if stream:
+            text, stats = translate_streaming(**kwargs, on_attempt=record_call)
+        else:
+            # translate_with_retry retries internally, out of sight: its attempts
+            # and backoff are all inside this one span and one ledger row
+            input_tokens = estimate_tokens(kwargs.get("text") or "")
+            with span("translate.attempt", model=kwargs.get("model_name"),
+                      target_language=kwargs.get("target_language"), streamed=False,
+                      internal_retries=True):
+                start_time = time.perf_counter()
+                try:
+                    text = translate_with_retry(**kwargs)
+                except Exception:
+                    record_call(input_tokens, 0, True, True)
+                    raise
+                stats = StepStats(total_seconds=time.perf_counter() - start_time)
+            record_call(input_tokens, estimate_tokens(text or ""), True, not text)
+        if stats.retries is not None:
+            step_span.set_attribute("retries", stats.retries)
+        if stats.output_tokens is not None:
+            step_span.set_attribute("output_tokens", stats.output_tokens)
+        return text, stats
+
+
+def rate_limit():
+    """Pause between API calls (shows up as an idle span in traces)."""
+    if RATE_LIMIT_SECONDS > 0:
+        with span("rate_limit.sleep", seconds=RATE_LIMIT_SECONDS):
+            time.sleep(RATE_LIMIT_SECONDS)
+
+
 def run_comparison_pipeline(
     doc: MedlinePlusDocument,
     model_name: str,
-    lang_key: str
+    lang_key: str,
+    stream: bool = False,
+    ledger: CostLedger = None
 ) -> ComparisonResult:
     """
     Run translation and compare with professional translation.
@@ -216,38 +346,51 @@ def run_comparison_pipeline(
     - Goal 1: LLM back-translation vs Original English
     - Goal 2: LLM translation vs Professional translation
     - Goal 3: Professional back-translation vs Original English (and vs LLM back-translation)
+
+    With stream=True, each step also records TTFT, tokens/sec and retries in step_stats.
     """
     timestamp = datetime.now().isoformat()
     language_name = LANGUAGES[lang_key]["name"]
+    step_stats = {}
 
     logger.info(f"Processing: {doc.doc_id} | {model_name} | {language_name}")
 
     try:
         # Step 1: Forward translation (English → Target)
-        start_time = time.time()
-        llm_translation = translate_with_retry(
+        llm_translation, stats = translate_step(
+            stream,
+            step="forward",
+            doc_id=doc.doc_id,
+            language=lang_key,
+            ledger=ledger,
             text=doc.english_text,
             target_language=language_name,
             model_name=model_name,
             is_back_translation=False
         )
-        translation_time = time.time() - start_time
-        logger.info(f"  Forward translation: {translation_time:.2f}s")
+        step_stats["forward"] = stats.to_dict()
+        translation_time = stats.total_seconds
+        logger.info(f"  Forward translation: {format_step(stats)}")
 
         # Rate limiting
-        time.sleep(1)
+        rate_limit()
 
         # Step 2: Back translation of LLM output (Target → English)
-        start_time = time.time()
-        llm_back_translation = translate_with_retry(
+        llm_back_translation, stats = translate_step(
+            stream,
+            step="llm_back",
+            doc_id=doc.doc_id,
+            language=lang_key,
+            ledger=ledger,
             text=llm_translation,
             target_language="English",
             model_name=model_name,
             is_back_translation=True,
             source_language=language_name
         )
-        back_translation_time = time.time() - start_time
-        logger.info(f"  LLM back-translation: {back_translation_time:.2f}s")
+        step_stats["llm_back"] = stats.to_dict()
+        back_translation_time = stats.total_seconds
+        logger.info(f"  LLM back-translation: {format_step(stats)}")
 
         # Get professional translation for comparison
         professional_translation = doc.professional_translations.get(lang_key, "")
@@ -257,17 +400,22 @@ def run_comparison_pipeline(
         professional_back_translation_time = 0.0
 
         if professional_translation:
-            time.sleep(1)  # Rate limiting
-            start_time = time.time()
-            professional_back_translation = translate_with_retry(
+            rate_limit()
+            professional_back_translation, stats = translate_step(
+                stream,
+                step="prof_back",
+                doc_id=doc.doc_id,
+                language=lang_key,
+                ledger=ledger,
                 text=professional_translation,
                 target_language="English",
                 model_name=model_name,
                 is_back_translation=True,
                 source_language=language_name
             )
-            professional_back_translation_time = time.time() - start_time
-            logger.info(f"  Professional back-translation: {professional_back_translation_time:.2f}s")
+            step_stats["prof_back"] = stats.to_dict()
+            professional_back_translation_time = stats.total_seconds
+            logger.info(f"  Professional back-translation: {format_step(stats)}")
 
         return ComparisonResult(
             doc_id=doc.doc_id,
@@ -282,11 +430,13 @@ def run_comparison_pipeline(
             back_translation_time=back_translation_time,
             professional_back_translation_time=professional_back_translation_time,
             timestamp=timestamp,
-            success=True
+            success=True,
+            step_stats=step_stats
         )
 
     except Exception as e:
-        logger.error(f"Pipeline failed: {doc.doc_id} | {model_name} | {language_name}: {e}")
+        failure_kind = classify_failure(e)
+        logger.error(f"Pipeline failed ({failure_kind}): {doc.doc_id} | {model_name} | {language_name}: {e}")
         return ComparisonResult(
             doc_id=doc.doc_id,
             model=model_name,
@@ -301,17 +451,39 @@ def run_comparison_pipeline(
             professional_back_translation_time=0,
             timestamp=timestamp,
             success=False,
-            error_message=str(e)
+            error_message=str(e),
+            failure_kind=failure_kind,
+            step_stats=step_stats
         )
 
 
-def save_results(results: list[ComparisonResult], filename: str):
-    """Save results to JSON."""
-    filepath = OUTPUT_DIR / filename
-    data = [r.to_dict() for r in results]
+def run_job(
+    doc: MedlinePlusDocument,
+    model_name: str,
+    lang_key: str,
+    stream: bool = False,
+    ledger: CostLedger = None
+) -> ComparisonResult:
+    """run_comparison_pipeline inside a pipeline.job span (calls recorded in ledger, if given)."""
+    with span("pipeline.job", doc_id=doc.doc_id, model=model_name, language=lang_key) as job_span:
+        result = run_comparison_pipeline(doc, model_name, lang_key, stream=stream, ledger=ledger)
+        if not result.success:
+            job_span.set_error(result.error_message)
+        return result
+
+
+def format_step(stats: StepStats) -> str:
+    """Log line for one step: total time, plus TTFT and tokens/sec when streamed."""
+    if not stats.streamed:
+        return f"{stats.total_seconds:.2f}s"
+    tps = f"{stats.tokens_per_sec:.0f} tok/s" if stats.tokens_per_sec else "n/a tok/s"
+    return (f"{stats.total_seconds:.2f}s (TTFT {stats.ttft_seconds:.2f}s, "
+            f"{stats.output_tokens} tok, {tps}, {stats.retries} retries)")
 
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+
+def save_results(results: list[ComparisonResult], filename: str):
+    """Save results to JSON (normalized: texts go to the content-addressed store in OUTPUT_DIR/texts)."""
+    filepath = save_results_file([r.to_dict() for r in results], OUTPUT_DIR / filename)
 
     logger.info(f"Saved {len(results)} results to {filepath}")
     return filepath
@@ -323,10 +495,7 @@ def load_results(filename: str) -> list[ComparisonResult]:
     if not filepath.exists():
         return []
 
-    with open(filepath, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    return [ComparisonResult(**d) for d in data]
+    return [ComparisonResult(**d) for d in load_results_file(filepath)]
 
 
 # =============================================================================
@@ -341,21 +510,40 @@ def get_checkpoint_key(doc_id: str, model: str, lang: str) -> str:
 def run_full_pipeline(
     models: list[str] = None,
     languages: list[str] = None,
-    resume: bool = True
+    resume: bool = True,
+    order: str = "scheduled",
+    stream: bool = False,
+    budget: float = None,
+    scale: int = 1,
+    score_socket: str = None,
+    retry_failed: bool = False
 ):
     """
     Run the full translation pipeline on all documents.
 
+    Only successful jobs are checkpointed. Failed jobs go to the retry queue
+    (retry_queue.py): retryable ones are run again with backoff after the
+    main pass, permanent ones (and jobs out of attempts) are dead-lettered
+    and reported instead of being written to all_results.json.
+
     Args:
         models: List of model names (defaults to ACTIVE_MODELS)
         languages: List of language keys (defaults to ACTIVE_LANGUAGES)
         resume: Whether to resume from checkpoint
+        order: "scheduled" (longest first, providers interleaved) or "document"
+        stream: Stream responses and record TTFT/tokens per second per step
+        budget: Stop scheduling new jobs once this run's spend (USD) would exceed it
+        scale: Replicate the corpus N times (load testing against the fake server)
+        score_socket: Score each result in the background through a running
+            scoring_server.py (rows appended to live_metrics.jsonl)
+        retry_failed: Clear the dead letters so those jobs are tried again
     """
     models = models or ACTIVE_MODELS
     languages = languages or ACTIVE_LANGUAGES
 
     # Load documents
-    documents = load_all_documents()
+    documents = scale_documents(load_all_documents(), scale)
+    docs_by_id = {doc.doc_id: doc for doc in documents}
 
     # Calculate total work
     total = len(documents) * len(models) * len(languages)
@@ -368,52 +556,271 @@ def run_full_pipeline(
     checkpoint_file = OUTPUT_DIR / "checkpoint.json"
     completed = set()
     results = []
+    retry_queue = RetryQueue(OUTPUT_DIR / FAILED_JOBS_FILE, backoff_scale=RETRY_BACKOFF_SCALE)
+    if not resume or retry_failed:
+        retry_queue.clear()
 
     if resume and checkpoint_file.exists():
         with open(checkpoint_file, 'r') as f:
             checkpoint = json.load(f)
         completed = set(checkpoint.get("completed", []))
         results = load_results("all_results.json")
-        logger.info(f"Resuming: {len(completed)} already completed")
+        # Failed rows checkpointed by earlier runs are run again
+        failed = {get_checkpoint_key(r.doc_id, r.model, r.language) for r in results if not r.success}
+        completed -= failed
+        results = [r for r in results if r.success]
+        logger.info(f"Resuming: {len(completed)} already completed"
+                    + (f", {len(failed)} earlier failures to redo" if failed else ""))
+
+    # Build the pending job list, then order it (longest first, providers interleaved)
+    job_keys = {get_checkpoint_key(doc.doc_id, model, lang)
+                for doc in documents for model in models for lang in languages}
+    dead = {key for key in job_keys if retry_queue.is_dead(key)}
+    if dead:
+        logger.warning(f"Skipping {len(dead)} dead-lettered jobs (--retry-failed to run them again)")
+    pending = [
+        (doc, model, lang)
+        for doc in documents
+        for model in models
+        for lang in languages
+        if get_checkpoint_key(doc.doc_id, model, lang) not in completed | dead
+    ]
+    plan = [estimate_job(doc, model, lang) for doc, model, lang in pending]
+    if order == "scheduled":
+        plan = schedule_jobs(plan)
+        pending = [(docs_by_id[e.doc_id], e.model, e.language) for e in plan]
+    print_plan(plan)
 
     # Process each combination
     completed_count = len(completed)
+    ledger = CostLedger(OUTPUT_DIR / "cost_ledger.db")
+    results_db = ResultsDB(OUTPUT_DIR / "results.db")
+    run_started = time.time()
+    spent = 0.0
+    live_scorer = None
+    if score_socket:
+        from scoring_server import LiveScorer
+        live_scorer = LiveScorer(score_socket, OUTPUT_DIR / "live_metrics.jsonl")
+
+    def save_checkpoint():
+        save_results(results, "all_results.json")
+        with open(checkpoint_file, 'w') as f:
+            json.dump({"completed": list(completed)}, f)
+
+    def record(result: ComparisonResult) -> bool:
+        """Checkpoint a successful job or queue a failed one; True on success."""
+        nonlocal completed_count, spent
+        key = get_checkpoint_key(result.doc_id, result.model, result.language)
+        spent = ledger.total_cost(since=run_started)  # Failed calls are paid for too
+        results_db.insert_results([result.to_dict()])
+
+        if not result.success:
+            failure = retry_queue.record(key, result.doc_id, result.model, result.language,
+                                         result.failure_kind, result.error_message)
+            if failure.permanent:
+                logger.error(f"Dead letter: {key} ({failure.kind}, {failure.attempts} attempts)")
+            else:
+                logger.warning(f"Queued for retry: {key} ({failure.kind}, attempt {failure.attempts})")
+            return False
+
+        results.append(result)
+        completed.add(key)
+        completed_count += 1
+        retry_queue.resolve(key)
+        if live_scorer:
+            live_scorer.submit(result.to_dict())
+
+        # Progress update
+        progress = (completed_count / total) * 100
+        logger.info(f"Progress: {completed_count}/{total} ({progress:.1f}%)")
+
+        # Save checkpoint periodically
+        if completed_count % 5 == 0:
+            save_checkpoint()
+        return True
+
+    def over_budget(doc, model, lang) -> bool:
+        if budget is not None and spent + estimate_job(doc, model, lang).est_cost > budget:
+            logger.warning(f"Budget reached: ${spent:.2f} spent of ${budget:.2f}; "
+                           f"pausing with {total - completed_count} jobs left (resume to continue)")
+            return True
+        return False
+
+    # Only the streamed path uses the pooled transport (translate_with_retry builds its own
+    # clients); open its connections up front so TLS setup is not in the first call's timing
+    if stream:
+        warm_up(MODEL_PROVIDERS[m] for m in models if m in MODEL_PROVIDERS)
+    try:
+        paused = False
+        for doc, model, lang in pending:
+            if over_budget(doc, model, lang):
+                paused = True
+                break
+
+            # Run pipeline
+            record(run_job(doc, model, lang, stream=stream, ledger=ledger))
+
+            # Rate limiting between calls
+            rate_limit()
+
+        # Retry pass: each retryable failure waits out its backoff, then runs again
+        # until it succeeds or is dead-lettered
+        while not paused:
+            failure = retry_queue.next_due(job_keys)
+            if failure is None:
+                break
+            doc = docs_by_id[failure.doc_id]
+            if over_budget(doc, failure.model, failure.language):
+                break
+            wait = failure.retry_at - time.time()
+            if wait > 0:
+                logger.info(f"Retrying {failure.key} ({failure.kind}) in {wait:.0f}s")
+                with span("retry.backoff", key=failure.key, kind=failure.kind, seconds=wait):
+                    time.sleep(wait)
+            record(run_job(doc, failure.model, failure.language, stream=stream, ledger=ledger))
+            rate_limit()
+
+        # Final save
+        save_checkpoint()
+    finally:
+        close_all()
+        if live_scorer:
+            live_scorer.close()
+    print_failure_report(list(retry_queue.jobs.values()), retry_queue.path)
+    logger.info(f"Pipeline complete! {len(results)} total results")
+    return results
 
-    for doc in documents:
-        for model in models:
-            for lang in languages:
-                key = get_checkpoint_key(doc.doc_id, model, lang)
 
-                # Skip if already done
-                if key in completed:
-                    continue
+# =============================================================================
+# SHARED JOB QUEUE (multiple workers / machines)
+# =============================================================================
 
-                # Run pipeline
-                result = run_comparison_pipeline(doc, model, lang)
-                results.append(result)
-                completed.add(key)
-                completed_count += 1
+def enqueue_jobs(
+    queue_url: str,
+    models: list[str] = None,
+    languages: list[str] = None,
+    scale: int = 1
+) -> int:
+    """
+    Add every (doc, model, language) job to the shared queue (existing jobs are kept).
+
+    scale > 1 enqueues the ~N corpus copies too (load tests); workers resolve them.
+    """
+    models = models or ACTIVE_MODELS
+    languages = languages or ACTIVE_LANGUAGES
+    queue = open_queue(queue_url)
+
+    # Priority = estimated job duration, so workers take the longest jobs first
+    jobs = [
+        Job(key=get_checkpoint_key(doc.doc_id, model, lang),
+            doc_id=doc.doc_id, model=model, language=lang,
+            priority=estimate_job(doc, model, lang).est_seconds)
+        for doc in scale_documents(load_all_documents(), scale)
+        for model in models
+        for lang in languages
+    ]
+    added = queue.enqueue(jobs)
+    logger.info(f"Enqueued {added} new jobs ({len(jobs) - added} already in queue)")
+    return added
+
+
+def run_queue_worker(
+    queue_url: str,
+    worker_id: str = None,
+    max_jobs: int = None,
+    stream: bool = False
+) -> int:
+    """
+    Claim jobs from the shared queue until it is empty.
 
-                # Progress update
-                progress = (completed_count / total) * 100
-                logger.info(f"Progress: {completed_count}/{total} ({progress:.1f}%)")
+    Each job's lease is heartbeated while it runs. If this worker crashes, the
+    lease expires and another worker picks the job up; a result from a worker
+    that lost its lease is discarded, so no job is recorded twice.
 
-                # Save checkpoint periodically
-                if completed_count % 5 == 0:
-                    save_results(results, "all_results.json")
-                    with open(checkpoint_file, 'w') as f:
-                        json.dump({"completed": list(completed)}, f)
+    Failed jobs are classified as in run_full_pipeline: retryable kinds go
+    back to the queue with a backoff (the worker waits for them before
+    exiting), permanent ones and jobs out of attempts are dead-lettered.
+    """
+    queue = open_queue(queue_url)
+    worker_id = worker_id or default_worker_id()
+    documents = {doc.doc_id: doc for doc in load_all_documents()}
+    ledger = CostLedger(OUTPUT_DIR / "cost_ledger.db")
+    processed = 0
 
-                # Rate limiting between calls
-                time.sleep(1)
+    logger.info(f"Worker {worker_id} started on {queue_url}")
+    if stream:
+        warm_up(MODEL_PROVIDERS[m] for m in ACTIVE_MODELS if m in MODEL_PROVIDERS)
 
-    # Final save
-    save_results(results, "all_results.json")
-    with open(checkpoint_file, 'w') as f:
-        json.dump({"completed": list(completed)}, f)
+    try:
+        while max_jobs is None or processed < max_jobs:
+            job = queue.claim(worker_id)
+            if job is None:
+                retry_at = queue.next_retry_at()
+                if retry_at is None:
+                    break
+                wait = max(retry_at - time.time(), 0)
+                logger.info(f"Worker {worker_id}: waiting {wait:.0f}s for the next retry")
+                with span("retry.backoff", worker=worker_id, seconds=wait):
+                    time.sleep(wait)
+                continue
+
+            doc = find_document(documents, job.doc_id)
+            if doc is None:
+                queue.fail(job, worker_id, None, f"Unknown document: {job.doc_id}", kind="unknown_document")
+                continue
+
+            with keep_alive(queue, job, worker_id):
+                result = run_job(doc, job.model, job.language, stream=stream, ledger=ledger)
+
+            if result.success:
+                stored = queue.complete(job, worker_id, result.to_dict())
+            else:
+                kind = result.failure_kind or classify_failure(result.error_message)
+                if is_retryable(kind) and job.attempts < MAX_ATTEMPTS:
+                    retry_at = time.time() + backoff_seconds(kind, job.attempts, RETRY_BACKOFF_SCALE)
+                    stored = queue.retry(job, worker_id, result.error_message, kind, retry_at)
+                    logger.warning(f"Queued for retry: {job.key} ({kind}, attempt {job.attempts})")
+                else:
+                    stored = queue.fail(job, worker_id, result.to_dict(), result.error_message, kind)
+                    logger.error(f"Dead letter: {job.key} ({kind}, {job.attempts} attempts)")
+            if not stored:
+                # Its calls are in the ledger regardless: they were paid for
+                logger.warning(f"Lease lost for {job.key}; result discarded")
+
+            processed += 1
+            stats = queue.stats()
+            logger.info(f"Worker {worker_id}: {processed} jobs done | queue: "
+                        f"{stats['pending']} pending, {stats['leased']} leased, {stats['done']} done")
+
+            # Rate limiting between calls
+            rate_limit()
+    finally:
+        close_all()
+    print_failure_report([FailedJob(**f) for f in queue.failures()], queue_url)
+    logger.info(f"Worker {worker_id} finished: {processed} jobs")
+    return processed
+
+
+def export_queue_results(queue_url: str, filename: str = "all_results.json"):
+    """
+    Write the successful jobs from the shared queue to the usual results file.
 
-    logger.info(f"Pipeline complete! {len(results)} total results")
-    return results
+    Failed jobs are left out (as run_full_pipeline leaves them out of
+    all_results.json) and reported instead.
+    """
+    queue = open_queue(queue_url)
+    required = {f.name for f in fields(ComparisonResult) if f.default is MISSING}
+    results = []
+    for row in queue.results(include_failed=False):
+        missing = required - set(row)
+        if missing:
+            logger.warning(f"Skipping queue result {row.get('doc_id')}|{row.get('model')}|{row.get('language')}: "
+                           f"missing {', '.join(sorted(missing))}")
+            continue
+        results.append(ComparisonResult(**row))
+    ResultsDB(OUTPUT_DIR / "results.db").insert_results([r.to_dict() for r in results])
+    print_failure_report([FailedJob(**f) for f in queue.failures()], queue_url)
+    return save_results(results, filename)
 
 
 # =============================================================================
@@ -423,7 +830,8 @@ def run_full_pipeline(
 def test_single(
     model: str = "gpt-5.1",
     language: str = "spanish",
-    doc_index: int = 0
+    doc_index: int = 0,
+    stream: bool = False
 ):
     """Test a single document/model/language combination."""
     documents = load_all_documents()
@@ -437,7 +845,7 @@ def test_single(
     logger.info(f"TEST: {doc.doc_id} | {model} | {language}")
     logger.info(f"{'='*60}")
 
-    result = run_comparison_pipeline(doc, model, language)
+    result = run_job(doc, model, language, stream=stream)
 
     if result.success:
         logger.info(f"\n--- ORIGINAL (English) ---")
@@ -449,7 +857,7 @@ def test_single(
         logger.info(f"\n--- BACK TRANSLATION (English) ---")
         logger.info(result.llm_back_translation[:500] + "...")
     else:
-        logger.error(f"Test failed: {result.error_message}")
+        logger.error(f"Test failed ({result.failure_kind}): {result.error_message}")
 
     return result
 
@@ -468,24 +876,74 @@ if __name__ == "__main__":
     parser.add_argument("--doc", type=int, default=0, help="Document index for test")
     parser.add_argument("--run", action="store_true", help="Run full pipeline")
     parser.add_argument("--no-resume", action="store_true", help="Start fresh (don't resume)")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Run dead-lettered jobs (content filter, auth, out of attempts) again")
+    parser.add_argument("--order", choices=["scheduled", "document"], default="scheduled",
+                        help="Job order: longest first with providers interleaved, or document order")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream responses and record TTFT, tokens/sec and retries per step")
+    parser.add_argument("--budget", type=float, help="Max USD to spend in this --run (pauses when reached)")
+    parser.add_argument("--fake-llm", metavar="URL",
+                        help="Route all models to a local fake server (implies --stream)")
+    parser.add_argument("--scale", type=int, default=1,
+                        help="Replicate the corpus N times (load testing, requires --fake-llm)")
     parser.add_argument("--models", nargs="+", help="Specific models to run")
     parser.add_argument("--languages", nargs="+", help="Specific languages to run")
     parser.add_argument("--list-docs", action="store_true", help="List all documents")
+    parser.add_argument("--queue", help="Shared job queue (sqlite path or redis:// URL)")
+    parser.add_argument("--enqueue", action="store_true", help="Add all jobs to --queue")
+    parser.add_argument("--worker", action="store_true", help="Process jobs from --queue")
+    parser.add_argument("--export", action="store_true", help="Write --queue results to all_results.json")
+    parser.add_argument("--score-socket", metavar="SOCKET",
+                        help="Score results as they land via a running scoring_server.py")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="Write tracing spans (.json = Chrome/Perfetto, .jsonl = OTLP/JSON)")
 
     args = parser.parse_args()
 
+    if (args.enqueue or args.worker or args.export) and not args.queue:
+        parser.error("--enqueue/--worker/--export require --queue")
+    if args.scale > 1 and not args.fake_llm:
+        parser.error("--scale is only for load tests against --fake-llm")
+
+    if args.trace:
+        configure_tracing(args.trace)
+
+    if args.fake_llm:
+        use_fake_llm(args.fake_llm)
+        args.stream = True  # translate_with_retry does not use the shared transport
+    elif args.stream:
+        # Refuse up front rather than stream with prompts that differ from the non-streamed path
+        try:
+            prompt_source()
+        except RuntimeError as e:
+            parser.error(str(e))
+
     if args.list_docs:
         docs = load_all_documents()
         for i, doc in enumerate(docs):
             langs = list(doc.professional_translations.keys())
             print(f"{i}: {doc.doc_id} ({len(langs)} translations)")
+    elif args.queue and (args.enqueue or args.worker or args.export):
+        if args.enqueue:
+            enqueue_jobs(args.queue, models=args.models, languages=args.languages, scale=args.scale)
+        if args.worker:
+            run_queue_worker(args.queue, stream=args.stream)
+        if args.export:
+            export_queue_results(args.queue)
     elif args.test:
-        test_single(args.model, args.language, args.doc)
+        test_single(args.model, args.language, args.doc, stream=args.stream)
     elif args.run:
         run_full_pipeline(
             models=args.models,
             languages=args.languages,
-            resume=not args.no_resume
+            resume=not args.no_resume,
+            order=args.order,
+            stream=args.stream,
+            budget=args.budget,
+            scale=args.scale,
+            score_socket=args.score_socket,
+            retry_failed=args.retry_failed
         )
     else:
         print("""
@@ -498,6 +956,20 @@ Usage:
   python run_medlineplus_pipeline.py --run                # Run full pipeline
   python run_medlineplus_pipeline.py --run --models gpt-5.1 claude-opus-4.5
   python run_medlineplus_pipeline.py --run --no-resume    # Start fresh
+  python run_medlineplus_pipeline.py --run --retry-failed # Also retry dead-lettered jobs (see failed_jobs.json)
+  python run_medlineplus_pipeline.py --run --order document  # Old document-by-document order
+  python run_medlineplus_pipeline.py --run --stream       # Record TTFT / tokens/sec per step
+  python run_medlineplus_pipeline.py --run --budget 50    # Pause once $50 has been spent
+  python run_medlineplus_pipeline.py --run --trace output/traces/run.json  # Open in ui.perfetto.dev
+  python run_medlineplus_pipeline.py --run --score-socket /tmp/medlineplus_scoring.sock  # Live metrics
+
+Offline load test (start fake_llm_server.py first):
+  python run_medlineplus_pipeline.py --run --no-resume --fake-llm http://127.0.0.1:8765 --scale 10
+
+Shared queue (several workers / machines):
+  python run_medlineplus_pipeline.py --queue redis://host:6379/0 --enqueue   # Once
+  python run_medlineplus_pipeline.py --queue redis://host:6379/0 --worker    # On each machine
+  python run_medlineplus_pipeline.py --queue redis://host:6379/0 --export    # Collect results
 
 Models: gpt-5.1, claude-opus-4.5, gemini-3-pro, kimi-k2
 Languages: spanish, chinese_simplified, vietnamese, russian, arabic, korean, tagalog, haitian_creole
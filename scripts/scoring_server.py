@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Scoring Daemon for MedlinePlus Metrics
+
+Loads the scorers (COMET, COMET-QE, BERTScore, LaBSE, XLM-R, mBERT, BLEU,
+chrF) once and serves them over a Unix socket, so each CLI run or pipeline
+job no longer pays the multi-second model loads.
+
+Requests from all connected clients are queued per metric and coalesced:
+a batcher thread takes everything waiting (up to --batch-size, or whatever
+arrives within --window ms) and runs it through the batch scorers in
+calculate_medlineplus_metrics as one model call. If the batch call fails,
+its items are scored one at a time, so one bad item only fails its own
+request.
+
+Protocol: one JSON object per line, one JSON reply per line.
+  {"op": "ping"}
+  {"op": "score", "metric": "labse", "items": [[text1, text2], ...]}
+  {"op": "evaluate", "results": [<ComparisonResult dict>, ...]}
+  {"op": "stats"}
+
+Usage:
+  python scoring_server.py --serve                       # Load all scorers and serve
+  python scoring_server.py --serve --metrics labse comet
+  python scoring_server.py --ping
+  python scoring_server.py --stats
+"""
+
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import logger
+
+DEFAULT_SOCKET = "/tmp/medlineplus_scoring.sock"
+MAX_BATCH_SIZE = 64
+BATCH_WINDOW_SECONDS = 0.02
+
+
+# =============================================================================
+# REQUEST COALESCING
+# =============================================================================
+
+class MetricBatcher:
+    """Queue of pending calls for one metric, drained in batches by a worker thread."""
+
+    def __init__(self, metric: str, batch_fn, max_batch_size: int, window_seconds: float):
+        self.metric = metric
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.window_seconds = window_seconds
+        self.pending = queue.Queue()
+        self.calls = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+        self.fallbacks = 0      # Failed batches re-run item by item
+        self.thread = threading.Thread(target=self._run, name=f"batcher-{metric}", daemon=True)
+        self.thread.start()
+
+    def submit(self, args) -> Future:
+        future = Future()
+        self.pending.put((tuple(args), future))
+        return future
+
+    def _collect(self) -> list:
+        batch = [self.pending.get()]
+        deadline = time.monotonic() + self.window_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.pending.get(timeout=max(remaining, 0)) if remaining > 0
+                             else self.pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            start_time = time.perf_counter()
+            try:
+                scores = self.batch_fn([args for args, _ in batch])
+                if len(scores) != len(batch):
+                    raise ValueError(f"{len(scores)} scores for {len(batch)} items")
+                for (_, future), score in zip(batch, scores):
+                    future.set_result(score)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                else:
+                    logger.warning(f"{self.metric} batch of {len(batch)} failed ({e}); scoring items one by one")
+                    self.fallbacks += 1
+                    self._run_singly(batch)
+            self.busy_seconds += time.perf_counter() - start_time
+            self.calls += len(batch)
+            self.batches += 1
+
+    def _run_singly(self, batch: list):
+        for args, future in batch:
+            try:
+                scores = self.batch_fn([args])
+                if len(scores) != 1:
+                    raise ValueError(f"{len(scores)} scores for 1 item")
+                future.set_result(scores[0])
+            except Exception as e:
+                future.set_exception(e)
+
+    def stats(self) -> dict:
+        return {
+            'calls': self.calls,
+            'batches': self.batches,
+            'fallbacks': self.fallbacks,
+            'mean_batch_size': self.calls / self.batches if self.batches else None,
+            'busy_seconds': self.busy_seconds,
+            'queued': self.pending.qsize(),
+        }
+
+
+class ScoringService:
+    """The warm scorers plus one batcher per metric."""
+
+    def __init__(self, metrics: list = None, max_batch_size: int = MAX_BATCH_SIZE,
+                 window_seconds: float = BATCH_WINDOW_SECONDS):
+        import calculate_medlineplus_metrics as scorers
+        self.scorers = scorers
+        self.metrics = metrics or list(scorers.BATCH_METRIC_FUNCTIONS)
+
+        for metric in self.metrics:
+            start_time = time.perf_counter()
+            scorers.MODEL_LOADERS[metric]()
+            logger.info(f"Loaded {metric} in {time.perf_counter() - start_time:.1f}s")
+
+        self.batchers = {
+            metric: MetricBatcher(metric, scorers.BATCH_METRIC_FUNCTIONS[metric],
+                                  max_batch_size, window_seconds)
+            for metric in self.metrics
+        }
+        self.started = time.time()
+
+    def score(self, metric: str, items: list) -> list:
+        if metric not in self.batchers:
+            raise ValueError(f"Metric not served: {metric}. Serving {self.metrics}")
+        futures = [self.batchers[metric].submit(args) for args in items]
+        return [future.result() for future in futures]
+
+    def evaluate(self, results: list) -> list[dict]:
+        """Same output as evaluate_single for each row; all rows' calls are batched together."""
+        rows = []
+        for result in results:
+            metrics = self.scorers.TranslationMetrics(
+                doc_id=result['doc_id'], model=result['model'], language=result['language']
+            )
+            calls = []
+            for field_name, metric, args in self.scorers.metric_plan(result):
+                if metric not in self.batchers:
+                    continue
+                if metric in self.scorers.LEXICAL_SCORERS:
+                    # Cheap with the reference cache; scored here to keep the statistics
+                    future = Future()
+                    try:
+                        future.set_result(self.scorers.score_lexical(metrics, field_name, metric, *args))
+                    except Exception as e:
+                        future.set_exception(e)
+                    calls.append((field_name, future))
+                else:
+                    calls.append((field_name, self.batchers[metric].submit(args)))
+            rows.append((metrics, calls))
+
+        for (metrics, calls), result in zip(rows, results):
+            for field_name, future in calls:
+                try:
+                    setattr(metrics, field_name, future.result())
+                except Exception as e:
+                    logger.warning(f"{field_name} failed: {e}")
+            if self.scorers.has_translations(result):  # As evaluate_single
+                self.scorers.score_terminology(metrics, result)
+        return [metrics.to_dict() for metrics, _ in rows]
+
+    def stats(self) -> dict:
+        return {
+            'uptime_seconds': time.time() - self.started,
+            'metrics': {metric: b.stats() for metric, b in self.batchers.items()},
+        }
+
+
+# =============================================================================
+# SERVER
+# =============================================================================
+
+class ScoringHandler(socketserver.StreamRequestHandler):
+    """Reads JSON lines from one client until it disconnects."""
+
+    def handle(self):
+        service = self.server.service
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                op = request.get('op')
+                if op == 'ping':
+                    reply = {'ok': True, 'metrics': service.metrics}
+                elif op == 'score':
+                    reply = {'ok': True, 'scores': service.score(request['metric'], request['items'])}
+                elif op == 'evaluate':
+                    reply = {'ok': True, 'metrics': service.evaluate(request['results'])}
+                elif op == 'stats':
+                    reply = {'ok': True, 'stats': service.stats()}
+                else:
+                    reply = {'ok': False, 'error': f"Unknown op: {op}"}
+            except Exception as e:
+                reply = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+            self.wfile.write((json.dumps(reply) + "\n").encode('utf-8'))
+            self.wfile.flush()
+
+
+def remove_stale_socket(socket_path: str):
+    """
+    Remove a socket file left by a server that is gone. If a server still
+    accepts connections on it, raise instead of stealing its path.
+    """
+    if not os.path.exists(socket_path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.unlink(socket_path)  # Stale socket from a previous run
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f"A scoring server is already running on {socket_path}")
+
+
+class ScoringServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, service: ScoringService):
+        remove_stale_socket(socket_path)
+        self.service = service
+        super().__init__(socket_path, ScoringHandler)
+
+
+def serve(socket_path: str = DEFAULT_SOCKET, metrics: list = None,
+          max_batch_size: int = MAX_BATCH_SIZE, window_seconds: float = BATCH_WINDOW_SECONDS):
+    remove_stale_socket(socket_path)  # Fail before the model loads, not after
+    service = ScoringService(metrics, max_batch_size, window_seconds)
+    server = ScoringServer(socket_path, service)
+    logger.info(f"Scoring server ready on {socket_path} ({', '.join(service.metrics)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+
+
+# =============================================================================
+# CLIENT
+# =============================================================================
+
+class ScoringClient:
+    """Persistent connection to the scoring server. Not thread-safe; use one per thread."""
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET, timeout: float = None):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(socket_path)
+        self.file = self.sock.makefile('rwb')
+
+    def _call(self, request: dict):
+        self.file.write((json.dumps(request, ensure_ascii=False) + "\n").encode('utf-8'))
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("Scoring server closed the connection")
+        reply = json.loads(line)
+        if not reply.get('ok'):
+            raise RuntimeError(reply.get('error'))
+        return reply
+
+    def ping(self) -> list:
+        return self._call({'op': 'ping'})['metrics']
+
+    def score(self, metric: str, items: list) -> list:
+        return self._call({'op': 'score', 'metric': metric, 'items': items})['scores']
+
+    def evaluate(self, results: list) -> list[dict]:
+        return self._call({'op': 'evaluate', 'results': results})['metrics']
+
+    def stats(self) -> dict:
+        return self._call({'op': 'stats'})['stats']
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+class LiveScorer:
+    """
+    Scores pipeline results in the background as they land, appending one
+    metrics row per line to `output_file`. The pipeline never waits on it.
+    """
+
+    def __init__(self, socket_path: str, output_file):
+        self.client = ScoringClient(socket_path)
+        self.output_file = Path(output_file)
+        self.pending = queue.Queue()
+        self.scored = 0
+        self.thread = threading.Thread(target=self._run, name="live-scorer", daemon=True)
+        self.thread.start()
+
+    def submit(self, result: dict):
+        self.pending.put(result)
+
+    def _run(self):
+        while True:
+            result = self.pending.get()
+            if result is None:
+                break
+            try:
+                rows = self.client.evaluate([result])
+                with open(self.output_file, 'a', encoding='utf-8') as f:
+                    for row in rows:
+                        f.write(json.dumps(row) + "\n")
+                self.scored += 1
+            except Exception as e:
+                logger.warning(f"Live scoring failed for {result.get('doc_id')}: {e}")
+
+    def close(self):
+        """Wait for queued results to be scored."""
+        self.pending.put(None)
+        self.thread.join()
+        self.client.close()
+        logger.info(f"Live scoring: {self.scored} results scored into {self.output_file}")
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Long-lived batch scoring server")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket path")
+    parser.add_argument("--serve", action="store_true", help="Load scorers and serve")
+    parser.add_argument("--metrics", nargs="+", help="Metrics to load (default: all)")
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH_SIZE, help="Max calls per model batch")
+    parser.add_argument("--window", type=float, default=BATCH_WINDOW_SECONDS * 1000,
+                        help="Milliseconds to wait for more requests before running a batch")
+    parser.add_argument("--backend", choices=["torch", "onnx"], default="torch",
+                        help="Embedding encoder backend")
+    parser.add_argument("--threads", type=int, help="CPU threads for the embedding encoders")
+    parser.add_argument("--long-docs", choices=["truncate", "chunk"], default="truncate",
+                        help="Texts over the model window (recorded on every row scored)")
+    parser.add_argument("--ping", action="store_true", help="Check the server is up")
+    parser.add_argument("--stats", action="store_true", help="Show per-metric batching stats")
+
+    args = parser.parse_args()
+
+    if args.serve:
+        from calculate_medlineplus_metrics import set_encoder_backend, set_long_text_policy
+        set_encoder_backend(args.backend, args.threads)
+        set_long_text_policy(args.long_docs)
+        serve(args.socket, args.metrics, args.batch_size, args.window / 1000)
+    elif args.ping:
+        start_time = time.perf_counter()
+        metrics = ScoringClient(args.socket).ping()
+        print(f"Up ({(time.perf_counter() - start_time) * 1000:.1f} ms): {', '.join(metrics)}")
+    elif args.stats:
+        stats = ScoringClient(args.socket).stats()
+        print(f"\nUptime: {stats['uptime_seconds']:.0f}s")
+        print(f"{'Metric':<14} {'Calls':>8} {'Batches':>8} {'Mean size':>10} {'Fallback':>9} {'Busy (s)':>9} {'Queued':>7}")
+        print("-" * 70)
+        for metric, st in stats['metrics'].items():
+            mean = f"{st['mean_batch_size']:.1f}" if st['mean_batch_size'] else "-"
+            print(f"{metric:<14} {st['calls']:>8} {st['batches']:>8} {mean:>10} {st['fallbacks']:>9} "
+                  f"{st['busy_seconds']:>9.1f} {st['queued']:>7}")
+    else:
+        parser.print_help()
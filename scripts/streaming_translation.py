@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Streaming Translation Calls with Latency Breakdown
+
+Streams each translation response from the provider and records, per step:
+- queue_seconds:      client-side wait before the successful attempt was sent
+                      (retry backoff included: the server's Retry-After when it
+                      sends one, else exponential)
+- ttft_seconds:       request sent -> first output token
+- generation_seconds: first token -> last token
+- output_tokens / input_tokens (provider usage when reported, else estimated)
+- tokens_per_sec:     output_tokens / generation_seconds
+- retries:            failed attempts before the successful one (None for
+                      translate_with_retry calls, whose retries are internal)
+
+Chunks are collected as they arrive and joined once at the end, so a long
+document is never held as both a raw response body and a parsed copy.
+
+Calls go through the pooled clients in provider_transport. The system prompt,
+user prompt and API model ids come from translation_pipeline, the module the
+non-streamed path calls, so --stream sends exactly the same requests; if
+they cannot be imported from there, streaming is refused. Only the fake-LLM
+load test uses the local LOAD_TEST_* prompts (its results are kept apart).
+"""
+
+import sys
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Optional
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import logger
+from provider_transport import get_provider, get_sdk_client
+from job_scheduler import estimate_tokens
+from retry_queue import RATE_LIMIT, TIMEOUT, SERVER_ERROR, CONNECTION, classify_failure
+from tracing import span
+
+# =============================================================================
+# MODEL / PROMPT CONFIGURATION
+# =============================================================================
+
+MAX_OUTPUT_TOKENS = 16000
+MAX_RETRIES = 3
+BACKOFF_BASE_SECONDS = 2.0
+MAX_RETRY_AFTER_SECONDS = 120.0  # Cap on a server-requested wait
+# Failure kinds worth retrying within the call; anything else (auth, bad
+# request, content filter, unrecognised) is raised at once to the job level
+TRANSIENT_KINDS = (RATE_LIMIT, TIMEOUT, SERVER_ERROR, CONNECTION)
+
+# Names the streamed path needs from translation_pipeline
+STUDY_PROMPT_NAMES = ("SYSTEM_PROMPT", "build_prompt", "MODEL_API_IDS")
+
+# Fake-LLM load tests only (fake_llm_server.parse_prompt reads this format)
+LOAD_TEST_SYSTEM_PROMPT = "You are a professional medical translator. Output only the translation."
+
+
+def load_test_prompt(text: str, target_language: str, source_language: str = "English") -> str:
+    return f"Translate the following {source_language} medical document into {target_language}.\n\n{text}"
+
+
+_prompt_source = None  # (system_prompt, build_prompt, model_api_ids)
+
+
+def use_load_test_prompts():
+    """Stream with the local load-test prompts (fake-LLM mode only)."""
+    global _prompt_source
+    _prompt_source = (LOAD_TEST_SYSTEM_PROMPT, load_test_prompt, {})
+
+
+def prompt_source() -> tuple:
+    """
+    (system prompt, prompt builder, model id map) shared with translate_with_retry.
+
+    Raises RuntimeError when translation_pipeline does not expose them: a
+    streamed run must not send different prompts or model ids than the
+    non-streamed one.
+    """
+    global _prompt_source
+    if _prompt_source is None:
+        try:
+            import translation_pipeline
+            _prompt_source = tuple(getattr(translation_pipeline, name) for name in STUDY_PROMPT_NAMES)
+        except (ImportError, AttributeError) as e:
+            raise RuntimeError(
+                f"--stream needs {', '.join(STUDY_PROMPT_NAMES)} from translation_pipeline "
+                f"(the non-streamed path's prompt and model ids): {e}"
+            ) from e
+    return _prompt_source
+
+
+# =============================================================================
+# DATA STRUCTURES
+# =============================================================================
+
+@dataclass
+class StepStats:
+    """Latency and token breakdown for one translation step."""
+    total_seconds: float = 0.0
+    queue_seconds: Optional[float] = None
+    ttft_seconds: Optional[float] = None
+    generation_seconds: Optional[float] = None
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    tokens_per_sec: Optional[float] = None
+    retries: Optional[int] = None   # Only counted for streamed calls
+    streamed: bool = False
+
+    def to_dict(self):
+        return asdict(self)
+
+
+# =============================================================================
+# PROVIDER STREAMS
+# =============================================================================
+# Each generator yields text chunks as they arrive and finally returns
+# (input_tokens, output_tokens) from the provider's usage report (or None).
+
+def _stream_openai(client, model_id: str, system_prompt: str, prompt: str, usage: dict):
+    stream = client.chat.completions.create(
+        model=model_id,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt},
+        ],
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    for chunk in stream:
+        if chunk.usage:
+            usage['input'] = chunk.usage.prompt_tokens
+            usage['output'] = chunk.usage.completion_tokens
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def _stream_anthropic(client, model_id: str, system_prompt: str, prompt: str, usage: dict):
+    with client.messages.stream(
+        model=model_id,
+        max_tokens=MAX_OUTPUT_TOKENS,
+        system=system_prompt,
+        messages=[{"role": "user", "content": prompt}],
+    ) as stream:
+        for text in stream.text_stream:
+            yield text
+        final = stream.get_final_message()
+        usage['input'] = final.usage.input_tokens
+        usage['output'] = final.usage.output_tokens
+
+
+def _stream_google(client, model_id: str, system_prompt: str, prompt: str, usage: dict):
+    from google.genai import types
+    stream = client.models.generate_content_stream(
+        model=model_id,
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            system_instruction=system_prompt,
+            max_output_tokens=MAX_OUTPUT_TOKENS,
+        ),
+    )
+    for chunk in stream:
+        if chunk.usage_metadata:
+            usage['input'] = chunk.usage_metadata.prompt_token_count
+            usage['output'] = chunk.usage_metadata.candidates_token_count
+        if chunk.text:
+            yield chunk.text
+
+
+PROVIDER_STREAMS = {
+    "openai": _stream_openai,
+    "moonshot": _stream_openai,
+    "anthropic": _stream_anthropic,
+    "google": _stream_google,
+}
+
+
+# =============================================================================
+# STREAMING TRANSLATION
+# =============================================================================
+
+def retry_after_seconds(error) -> Optional[float]:
+    """Wait requested by the server (Retry-After / retry-after-ms on a 429 or 503), if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return min(float(headers["retry-after-ms"]) / 1000, MAX_RETRY_AFTER_SECONDS)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:  # HTTP date
+            from email.utils import parsedate_to_datetime
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER_SECONDS)
+
+
+def translate_streaming(
+    text: str,
+    target_language: str,
+    model_name: str,
+    is_back_translation: bool = False,
+    source_language: str = "English",
+    max_retries: int = MAX_RETRIES,
+    on_attempt=None
+) -> tuple[str, StepStats]:
+    """
+    Translate with a streamed response. Same arguments as translate_with_retry,
+    but also returns the StepStats for the call.
+
+    on_attempt(input_tokens, output_tokens, estimated, failed) is called after
+    every attempt, failed ones included (the cost ledger records each). Only
+    TRANSIENT_KINDS failures are retried here.
+    """
+    system_prompt, build_prompt, model_api_ids = prompt_source()
+    provider = get_provider(model_name)
+    stream_fn = PROVIDER_STREAMS[provider]
+    client = get_sdk_client(model_name)
+    model_id = model_api_ids.get(model_name, model_name)
+    if not is_back_translation:
+        source_language = "English"
+    prompt = build_prompt(text, target_language, source_language)
+
+    step_start = time.perf_counter()
+    stats = StepStats(streamed=True, retries=0)
+
+    for attempt in range(max_retries + 1):
+        chunks = []
+        usage = {}
+        sent_at = time.perf_counter()
+        first_token_at = None
+        try:
+            with span("translate.attempt", model=model_name, target_language=target_language,
+                      attempt=attempt + 1, streamed=True) as attempt_span:
+                for chunk in stream_fn(client, model_id, system_prompt, prompt, usage):
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        attempt_span.set_attribute("ttft_seconds", first_token_at - sent_at)
+                    chunks.append(chunk)
+            finished_at = time.perf_counter()
+        except Exception as e:
+            if on_attempt:
+                # Billed for the prompt and whatever streamed before the failure
+                on_attempt(estimate_tokens(prompt), estimate_tokens("".join(chunks)), True, True)
+            if attempt == max_retries or classify_failure(e) not in TRANSIENT_KINDS:
+                raise
+            stats.retries += 1
+            wait = retry_after_seconds(e)
+            if wait is None:
+                wait = BACKOFF_BASE_SECONDS * (2 ** attempt)
+            logger.warning(f"  Stream attempt {attempt + 1} failed ({e}); retrying in {wait:.0f}s")
+            with span("translate.backoff", model=model_name, seconds=wait):
+                time.sleep(wait)
+            continue
+
+        translation = "".join(chunks)
+        if on_attempt:
+            on_attempt(usage.get('input') or estimate_tokens(prompt),
+                       usage.get('output') or estimate_tokens(translation),
+                       not (usage.get('input') and usage.get('output')), not translation.strip())
+        if not translation.strip():
+            raise ValueError(f"Empty translation from {model_name}")
+
+        first_token_at = first_token_at or finished_at
+        stats.queue_seconds = sent_at - step_start
+        stats.ttft_seconds = first_token_at - sent_at
+        stats.generation_seconds = finished_at - first_token_at
+        stats.total_seconds = finished_at - step_start
+        stats.input_tokens = usage.get('input') or estimate_tokens(prompt)
+        stats.output_tokens = usage.get('output') or estimate_tokens(translation)
+        if stats.generation_seconds > 0:
+            stats.tokens_per_sec = stats.output_tokens / stats.generation_seconds
+        return translation, stats
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Medical Terminology Preservation Checker
+
+Checks whether the terms that matter most survive the round trip: vaccine
+and drug names, dosages and other numeric expressions, and contraindication
+/ warning phrases.
+
+For each English source, the key terms are collected from:
+- a lexicon of vaccine, drug, cancer and warning terms (MEDICAL_TERMS) found
+  in it; a term inside a longer match ("allergic reaction" in "severe
+  allergic reaction") is not counted again
+- acronyms (MMR, DTaP, HPV, ...)
+- numeric expressions with a unit or a range, canonicalised ("two doses" /
+  "2 doses" -> "2 dose", "4 to 6 years" / "4–6 years" -> "4-6 year",
+  "0.5 mL" -> "0.5ml"). Bare numbers (years, page and list numbers) are
+  skipped, and so are phone numbers, dates, "page N of M" and the digits
+  inside lexicon terms (9-1-1, COVID-19)
+
+and compiled into an Aho-Corasick automaton (cached per source, since each
+English document is the source of 32 rows). A back-translation is then
+canonicalised the same way and scanned once, in linear time, to count which
+distinct terms are preserved and which are missing.
+
+Usage:
+  python terminology.py --doc immunize/hepatitis_b     # Show the term index of one document
+  python terminology.py --verify                       # Automaton vs regex scan, and sources vs themselves
+"""
+
+import random
+import re
+import sys
+from collections import deque
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+# =============================================================================
+# LEXICON
+# =============================================================================
+
+MEDICAL_TERMS = {
+    "vaccine": [
+        "hepatitis a", "hepatitis b", "hpv", "human papillomavirus", "influenza", "flu vaccine",
+        "mmr", "measles", "mumps", "rubella", "varicella", "chickenpox", "shingles", "zoster",
+        "dtap", "tdap", "td", "diphtheria", "tetanus", "pertussis", "whooping cough", "polio",
+        "ipv", "hib", "haemophilus influenzae", "pneumococcal", "meningococcal", "menacwy",
+        "menb", "rotavirus", "covid-19", "rsv", "respiratory syncytial virus", "cholera",
+        "typhoid", "yellow fever", "rabies", "japanese encephalitis", "mpox", "dengue",
+    ],
+    "drug": [
+        "chemotherapy", "radiation therapy", "immunotherapy", "hormone therapy", "tamoxifen",
+        "aromatase inhibitor", "trastuzumab", "antibiotic", "antibiotics", "aspirin",
+        "acetaminophen", "ibuprofen", "steroid", "steroids", "corticosteroids", "blood thinner",
+        "immune globulin", "antiviral", "opioid", "pain medicine", "anesthesia",
+    ],
+    "cancer": [
+        "cancer", "breast cancer", "cervical cancer", "colorectal cancer", "lung cancer",
+        "prostate cancer", "skin cancer", "melanoma", "basal cell carcinoma", "squamous cell carcinoma",
+        "tumor", "biopsy", "stage", "metastasis", "lymph node", "lymph nodes", "surgery",
+        "radiation", "targeted therapy", "chemo", "nausea", "vomiting", "mammogram", "pap test",
+        "colonoscopy", "ct scan", "mri", "pet scan", "x-ray", "blood test", "psa", "mole", "moles",
+        "sunscreen", "follow-up", "clinical trial", "remission", "recurrence", "palliative care",
+    ],
+    "warning": [
+        "allergic reaction", "severe allergic reaction", "life-threatening", "anaphylaxis",
+        "guillain-barré syndrome", "guillain-barre syndrome", "weakened immune system",
+        "pregnant", "pregnancy", "breastfeeding", "fainting", "seizure", "seizures",
+        "fever", "swelling", "hives", "difficulty breathing", "call 9-1-1", "9-1-1",
+        "should not get", "should not receive", "do not take", "not recommended",
+        "wait", "postpone", "side effects", "vaers", "vaccine injury compensation program",
+        "health care provider", "emergency",
+    ],
+}
+
+NUMBER_WORDS = {
+    "one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6",
+    "seven": "7", "eight": "8", "nine": "9", "ten": "10", "eleven": "11", "twelve": "12",
+    "single": "1", "first": "1st", "second": "2nd", "third": "3rd", "fourth": "4th",
+}
+
+UNITS = (r"mg|mcg|µg|ml|g|kg|iu|units?|doses?|shots?|days?|weeks?|months?|years?|"
+         r"hours?|minutes?|times?|%|percent")
+
+NUMERIC_EXPRESSION = re.compile(
+    r"(?<![\w.])(\d+(?:[.,]\d+)?)(?:\s*(?:-|–|—|to|through)\s*(\d+(?:[.,]\d+)?))?"
+    rf"(?:\s*({UNITS})\b|\s*(%))?(?!\w)",
+    re.IGNORECASE,
+)
+NUMBER_WORD = re.compile(r"\b(" + "|".join(NUMBER_WORDS) + r")\b")
+ACRONYM = re.compile(r"\b[A-Z][A-Za-z]{0,3}[A-Z][A-Za-z]{0,2}\b")
+# Capitalised boilerplate on the VIS handouts ("OFFICE USE ONLY")
+ACRONYM_STOPWORDS = {"ok", "use", "only", "info", "vis", "usa", "what", "why", "how", "who"}
+WHITESPACE = re.compile(r"\s+")
+# Blanked out before numeric extraction: lexicon terms with digits ("call 9-1-1"
+# is not the range "9-1"), phone numbers ("1-800-232-4636" is not "1-800" and
+# "232-4636"), dates (VIS edition dates) and page footers
+DIGIT_TERMS = "|".join(sorted(
+    (re.escape(term) for terms in MEDICAL_TERMS.values() for term in terms if any(c.isdigit() for c in term)),
+    key=len, reverse=True))
+PHONE_NUMBER = (r"(?<![\w-])(?:1[-. ])?(?:\(\d{3}\) ?|\d{3}[-. ])(?:\d{3}|[a-z]{3})[-. ](?:\d{4}|[a-z]{4})(?![\w-])|"
+                r"(?<![\w-])1-8\d\d-[a-z]+(?:-[a-z]+)?(?![\w-])")
+DATE = r"(?<![\w/.-])\d{1,4}[/.-]\d{1,2}[/.-]\d{1,4}(?![\w/.-])"
+PAGE_FOOTER = r"\bpage \d+ (?:of|/) \d+\b"
+NUMERIC_NOISE = re.compile("|".join((DIGIT_TERMS, PHONE_NUMBER, DATE, PAGE_FOOTER)))
+
+
+def _canonical_unit(unit: str) -> str:
+    unit = unit.lower()
+    if unit == "percent":
+        return "%"
+    if unit not in ("%", "iu") and unit.endswith("s") and len(unit) > 2:
+        unit = unit[:-1]
+    return unit
+
+
+def _canonical_number(match: re.Match) -> str:
+    low, high, unit, percent = match.groups()
+    value = low.replace(",", ".") + ("-" + high.replace(",", ".") if high else "")
+    unit = unit or percent
+    if not unit:
+        return value
+    unit = _canonical_unit(unit)
+    # Physical units are written attached ("0.5ml"); counts keep a space ("2 dose")
+    return value + unit if unit in ("mg", "mcg", "µg", "ml", "g", "kg", "iu", "%") else f"{value} {unit}"
+
+
+def canonicalize(text: str) -> str:
+    """Lowercase, collapse whitespace, and rewrite number words and numeric expressions canonically."""
+    text = WHITESPACE.sub(" ", (text or "").lower())
+    text = NUMBER_WORD.sub(lambda m: NUMBER_WORDS[m.group(1)], text)
+    return NUMERIC_EXPRESSION.sub(_canonical_number, text)
+
+
+# =============================================================================
+# AHO-CORASICK AUTOMATON
+# =============================================================================
+
+class TermIndex:
+    """Aho-Corasick automaton over a set of lowercase terms, with word-boundary matching."""
+
+    def __init__(self, terms: dict):
+        """terms: {term: category}"""
+        self.terms = list(terms)
+        self.categories = [terms[t] for t in self.terms]
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for term_id, term in enumerate(self.terms):
+            state = 0
+            for char in term:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].append(term_id)
+
+        # Breadth-first failure links (children of the root fail to the root)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                if state:
+                    self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def scan(self, text: str) -> set[int]:
+        """Ids of the terms that occur in `text` as whole words (one pass)."""
+        return {term_id for _, _, term_id in self.matches(text)}
+
+    def matches(self, text: str) -> list[tuple[int, int, int]]:
+        """Every whole-word occurrence in `text` as (start, end, term id), in order of end."""
+        found = []
+        state = 0
+        goto, fail, output, terms = self.goto, self.fail, self.output, self.terms
+        for end, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for term_id in output[state]:
+                start = end - len(terms[term_id]) + 1
+                before = text[start - 1] if start > 0 else " "
+                after = text[end + 1] if end + 1 < len(text) else " "
+                if not before.isalnum() and not after.isalnum():
+                    found.append((start, end + 1, term_id))
+        return found
+
+
+# Lexicon automaton, used to find which lexicon terms a source contains
+_LEXICON_INDEX = TermIndex({term: category for category, terms in MEDICAL_TERMS.items() for term in terms})
+
+
+def extract_terms(english_text: str) -> dict:
+    """Key terms of an English source: {canonical term: category}."""
+    canonical = canonicalize(english_text)
+    terms = {}
+    matches = _LEXICON_INDEX.matches(canonical)
+    for start, end, term_id in matches:
+        if any(s <= start and end <= e and e - s > end - start for s, e, _ in matches):
+            continue  # Part of a longer lexicon term at this place
+        terms[_LEXICON_INDEX.terms[term_id]] = _LEXICON_INDEX.categories[term_id]
+    for acronym in ACRONYM.findall(english_text or ""):
+        if acronym.lower() not in ACRONYM_STOPWORDS and not (acronym.isupper() and len(acronym) > 5):
+            terms.setdefault(acronym.lower(), "acronym")
+    numeric_text = WHITESPACE.sub(" ", NUMBER_WORD.sub(lambda m: NUMBER_WORDS[m.group(1)], (english_text or "").lower()))
+    for match in NUMERIC_EXPRESSION.finditer(NUMERIC_NOISE.sub(" ", numeric_text)):
+        low, high, unit, percent = match.groups()
+        if unit or percent or high:  # Bare numbers: years, page and list numbers
+            terms.setdefault(_canonical_number(match), "number")
+    return terms
+
+
+_source_indexes = {}
+
+
+def get_source_index(english_text: str) -> TermIndex:
+    """Compiled term index for one English source (cached)."""
+    key = hash(english_text)
+    if key not in _source_indexes:
+        _source_indexes[key] = TermIndex(extract_terms(english_text))
+    return _source_indexes[key]
+
+
+def check_terms(english_text: str, back_translation: str) -> dict:
+    """
+    Which of the source's key terms survive in the back-translation.
+
+    Returns counts of distinct terms (all, and numbers only) plus the missing terms.
+    """
+    index = get_source_index(english_text)
+    found = index.scan(canonicalize(back_translation))
+    missing = [index.terms[i] for i in range(len(index.terms)) if i not in found]
+    numbers = [i for i, category in enumerate(index.categories) if category == "number"]
+    return {
+        'terms_total': len(index.terms),
+        'terms_preserved': len(found),
+        'terms_missing': len(missing),
+        'numbers_total': len(numbers),
+        'numbers_preserved': sum(1 for i in numbers if i in found),
+        'numbers_missing': sum(1 for i in numbers if i not in found),
+        'missing': missing,
+    }
+
+
+# =============================================================================
+# VERIFICATION
+# =============================================================================
+
+def regex_scan(terms: list, text: str) -> set[int]:
+    """Reference for TermIndex.scan: one word-bounded regex search per term."""
+    return {i for i, term in enumerate(terms)
+            if re.search(r"(?<![^\W_])" + re.escape(term) + r"(?![^\W_])", text)}
+
+
+def verify(trials: int = 2000, seed: int = 0) -> int:
+    """
+    Compare TermIndex.scan with regex_scan on random term sets and texts over
+    a small alphabet (so terms overlap, nest and share suffixes). Returns the
+    number of disagreeing trials.
+    """
+    rng = random.Random(seed)
+    alphabet = "ab9- ."
+    failures = 0
+    for trial in range(trials):
+        terms = list(dict.fromkeys(
+            "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))).strip(" ") or "a"
+            for _ in range(rng.randint(1, 8))))
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        found = TermIndex({term: "term" for term in terms}).scan(text)
+        expected = regex_scan(terms, text)
+        if found != expected:
+            failures += 1
+            print(f"Trial {trial}: {terms!r} in {text!r}: automaton {sorted(found)}, regex {sorted(expected)}")
+    return failures
+
+
+def verify_sources(documents: list) -> int:
+    """Every English source must preserve all of its own terms. Returns the number that do not."""
+    failures = 0
+    for doc in documents:
+        counts = check_terms(doc.english_text, doc.english_text)
+        if counts['terms_missing']:
+            failures += 1
+            print(f"{doc.doc_id}: missing its own terms {counts['missing']}")
+    return failures
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Medical terminology preservation checker")
+    parser.add_argument("--doc", help="Document id, e.g. immunize/hepatitis_b")
+    parser.add_argument("--verify", action="store_true",
+                        help="Check the automaton against a regex scan, and each source against itself")
+    args = parser.parse_args()
+
+    if not args.doc and not args.verify:
+        parser.error("--doc or --verify is required")
+
+    from run_medlineplus_pipeline import load_all_documents
+    if args.verify:
+        scan_failures = verify()
+        print(f"Automaton vs regex: {scan_failures} of 2000 random trials differ")
+        documents = load_all_documents()
+        source_failures = verify_sources(documents)
+        print(f"Sources: {source_failures} of {len(documents)} do not preserve their own terms")
+        sys.exit(1 if scan_failures or source_failures else 0)
+
+    docs = {doc.doc_id: doc for doc in load_all_documents()}
+    terms = extract_terms(docs[args.doc].english_text)
+    for category in sorted(set(terms.values())):
+        print(f"\n{category}:")
+        print("  " + ", ".join(sorted(t for t, c in terms.items() if c == category)))
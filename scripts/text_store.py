@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Text Store for Pipeline Results
+
+Every ComparisonResult used to carry the full English original and
+professional translation, so all_results.json held 32 copies of each English
+document (4 models x 8 languages) and 4 of each professional translation.
+
+In the normalized format each distinct text is written once to a blob store
+(texts/ab/cdef..., named by the SHA-256 of the text, zstd-compressed when
+the zstandard package is installed) and result rows only carry the hashes:
+
+  {"format": "text_store/1", "store": "texts",
+   "rows": [{"doc_id": ..., "model": ..., ..., "texts": {"english_original": "<sha256>", ...}}]}
+
+load_results_file() reads either format. Normalized rows come back as
+ResultRow mappings that read a text from the store only when it is accessed
+(with a small LRU cache, since the same English original is read by 32 rows).
+
+Usage:
+  python text_store.py --convert all_results.json    # Rewrite a results file in the normalized format
+  python text_store.py --expand all_results.json --output full.json   # Back to one self-contained file
+  python text_store.py --stats all_results.json
+"""
+
+import hashlib
+import json
+import os
+import sys
+from collections.abc import Mapping
+from functools import lru_cache
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+FORMAT = "text_store/1"
+STORE_DIRNAME = "texts"
+CACHE_SIZE = 256
+ZSTD_LEVEL = 10
+
+# ComparisonResult fields moved into the store
+TEXT_FIELDS = (
+    "english_original",
+    "llm_translation",
+    "professional_translation",
+    "llm_back_translation",
+    "professional_back_translation",
+)
+
+
+def _zstandard():
+    """The zstandard module, or None when it is not installed."""
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+# =============================================================================
+# BLOB STORE
+# =============================================================================
+
+class TextStore:
+    """Texts stored once each under their SHA-256, optionally zstd-compressed."""
+
+    def __init__(self, root, compress: bool = True, cache_size: int = CACHE_SIZE):
+        self.root = Path(root)
+        self.compress = compress and _zstandard() is not None
+        self.cache_size = cache_size
+        self._known = set()
+        self.get = lru_cache(maxsize=cache_size)(self._read)
+
+    # Worker processes get the location only; each builds its own cache
+    def __getstate__(self):
+        return {'root': self.root, 'compress': self.compress, 'cache_size': self.cache_size}
+
+    def __setstate__(self, state):
+        self.__init__(state['root'], state['compress'], state['cache_size'])
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key[2:]
+
+    def put(self, text: str) -> str:
+        """Store text (if not already there) and return its key."""
+        key = text_key(text)
+        if key in self._known:
+            return key
+        path = self._path(key)
+        if not path.exists() and not path.with_suffix(".zst").exists():
+            data = text.encode('utf-8')
+            if self.compress:
+                data = _zstandard().ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+                path = path.with_suffix(".zst")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + f".tmp{os.getpid()}")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)  # Readers never see a partial blob
+        self._known.add(key)
+        return key
+
+    def _read(self, key: str) -> str:
+        path = self._path(key)
+        if path.exists():
+            return path.read_bytes().decode('utf-8')
+        compressed = path.with_suffix(".zst")
+        if not compressed.exists():
+            raise KeyError(f"Text {key} not in store {self.root}")
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise ImportError(f"{compressed} is zstd-compressed; pip install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(compressed.read_bytes()).decode('utf-8')
+
+
+# =============================================================================
+# ROWS
+# =============================================================================
+
+class ResultRow(Mapping):
+    """A normalized result row; text fields are read from the store on access."""
+
+    def __init__(self, row: dict, store: TextStore):
+        self._fields = {k: v for k, v in row.items() if k != "texts"}
+        self._texts = row.get("texts", {})
+        self._store = store
+
+    def __getitem__(self, name):
+        if name in self._texts:
+            return self._store.get(self._texts[name])
+        return self._fields[name]
+
+    def __iter__(self):
+        yield from self._fields
+        yield from (name for name in self._texts if name not in self._fields)
+
+    def __len__(self):
+        return len(self._fields) + sum(1 for name in self._texts if name not in self._fields)
+
+    def __repr__(self):
+        return f"ResultRow({self._fields.get('doc_id')}|{self._fields.get('model')}|{self._fields.get('language')})"
+
+    def to_dict(self):
+        return dict(self)
+
+
+def reference_row(row: Mapping) -> dict:
+    """Row with its non-empty text fields replaced by their keys, without storing them (for fingerprints)."""
+    if isinstance(row, ResultRow):
+        return {**row._fields, "texts": dict(row._texts)}  # No need to read the texts
+    reference = {name: value for name, value in row.items() if name not in TEXT_FIELDS or not value}
+    reference["texts"] = {name: text_key(row[name]) for name in TEXT_FIELDS if row.get(name)}
+    return reference
+
+
+def normalize_row(row: Mapping, store: TextStore) -> dict:
+    """Row with its non-empty text fields replaced by store keys under "texts"."""
+    if isinstance(row, ResultRow) and row._store.root == store.root:
+        return reference_row(row)  # Already stored here; no need to read the texts
+    normalized, texts = {}, {}
+    for name in row:
+        value = row[name]
+        if name in TEXT_FIELDS and isinstance(value, str) and value:
+            texts[name] = store.put(value)
+        else:
+            normalized[name] = value
+    normalized["texts"] = texts
+    return normalized
+
+
+# =============================================================================
+# RESULTS FILES
+# =============================================================================
+
+def save_results_file(rows: list, path, compress: bool = True) -> Path:
+    """Write rows in the normalized format, with the blob store next to the file."""
+    path = Path(path)
+    store = TextStore(path.parent / STORE_DIRNAME, compress=compress)
+    data = {
+        "format": FORMAT,
+        "store": STORE_DIRNAME,
+        "rows": [normalize_row(row, store) for row in rows],
+    }
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+    return path
+
+
+def load_results_file(path) -> list:
+    """
+    Rows of a results file in either format: plain dicts for the old
+    self-contained list, lazily resolved ResultRows for the normalized one.
+    """
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return data
+    if data.get("format") != FORMAT:
+        raise ValueError(f"{path}: unknown results format {data.get('format')!r}")
+    store = TextStore(path.parent / data["store"])
+    return [ResultRow(row, store) for row in data["rows"]]
+
+
+def file_stats(path) -> dict:
+    """Sizes of a results file and, for the normalized format, its blob store."""
+    path = Path(path)
+    rows = load_results_file(path)
+    text_bytes = sum(len(row[name].encode('utf-8')) for row in rows for name in TEXT_FIELDS
+                     if isinstance(row.get(name), str))
+    stats = {'rows': len(rows), 'file_bytes': path.stat().st_size, 'text_bytes': text_bytes,
+             'blobs': 0, 'blob_bytes': 0}
+    if rows and isinstance(rows[0], ResultRow):
+        keys = {key for row in rows for key in row._texts.values()}
+        store = rows[0]._store
+        for key in keys:
+            blob = store._path(key)
+            blob = blob if blob.exists() else blob.with_suffix(".zst")
+            stats['blob_bytes'] += blob.stat().st_size
+        stats['blobs'] = len(keys)
+    return stats
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Content-addressed text store for results files")
+    parser.add_argument("--convert", metavar="FILE", help="Rewrite a results file in the normalized format")
+    parser.add_argument("--expand", metavar="FILE", help="Write a normalized file back out as one self-contained list")
+    parser.add_argument("--output", help="Output path for --expand")
+    parser.add_argument("--no-compress", action="store_true", help="Store blobs uncompressed")
+    parser.add_argument("--stats", metavar="FILE", help="Show file and store sizes")
+
+    args = parser.parse_args()
+
+    if args.convert:
+        before = Path(args.convert).stat().st_size
+        save_results_file(load_results_file(args.convert), args.convert, compress=not args.no_compress)
+        stats = file_stats(args.convert)
+        print(f"{args.convert}: {before / 1e6:.1f} MB -> {stats['file_bytes'] / 1e6:.2f} MB "
+              f"+ {stats['blobs']} blobs ({stats['blob_bytes'] / 1e6:.2f} MB)")
+    elif args.expand:
+        if not args.output:
+            parser.error("--expand needs --output")
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump([dict(row) for row in load_results_file(args.expand)], f, indent=2, ensure_ascii=False)
+        print(f"Wrote {args.output}")
+    elif args.stats:
+        stats = file_stats(args.stats)
+        print(f"Rows:        {stats['rows']}")
+        print(f"File:        {stats['file_bytes'] / 1e6:.2f} MB")
+        print(f"Texts:       {stats['text_bytes'] / 1e6:.2f} MB as referenced by rows")
+        if stats['blobs']:
+            print(f"Blob store:  {stats['blobs']} blobs, {stats['blob_bytes'] / 1e6:.2f} MB on disk")
+    else:
+        parser.print_help()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Token-Aware Batching and Long-Document Policy for the Neural Scorers
+
+The English VIS documents run well past the 512-token window of the
+embedding and BERTScore models, which used to truncate them silently. This
+module makes that explicit:
+
+- Texts are measured in model tokens, sorted by length and packed into
+  batches under a token budget (batch size x longest sequence), so short
+  cancer handouts no longer pad out to the length of a long VIS.
+- Over-length texts follow LONG_TEXT_POLICY:
+    "truncate" keep only the first window, as every stored score was
+               computed (the default), but count it
+    "chunk"    split at sentence boundaries into windows that fit, encode
+               every window, and pool (token-weighted mean for sentence
+               embeddings; greedy matching over all window tokens for BERTScore);
+               this changes the embedding and BERTScore values of long documents
+- LONG_TEXT_STATS counts how many texts were chunked or truncated, and each
+  metrics row records the policy it was scored under.
+"""
+
+import re
+import sys
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import logger
+
+LONG_TEXT_POLICY = "truncate"  # "chunk" changes stored scores; rows record which was used
+MAX_BATCH_TOKENS = 16384  # Padded tokens per forward pass
+MAX_BATCH_SIZE = 64
+
+LONG_TEXT_STATS = {'texts': 0, 'chunked': 0, 'truncated': 0, 'chunks': 0}
+
+# Sentence ends (Latin and CJK punctuation) and line breaks
+SENTENCE_BREAK = re.compile(r'(?<=[.!?;。！？；])\s+|(?<=[。！？；])|\n+')
+
+
+def set_long_text_policy(policy: str):
+    global LONG_TEXT_POLICY
+    if policy not in ("chunk", "truncate"):
+        raise ValueError(f"Unknown long-text policy: {policy}")
+    LONG_TEXT_POLICY = policy
+
+
+def get_long_text_policy() -> str:
+    return LONG_TEXT_POLICY
+
+
+# =============================================================================
+# LENGTHS, BUCKETS AND CHUNKS
+# =============================================================================
+
+def token_lengths(tokenizer, texts: list) -> list[int]:
+    """Token count of each text, without special tokens."""
+    if not texts:
+        return []
+    encoded = tokenizer(list(texts), add_special_tokens=False, truncation=False)["input_ids"]
+    return [len(ids) for ids in encoded]
+
+
+def make_batches(lengths: list, max_tokens: int = None, max_batch_size: int = None) -> list[list[int]]:
+    """
+    Group indices into batches, longest first, so that
+    len(batch) * longest-in-batch stays within the token budget.
+    """
+    max_tokens = max_tokens or MAX_BATCH_TOKENS
+    max_batch_size = max_batch_size or MAX_BATCH_SIZE
+    order = sorted(range(len(lengths)), key=lambda i: -lengths[i])
+    batches, current = [], []
+    for i in order:
+        longest = lengths[current[0]] if current else lengths[i]
+        if current and ((len(current) + 1) * max(longest, 1) > max_tokens or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _split_oversized(piece: str, count, max_tokens: int) -> list[str]:
+    """Halve a piece (at whitespace near the middle when there is some) until each part fits."""
+    if count(piece) <= max_tokens or len(piece) < 2:
+        return [piece]
+    middle = len(piece) // 2
+    space = piece.rfind(" ", 0, middle)
+    cut = space if space > 0 else middle
+    return (_split_oversized(piece[:cut].strip(), count, max_tokens)
+            + _split_oversized(piece[cut:].strip(), count, max_tokens))
+
+
+def chunk_text(text: str, tokenizer, max_tokens: int) -> list[tuple[str, int]]:
+    """
+    Split text at sentence boundaries into (chunk, n_tokens) pieces of at
+    most max_tokens tokens each. Sentences that are too long on their own are
+    split further.
+    """
+    def count(piece):
+        return len(tokenizer(piece, add_special_tokens=False, truncation=False)["input_ids"])
+
+    sentences = [s.strip() for s in SENTENCE_BREAK.split(text) if s and s.strip()]
+    pieces = []
+    for sentence, n in zip(sentences, token_lengths(tokenizer, sentences)):
+        if n <= max_tokens:
+            pieces.append((sentence, n))
+        else:
+            pieces.extend((part, count(part)) for part in _split_oversized(sentence, count, max_tokens))
+
+    chunks, current, current_tokens = [], [], 0
+    for piece, n in pieces:
+        if current and current_tokens + n > max_tokens:
+            chunks.append((" ".join(current), current_tokens))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += n
+    if current:
+        chunks.append((" ".join(current), current_tokens))
+    return chunks
+
+
+# =============================================================================
+# SENTENCE EMBEDDINGS
+# =============================================================================
+
+def encode_texts(model, texts: list):
+    """
+    Embed texts with a SentenceTransformer-like model (tokenizer,
+    max_seq_length, encode) using token-budget batches. Over-length texts are
+    chunked and pooled (token-weighted mean) or truncated per LONG_TEXT_POLICY.
+    """
+    import numpy as np
+
+    tokenizer = model.tokenizer
+    window = model.max_seq_length - 2  # Room for special tokens
+    lengths = token_lengths(tokenizer, texts)
+
+    # Units to encode: (text index, text, tokens)
+    units = []
+    for i, (text, n) in enumerate(zip(texts, lengths)):
+        LONG_TEXT_STATS['texts'] += 1
+        if n <= window:
+            units.append((i, text, n))
+        elif LONG_TEXT_POLICY == "truncate":
+            LONG_TEXT_STATS['truncated'] += 1
+            units.append((i, text, window))
+        else:
+            chunks = chunk_text(text, tokenizer, window)
+            LONG_TEXT_STATS['chunked'] += 1
+            LONG_TEXT_STATS['chunks'] += len(chunks)
+            units.extend((i, chunk, chunk_tokens) for chunk, chunk_tokens in chunks)
+
+    unit_embeddings = [None] * len(units)
+    for batch in make_batches([n + 2 for _, _, n in units]):
+        encoded = model.encode([units[j][1] for j in batch], batch_size=len(batch), convert_to_numpy=True)
+        for j, embedding in zip(batch, encoded):
+            unit_embeddings[j] = embedding
+
+    dim = unit_embeddings[0].shape[-1] if units else 0
+    pooled = np.zeros((len(texts), dim), dtype=np.float32)
+    weights = np.zeros(len(texts), dtype=np.float32)
+    for (i, _, n), embedding in zip(units, unit_embeddings):
+        pooled[i] += max(n, 1) * embedding
+        weights[i] += max(n, 1)
+    return pooled / np.maximum(weights, 1e-9)[:, None]
+
+
+# =============================================================================
+# BERTSCORE
+# =============================================================================
+
+_bertscore_scorers = {}
+
+
+def get_bertscore_scorer(lang: str):
+    """bert_score.BERTScorer for `lang`, kept loaded (bert_score.score reloads the model on every call)."""
+    if lang not in _bertscore_scorers:
+        from bert_score import BERTScorer
+        _bertscore_scorers[lang] = BERTScorer(lang=lang)
+    return _bertscore_scorers[lang]
+
+
+def _bertscore_window(tokenizer) -> int:
+    max_length = min(getattr(tokenizer, "model_max_length", 512), 512)
+    return max_length - tokenizer.num_special_tokens_to_add()
+
+
+def _token_embeddings(model, tokenizer, token_ids: list) -> list:
+    """Contextual embeddings (special tokens removed, L2-normalised) for each window."""
+    import torch
+
+    device = next(model.parameters()).device
+    embeddings = [None] * len(token_ids)
+    for batch in make_batches([len(ids) + 2 for ids in token_ids]):
+        inputs = [tokenizer.build_inputs_with_special_tokens(token_ids[j]) for j in batch]
+        longest = max(len(ids) for ids in inputs)
+        input_ids = torch.full((len(batch), longest), tokenizer.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(batch), longest), dtype=torch.long)
+        for row, ids in enumerate(inputs):
+            input_ids[row, :len(ids)] = torch.tensor(ids)
+            attention_mask[row, :len(ids)] = 1
+        with torch.no_grad():
+            hidden = model(input_ids.to(device), attention_mask=attention_mask.to(device))[0]
+        hidden = torch.nn.functional.normalize(hidden, dim=-1).cpu()
+        for row, j in enumerate(batch):
+            n = len(token_ids[j])
+            embeddings[j] = hidden[row, 1:n + 1].numpy()  # Drop [CLS]/<s> and [SEP]/</s>
+    return embeddings
+
+
+def bertscore_chunked(hypotheses: list, references: list, lang: str) -> list[float]:
+    """
+    BERTScore F1 for texts longer than the model window: each text is embedded
+    window by window and greedy matching runs over all of its tokens, so no
+    part of either document is dropped. Uniform token weights (idf=False), as
+    in bert_score.score.
+    """
+    import numpy as np
+
+    scorer = get_bertscore_scorer(lang)
+    model, tokenizer = scorer._model, scorer._tokenizer
+    window = _bertscore_window(tokenizer)
+
+    # Every window of every text, and which text it came from
+    windows, owners = [], []
+    for t, text in enumerate(list(hypotheses) + list(references)):
+        ids = tokenizer(text.strip(), add_special_tokens=False, truncation=False)["input_ids"]
+        for start in range(0, max(len(ids), 1), window):
+            windows.append(ids[start:start + window])
+            owners.append(t)
+    window_embeddings = _token_embeddings(model, tokenizer, windows)
+
+    per_text = [[] for _ in range(len(hypotheses) + len(references))]
+    for t, embedding in zip(owners, window_embeddings):
+        per_text[t].append(embedding)
+    per_text = [np.concatenate(parts) for parts in per_text]
+
+    scores = []
+    for k in range(len(hypotheses)):
+        hyp, ref = per_text[k], per_text[len(hypotheses) + k]
+        if not len(hyp) or not len(ref):
+            scores.append(0.0)
+            continue
+        similarity = hyp @ ref.T
+        precision = similarity.max(axis=1).mean()
+        recall = similarity.max(axis=0).mean()
+        scores.append(float(2 * precision * recall / (precision + recall)) if precision + recall else 0.0)
+    return scores
+
+
+def bertscore_f1(hypotheses: list, references: list, lang: str) -> list[float]:
+    """
+    BERTScore F1 for each pair. Pairs that fit the model window are scored as
+    bert_score.score would; over-length pairs are chunked or counted as
+    truncated per LONG_TEXT_POLICY.
+    """
+    scorer = get_bertscore_scorer(lang)
+    window = _bertscore_window(scorer._tokenizer)
+    hyp_lengths = token_lengths(scorer._tokenizer, hypotheses)
+    ref_lengths = token_lengths(scorer._tokenizer, references)
+
+    scores = [None] * len(hypotheses)
+    short, long = [], []
+    for i, (h, r) in enumerate(zip(hyp_lengths, ref_lengths)):
+        LONG_TEXT_STATS['texts'] += 2
+        (long if max(h, r) > window else short).append(i)
+
+    if long and LONG_TEXT_POLICY == "truncate":
+        LONG_TEXT_STATS['truncated'] += len(long)
+        short, long = short + long, []
+
+    if short:
+        P, R, F1 = scorer.score([hypotheses[i] for i in short], [references[i] for i in short],
+                                verbose=False, batch_size=MAX_BATCH_SIZE)
+        for i, f1 in zip(short, F1.tolist()):
+            scores[i] = f1
+    if long:
+        LONG_TEXT_STATS['chunked'] += len(long)
+        for i, f1 in zip(long, bertscore_chunked([hypotheses[i] for i in long],
+                                                 [references[i] for i in long], lang)):
+            scores[i] = f1
+    return scores
+
+
+def log_long_text_stats():
+    if LONG_TEXT_STATS['chunked'] or LONG_TEXT_STATS['truncated']:
+        logger.info(f"Long texts ({LONG_TEXT_POLICY}): {LONG_TEXT_STATS['chunked']} chunked "
+                    f"into {LONG_TEXT_STATS['chunks']} windows, {LONG_TEXT_STATS['truncated']} truncated "
+                    f"(of {LONG_TEXT_STATS['texts']} texts scored)")
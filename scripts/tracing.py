@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Lightweight Tracing for Pipeline, Metrics and Report Stages
+
+OpenTelemetry-style spans (trace id, span id, parent, attributes, status)
+without the OpenTelemetry SDK. Spans nest automatically (per thread), carry
+doc_id / model / language attributes, and are exported to a local file:
+
+- *.jsonl  OTLP/JSON, one ExportTraceServiceRequest per line (the format the
+           OpenTelemetry Collector file exporter writes; load into Jaeger/Tempo)
+- *.json   Chrome trace-event format (open in https://ui.perfetto.dev or
+           chrome://tracing to see critical path and idle gaps)
+
+Tracing is OFF unless configured, and span() is then a cheap no-op.
+Configure with configure_tracing(path) or set MEDLINEPLUS_TRACE_FILE.
+
+Usage:
+  python run_medlineplus_pipeline.py --run --trace output/traces/run.json
+  MEDLINEPLUS_TRACE_FILE=output/traces/report.jsonl python generate_github_outputs.py
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+SERVICE_NAME = "medlineplus-backtranslation"
+FLUSH_EVERY = 200  # spans buffered before an OTLP append
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_tracer = None
+
+
+# =============================================================================
+# SPANS
+# =============================================================================
+
+class Span:
+    """One timed operation."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes",
+                 "start_ns", "end_ns", "status", "status_message", "thread_id")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str, attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = "OK"
+        self.status_message = None
+        self.thread_id = threading.get_ident()
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.status = "ERROR"
+        self.status_message = message
+
+
+class _NoopSpan:
+    def set_attribute(self, key, value):
+        pass
+
+    def set_error(self, message):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+# =============================================================================
+# EXPORT FORMATS
+# =============================================================================
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: list, service_name: str) -> dict:
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{
+            "scope": {"name": "medlineplus.tracing"},
+            "spans": [{
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                "parentSpanId": s.parent_id or "",
+                "name": s.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                "status": {"code": 2 if s.status == "ERROR" else 1,
+                           **({"message": s.status_message} if s.status_message else {})},
+            } for s in spans],
+        }],
+    }]}
+
+
+def to_chrome_events(spans: list, pid: int) -> list:
+    events = []
+    for s in spans:
+        args = dict(s.attributes)
+        if s.status == "ERROR":
+            args["error"] = s.status_message
+        events.append({
+            "name": s.name,
+            "cat": s.name.split(".")[0],
+            "ph": "X",
+            "ts": s.start_ns / 1000,
+            "dur": (s.end_ns - s.start_ns) / 1000,
+            "pid": pid,
+            "tid": s.thread_id,
+            "args": args,
+        })
+    return events
+
+
+# =============================================================================
+# TRACER
+# =============================================================================
+
+class Tracer:
+    """Collects finished spans and writes them to a file."""
+
+    def __init__(self, path, service_name: str = SERVICE_NAME):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.format = "otlp" if self.path.suffix == ".jsonl" else "chrome"
+        self.service_name = service_name
+        self.trace_id = secrets.token_hex(16)  # One trace per process run
+        self._lock = threading.Lock()
+        self._pending = []
+        self._chrome_events = []
+        if self.format == "otlp":
+            self.path.touch()
+
+    def finish(self, span: Span):
+        with self._lock:
+            self._pending.append(span)
+            if self.format == "otlp" and len(self._pending) >= FLUSH_EVERY:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        if self.format == "otlp":
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(to_otlp(self._pending, self.service_name)) + "\n")
+        else:
+            self._chrome_events.extend(to_chrome_events(self._pending, os.getpid()))
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({"traceEvents": self._chrome_events, "displayTimeUnit": "ms"}, f)
+        self._pending = []
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+
+def configure_tracing(path, service_name: str = SERVICE_NAME) -> Tracer:
+    """Start recording spans to `path` (.jsonl = OTLP/JSON, otherwise Chrome trace JSON)."""
+    global _tracer
+    if _tracer is not None:
+        _tracer.flush()
+    _tracer = Tracer(path, service_name)
+    return _tracer
+
+
+def shutdown_tracing():
+    """Write any buffered spans (also runs at interpreter exit)."""
+    if _tracer is not None:
+        _tracer.flush()
+
+
+def tracing_enabled() -> bool:
+    return _tracer is not None
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a block as a span, nested under the current span.
+
+    Exceptions mark the span as ERROR and are re-raised.
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield _NOOP_SPAN
+        return
+
+    parent = _current_span.get()
+    current = Span(name, tracer.trace_id, parent.span_id if parent else None,
+                   {k: v for k, v in attributes.items() if v is not None})
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set_error(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        tracer.finish(current)
+
+
+def record_span(name: str, start_ns: int, end_ns: int, thread_id: int = None, error: str = None, **attributes):
+    """
+    Record an operation timed elsewhere (e.g. in a worker process) as a span
+    nested under the current span.
+    """
+    tracer = _tracer
+    if tracer is None:
+        return
+    parent = _current_span.get()
+    current = Span(name, tracer.trace_id, parent.span_id if parent else None,
+                   {k: v for k, v in attributes.items() if v is not None})
+    current.start_ns = start_ns
+    current.end_ns = end_ns
+    if thread_id is not None:
+        current.thread_id = thread_id
+    if error:
+        current.set_error(error)
+    tracer.finish(current)
+
+
+atexit.register(shutdown_tracing)
+
+if os.environ.get("MEDLINEPLUS_TRACE_FILE"):
+    configure_tracing(os.environ["MEDLINEPLUS_TRACE_FILE"])